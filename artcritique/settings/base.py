@@ -115,6 +115,19 @@ CHANNEL_LAYERS = {
     }
 }
 
+# Cache configuration
+# Shared Redis cache in production so per-user feed state is visible to every
+# worker; local memory cache for development
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+    } if os.environ.get('USE_REDIS', 'False') == 'True' else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'brushup-default',
+    }
+}
+
 # Email configuration for allauth and password reset
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For development
 DEFAULT_FROM_EMAIL = 'Brush Up <noreply@brushup.replit.app>'
@@ -402,3 +415,74 @@ SOCIALACCOUNT_PROVIDERS = {
 SOCIAL_AUTH_GOOGLE_OAUTH2_KEY = os.environ.get("GOOGLE_OAUTH_CLIENT_ID")
 SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET = os.environ.get("GOOGLE_OAUTH_CLIENT_SECRET")
 
+
+# Two-at-a-time critique feed
+# Seconds before each process rebuilds its in-memory candidate pool from the
+# database, so changes made in other worker processes converge (0 disables)
+FEED_POOL_REFRESH_SECONDS = int(os.environ.get('FEED_POOL_REFRESH_SECONDS', '300'))
+
+# Number of recently shown artwork IDs remembered per user (two per pair) and
+# how long the cached seen set lives before being rebuilt from PairSession rows
+FEED_SEEN_WINDOW = int(os.environ.get('FEED_SEEN_WINDOW', '600'))
+FEED_SEEN_TTL = int(os.environ.get('FEED_SEEN_TTL', str(60 * 60 * 24)))
+
+# Per-user queue of precomputed pairs: how many are kept ready, when a refill
+# is triggered, how long a queued pair stays valid, and whether refills and
+# PairSession writes run on a background thread
+FEED_QUEUE_SIZE = int(os.environ.get('FEED_QUEUE_SIZE', '5'))
+FEED_QUEUE_LOW_WATER = int(os.environ.get('FEED_QUEUE_LOW_WATER', '2'))
+FEED_QUEUE_TTL = int(os.environ.get('FEED_QUEUE_TTL', '600'))
+FEED_QUEUE_BACKGROUND = os.environ.get('FEED_QUEUE_BACKGROUND', 'True') == 'True'
+
+# Buffered inserts for feed rows such as PairSession: rows are written with
+# bulk_create once this many are waiting or the oldest has waited this long
+FEED_WRITE_BATCH_SIZE = int(os.environ.get('FEED_WRITE_BATCH_SIZE', '50'))
+FEED_WRITE_FLUSH_SECONDS = float(os.environ.get('FEED_WRITE_FLUSH_SECONDS', '2'))
+
+# Pair sampler ('weighted' or 'top_need'); for the weighted sampler, how many
+# candidates are scanned and how quickly the freshness weight decays
+FEED_PAIR_SAMPLER = os.environ.get('FEED_PAIR_SAMPLER', 'weighted')
+FEED_SAMPLER_SCAN_LIMIT = int(os.environ.get('FEED_SAMPLER_SCAN_LIMIT', '2000'))
+FEED_SAMPLER_HALF_LIFE_DAYS = float(os.environ.get('FEED_SAMPLER_HALF_LIFE_DAYS', '14'))
+FEED_SAMPLER_FRESHNESS_FLOOR = float(os.environ.get('FEED_SAMPLER_FRESHNESS_FLOOR', '0.25'))
+
+# Notification outbox: how many rows one dispatcher pass sends, how often a
+# failed send is retried (exponential backoff from RETRY_SECONDS), how long a
+# dispatcher's claim on a batch lasts before another may take it over, and
+# whether the outbox is drained in-process after each commit (needed for the
+# in-memory channel layer; run `manage.py dispatch_notifications` otherwise)
+NOTIFICATION_OUTBOX_BATCH_SIZE = int(os.environ.get('NOTIFICATION_OUTBOX_BATCH_SIZE', '200'))
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_OUTBOX_MAX_ATTEMPTS', '8'))
+NOTIFICATION_OUTBOX_RETRY_SECONDS = float(os.environ.get('NOTIFICATION_OUTBOX_RETRY_SECONDS', '2'))
+NOTIFICATION_OUTBOX_LEASE_SECONDS = float(os.environ.get('NOTIFICATION_OUTBOX_LEASE_SECONDS', '60'))
+NOTIFICATION_DISPATCH_INLINE = os.environ.get(
+    'NOTIFICATION_DISPATCH_INLINE', 'False' if os.environ.get('USE_REDIS', 'False') == 'True' else 'True'
+) == 'True'
+
+# Likes and reactions on the same target within this many seconds are merged
+# into one unread notification ("alice and 11 others liked ..."); 0 disables
+NOTIFICATION_COALESCE_SECONDS = int(os.environ.get('NOTIFICATION_COALESCE_SECONDS', '3600'))
+
+# Read notifications older than this are moved to the archive table by the
+# archive_notifications command; the history API still pages into them
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', '90'))
+
+# WebSocket delta sync: notifications per notifications_delta frame, and how
+# far before a client's cursor changes are re-sent to cover commit lag
+NOTIFICATION_SYNC_BATCH_SIZE = int(os.environ.get('NOTIFICATION_SYNC_BATCH_SIZE', '50'))
+NOTIFICATION_SYNC_OVERLAP_SECONDS = int(os.environ.get('NOTIFICATION_SYNC_OVERLAP_SECONDS', '5'))
+
+# How long an unseen karma toast waits in the cache for the user's next page
+KARMA_TOAST_TTL = int(os.environ.get('KARMA_TOAST_TTL', str(60 * 60 * 24)))
+
+# Karma actions whose awards are buffered and recorded in batches (comma
+# separated, e.g. "like_given,artwork_liked"), and the batch limits
+KARMA_BUFFERED_ACTIONS = [
+    action for action in os.environ.get('KARMA_BUFFERED_ACTIONS', '').split(',') if action
+]
+KARMA_BUFFER_BATCH_SIZE = int(os.environ.get('KARMA_BUFFER_BATCH_SIZE', '100'))
+KARMA_BUFFER_FLUSH_SECONDS = float(os.environ.get('KARMA_BUFFER_FLUSH_SECONDS', '5'))
+
+# Seconds before each process rebuilds its in-memory karma leaderboard from
+# the database, so awards applied in other worker processes converge (0 disables)
+KARMA_LEADERBOARD_REFRESH_SECONDS = int(os.environ.get('KARMA_LEADERBOARD_REFRESH_SECONDS', '300'))
@@ -8,6 +8,10 @@ class ProfileInline(admin.StackedInline):
     model = Profile
     can_delete = False
     verbose_name_plural = 'Profile'
+    # Profile.save() leaves the counters out, so an edit here would be
+    # dropped; karma moves through critique.karma (or recalculate_karma),
+    # unread counts through critique.unread_counts (or reconcile_unread_counts)
+    readonly_fields = Profile.COUNTER_FIELDS
 
 # Extend the User admin
 class CustomUserAdmin(UserAdmin):
@@ -51,7 +55,7 @@ class ArtWorkAdmin(admin.ModelAdmin):
     
     def total_likes(self, obj):
         """Display the number of likes for the artwork"""
-        return obj.likes.count()
+        return obj.likes_count
     total_likes.short_description = 'Likes Count'
 
 
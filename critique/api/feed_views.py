@@ -3,66 +3,31 @@ Two-at-a-time critique feed API views.
 Provides endpoints for the intelligent artwork pairing system with quick critique tags.
 """
 
-import random
-from datetime import timedelta
-
 from django.utils import timezone
-from django.db.models import Count, Q
+from django.db.models import Q
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 
-from critique.models import ArtWork, PairSession, Tag, QuickCrit
-from .serializers import ArtworkCardSerializer, TagSerializer, QuickCritSerializer
-
-
-def _candidate_qs(user):
-    """Get candidate artworks for the two-at-a-time feed."""
-    # High-need (few critiques), fresh, different from user's recent engagements
-    recent = timezone.now() - timedelta(days=14)
-    qs = (
-        ArtWork.objects.filter(
-            is_published=True,
-            visibility=ArtWork.VISIBILITY_PUBLIC,
-        )
-        .annotate(crit_count=Count("quick_crits"))
-        .order_by("crit_count", "-created_at")
-    )
-
-    if user.is_authenticated:
-        # Avoid user's own art and recently seen pairs
-        seen = PairSession.objects.filter(user=user).order_by("-created_at")[:300]
-        seen_ids = set(
-            list(seen.values_list("spotlight_id", flat=True))
-            + list(seen.values_list("counter_id", flat=True))
-        )
-        qs = qs.exclude(Q(author=user) | Q(id__in=seen_ids))
-
-    return qs
-
-
-def _pick_pair(user):
-    """Pick a pair of artworks for the critique feed."""
-    qs = _candidate_qs(user)
-    top_need = list(qs[:80])
-    if not top_need:
-        return None, None
+from critique.models import Tag, QuickCrit
+from critique.feed_chips import get_chips, get_chips_version
+from critique.feed_pool import pick_pair
+from critique.feed_queue import build_pair_payload, get_queue_metrics, next_pair
+from .serializers import TagSerializer, QuickCritSerializer
 
-    spotlight = random.choice(top_need)
 
-    # Counterpoint: different author/medium if possible
-    counter = (
-        qs.exclude(author=spotlight.author)
-        .exclude(medium=spotlight.medium)
-        .exclude(id=spotlight.id)
-        .first()
-    )
-    if not counter:
-        pool = list(qs.exclude(id=spotlight.id)[:80])
-        counter = random.choice(pool) if pool else None
+def _chips_fields(request):
+    """
+    Build the chip fields of a feed response.
 
-    return spotlight, counter
+    Clients that pass the ``chips_version`` they already hold get the version
+    back with ``chips`` set to null and should keep using their copy.
+    """
+    version = get_chips_version()
+    if request.query_params.get("chips_version") == str(version):
+        return {"chips": None, "chips_version": version}
+    return {"chips": get_chips(version), "chips_version": version}
 
 
 @api_view(["GET"])
@@ -70,40 +35,47 @@ def _pick_pair(user):
 def feed_next_pair(request):
     """
     Get the next pair of artworks for critique with available tags.
+
+    Pass ``?chips_version=<version>`` to skip the chip payload when it has
+    not changed since the last response.
     """
-    spotlight, counter = _pick_pair(request.user)
-    if not spotlight or not counter:
+    context = {"request": request}
+    if request.user.is_authenticated:
+        # Served from the user's prefetched queue; the PairSession is written off the request path
+        pair = next_pair(request.user, context=context)
+    else:
+        spotlight, counter = pick_pair(request.user)
+        pair = build_pair_payload(spotlight, counter, context) if spotlight and counter else None
+
+    if not pair:
         return Response(
             {
                 "pair_id": None,
                 "spotlight": None,
                 "counterpoint": None,
                 "chips": {"pro": [], "con": []},
+                "chips_version": None,
             }
         )
 
-    if request.user.is_authenticated:
-        PairSession.objects.create(user=request.user, spotlight=spotlight, counter=counter)
-
     data = {
-        "pair_id": f"{spotlight.id}-{counter.id}-{int(timezone.now().timestamp())}",
-        # IMPORTANT: pass request context so image_url resolves properly
-        "spotlight": ArtworkCardSerializer(spotlight, context={"request": request}).data,
-        "counterpoint": ArtworkCardSerializer(counter, context={"request": request}).data,
-        "chips": {
-            "pro": TagSerializer(
-                Tag.objects.filter(polarity=Tag.PRO).order_by("is_system", "category", "label"),
-                many=True,
-            ).data,
-            "con": TagSerializer(
-                Tag.objects.filter(polarity=Tag.CON).order_by("is_system", "category", "label"),
-                many=True,
-            ).data,
-        },
+        "pair_id": f"{pair['spotlight_id']}-{pair['counter_id']}-{int(timezone.now().timestamp())}",
+        "spotlight": pair["spotlight"],
+        "counterpoint": pair["counterpoint"],
     }
+    data.update(_chips_fields(request))
     return Response(data)
 
 
+@api_view(["GET"])
+@permission_classes([permissions.IsAdminUser])
+def feed_queue_metrics(request):
+    """
+    Report the pair queue hit rate and refill latency.
+    """
+    return Response(get_queue_metrics())
+
+
 class QuickCritViewSet(viewsets.ModelViewSet):
     """
     API endpoint for managing quick critiques.
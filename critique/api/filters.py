@@ -1,5 +1,8 @@
 import django_filters
 from django.db import models
+from rest_framework import filters
+from critique.artwork_tags import MATCH_ALL, MATCH_ANY, filter_by_tags
+from critique.search import search_artworks
 from critique.models import ArtWork, Critique
 from django.contrib.auth.models import User
 
@@ -24,7 +27,15 @@ class ArtWorkFilter(django_filters.FilterSet):
     
     # Medium and tags filtering
     medium = django_filters.CharFilter(lookup_expr='icontains', help_text="Filter by medium")
-    tags = django_filters.CharFilter(lookup_expr='icontains', help_text="Filter by tags")
+    tags = django_filters.CharFilter(
+        method='filter_tags',
+        help_text="Filter by comma-separated tags (whole-tag match, see tags_match)"
+    )
+    tags_match = django_filters.ChoiceFilter(
+        choices=[(MATCH_ALL, 'All tags'), (MATCH_ANY, 'Any tag')],
+        method='filter_tags_match',
+        help_text="Whether artworks need all of the given tags (default) or any of them"
+    )
     
     # Date range filtering
     created_after = django_filters.DateTimeFilter(
@@ -67,6 +78,15 @@ class ArtWorkFilter(django_filters.FilterSet):
         help_text="Filter by folder name (partial match)"
     )
     
+    def filter_tags(self, queryset, name, value):
+        """Filter on normalized tags, combining them as tags_match says."""
+        match = MATCH_ANY if self.data.get('tags_match') == MATCH_ANY else MATCH_ALL
+        return filter_by_tags(queryset, value, match)
+
+    def filter_tags_match(self, queryset, name, value):
+        """Read by filter_tags; does not filter on its own."""
+        return queryset
+
     class Meta:
         model = ArtWork
         fields = {
@@ -75,11 +95,29 @@ class ArtWorkFilter(django_filters.FilterSet):
             'author': ['exact'],
             'author__username': ['exact', 'icontains'],
             'medium': ['exact', 'icontains'],
-            'tags': ['icontains'],
             'created_at': ['exact', 'gte', 'lte'],
         }
 
 
+class ArtWorkSearchFilter(filters.SearchFilter):
+    """
+    Full-text ?search= for artworks, backed by critique.search.
+
+    Results are ordered by relevance unless the request passes ?ordering=.
+    List this backend after OrderingFilter, which would otherwise replace the
+    relevance ordering with the view's default.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        queryset = search_artworks(queryset, query)
+        if not request.query_params.get(filters.OrderingFilter.ordering_param):
+            queryset = queryset.order_by('-search_rank', '-created_at', '-id')
+        return queryset
+
+
 class CritiqueFilter(django_filters.FilterSet):
     """
     Custom filter set for Critique model
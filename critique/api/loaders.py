@@ -0,0 +1,157 @@
+"""
+Request-scoped batch loaders for serializer fields.
+
+Serializer method fields that look up related rows (reaction counts, "liked
+by me") would otherwise run a query per object.
+A loader lives in the serializer context, so every serializer rendering the
+same response shares it, and PrimingListSerializer primes it with the whole
+page up front:
+
+    CritiqueListSerializer(page, many=True, context={'request': request})
+
+runs one grouped query for the reaction counts of every critique on the page
+and one for the requesting user's reactions, however many critiques there
+are. Keys that were not primed (a single retrieve, say) are loaded on first
+use.
+"""
+
+from django.db.models import Count, Exists, OuterRef, Prefetch
+from rest_framework import serializers
+
+from critique.models import ArtWork, Critique, CritiqueReply, Reaction
+
+REACTION_TYPES = [choice for choice, _ in Reaction.ReactionType.choices]
+
+# Critiques nested in an artwork's detail response
+RECENT_CRITIQUES_LIMIT = 5
+
+
+class BatchLoader:
+    """
+    Base class: caches load() results by key for the life of one response.
+
+    Subclasses set context_key and implement load(keys), returning a value
+    for every key it was given.
+    """
+
+    context_key = None
+
+    def __init__(self, user=None):
+        self.user = user if user is not None and user.is_authenticated else None
+        self._values = {}
+
+    @classmethod
+    def for_context(cls, context):
+        """Return the loader stored in a serializer context, creating it if needed."""
+        loader = context.get(cls.context_key)
+        if loader is None:
+            request = context.get('request')
+            loader = cls(getattr(request, 'user', None))
+            context[cls.context_key] = loader
+        return loader
+
+    def prime(self, keys):
+        """Load every key that is not loaded yet, in one batch."""
+        missing = {key for key in keys if key not in self._values}
+        if missing:
+            self._values.update(self.load(missing))
+
+    def get(self, key):
+        self.prime([key])
+        return self._values[key]
+
+    def load(self, keys):
+        raise NotImplementedError
+
+
+class ReactionSummaryLoader(BatchLoader):
+    """Reaction counts and the requesting user's reactions, keyed by critique ID."""
+
+    context_key = 'reaction_summary_loader'
+
+    def load(self, critique_ids):
+        summaries = {
+            critique_id: {'counts': dict.fromkeys(REACTION_TYPES + ['TOTAL'], 0), 'mine': []}
+            for critique_id in critique_ids
+        }
+
+        rows = (
+            Reaction.objects.filter(critique_id__in=critique_ids)
+            .values_list('critique_id', 'reaction_type')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        for critique_id, reaction_type, total in rows:
+            counts = summaries[critique_id]['counts']
+            counts[reaction_type] = total
+            counts['TOTAL'] += total
+
+        if self.user is not None:
+            mine = (
+                Reaction.objects.filter(critique_id__in=critique_ids, user=self.user)
+                .values_list('critique_id', 'reaction_type')
+            )
+            for critique_id, reaction_type in mine:
+                summaries[critique_id]['mine'].append(reaction_type)
+        return summaries
+
+    def counts(self, critique):
+        """Return {'HELPFUL', 'INSPIRING', 'DETAILED', 'TOTAL'} counts for a critique."""
+        return self.get(critique.pk)['counts']
+
+    def user_reactions(self, critique):
+        """Return the reaction types the requesting user gave a critique."""
+        return self.get(critique.pk)['mine']
+
+
+class LikedArtworkLoader(BatchLoader):
+    """Whether the requesting user likes each artwork, keyed by artwork ID."""
+
+    context_key = 'liked_artwork_loader'
+
+    def load(self, artwork_ids):
+        liked = set()
+        if self.user is not None:
+            liked = set(
+                ArtWork.likes.through.objects.filter(user_id=self.user.pk, artwork_id__in=artwork_ids)
+                .values_list('artwork_id', flat=True)
+            )
+        return {artwork_id: artwork_id in liked for artwork_id in artwork_ids}
+
+
+class PrimingListSerializer(serializers.ListSerializer):
+    """
+    List serializer that lets the child prime its loaders with the whole page.
+
+    The child serializer implements prime_loaders(instances).
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        self.child.prime_loaders(items)
+        return super().to_representation(items)
+
+
+def with_reply_flag(critiques):
+    """Annotate a Critique queryset with reply_exists for CritiqueListSerializer.has_replies."""
+    return critiques.annotate(
+        reply_exists=Exists(CritiqueReply.objects.filter(critique=OuterRef('pk')))
+    )
+
+
+def recent_critiques_queryset():
+    """Visible critiques, newest first, with what CritiqueListSerializer reads."""
+    return with_reply_flag(
+        Critique.objects.filter(is_hidden=False)
+        .select_related('author', 'artwork__author')
+        .order_by('-created_at', '-id')
+    )
+
+
+def recent_critiques_prefetch():
+    """Prefetch each artwork's newest visible critiques into recent_critiques."""
+    return Prefetch(
+        'critiques',
+        queryset=recent_critiques_queryset()[:RECENT_CRITIQUES_LIMIT],
+        to_attr='recent_critiques',
+    )
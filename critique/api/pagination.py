@@ -1,5 +1,13 @@
-from rest_framework.pagination import PageNumberPagination
+import binascii
+import json
+from base64 import b64decode, b64encode
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class CustomPageNumberPagination(PageNumberPagination):
@@ -85,4 +93,201 @@ class InfiniteScrollPagination(PageNumberPagination):
             'loaded_count': self.page.end_index(),
             # Include next page URL for easy fetching
             'next_url': self.get_next_link(),
-        })
\ No newline at end of file
+        })
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination for deep, frequently scrolled lists.
+
+    Pages are selected with a WHERE clause on the ordering key instead of
+    OFFSET, so every page costs the same no matter how far the user has
+    scrolled, and no COUNT(*) is run unless ``?include_count=true`` is passed.
+
+    The ordering key is the requested ordering field (``?ordering=``, limited
+    to the non-null ``ordering_fields``; anything else falls back to
+    ``default_ordering``) followed by the primary key as a tie-breaker.
+    Cursors are opaque tokens; pass back ``next_cursor`` or
+    ``previous_cursor`` as ``?cursor=``.
+    """
+    page_size = 12
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    cursor_query_param = 'cursor'
+    count_query_param = 'include_count'
+    ordering_query_param = 'ordering'
+    ordering_fields = ['created_at']
+    default_ordering = '-created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_key_fields(self, request):
+        """Return the ordering key, e.g. ['-popularity_score', '-id']."""
+        ordering = self.default_ordering
+        if self.ordering_query_param:
+            requested = request.query_params.get(self.ordering_query_param, '').strip()
+            if requested.lstrip('-') in self.ordering_fields:
+                ordering = requested
+        tie_breaker = '-id' if ordering.startswith('-') else 'id'
+        return [ordering, tie_breaker]
+
+    def encode_cursor(self, obj, reverse):
+        values = [self._field(name).value_to_string(obj) for name in self._names]
+        payload = json.dumps({'v': values, 'r': reverse}, separators=(',', ':'))
+        return b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        """Return (values, reverse) from the request's cursor, or None."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if len(payload['v']) != len(self._names):
+                raise ValueError
+            values = [
+                self._field(name).to_python(value)
+                for name, value in zip(self._names, payload['v'])
+            ]
+            return values, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _field(self, name):
+        return self._model._meta.get_field(name)
+
+    def _after(self, key_fields, values):
+        """Q selecting rows that come strictly after ``values`` in key order."""
+        condition = Q()
+        for index in reversed(range(len(key_fields))):
+            name = key_fields[index].lstrip('-')
+            lookup = 'lt' if key_fields[index].startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[index]})
+            if index < len(key_fields) - 1:
+                step |= Q(**{name: values[index]}) & condition
+            condition = step
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self._model = queryset.model
+        key_fields = self.get_key_fields(request)
+        self._names = [name.lstrip('-') for name in key_fields]
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes'):
+            self.count = queryset.count()
+
+        reverse = bool(cursor and cursor[1])
+        if reverse:
+            # Walk backwards from the cursor, then restore display order
+            key_fields = [name[1:] if name.startswith('-') else f'-{name}' for name in key_fields]
+        rows = self.fetch_rows(queryset, key_fields, cursor[0] if cursor else None, page_size + 1)
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = rows
+        return rows
+
+    def fetch_rows(self, queryset, key_fields, after, limit):
+        """Return up to ``limit`` rows that follow the ``after`` key values in key order."""
+        queryset = queryset.order_by(*key_fields)
+        if after is not None:
+            queryset = queryset.filter(self._after(key_fields, after))
+        return list(queryset[:limit])
+
+    def get_next_cursor(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_cursor(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        next_cursor = self.get_next_cursor()
+        previous_cursor = self.get_previous_cursor()
+        response = {
+            'next': self._link(next_cursor),
+            'previous': self._link(previous_cursor),
+            'next_cursor': next_cursor,
+            'previous_cursor': previous_cursor,
+            'has_next': self.has_next,
+            'has_previous': self.has_previous,
+            'results': data,
+        }
+        if self.count is not None:
+            response['count'] = self.count
+        return Response(response)
+
+
+class ArtWorkKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination for artwork feeds (infinite scroll, recent).
+
+    Supports ordering by creation date and by the stored popularity counters.
+    """
+    page_size = 8
+    max_page_size = 24
+    ordering_fields = ['created_at', 'likes_count', 'critiques_count', 'popularity_score']
+
+
+class CritiqueKeysetPagination(KeysetPagination):
+    """Keyset pagination for critique lists."""
+    page_size = 20
+    max_page_size = 100
+    ordering_fields = ['created_at', 'updated_at']
+
+
+class NotificationHistoryPagination(KeysetPagination):
+    """
+    Keyset pagination across live and archived notifications.
+
+    The view's get_archive_queryset() supplies archived rows. Both tables are
+    read with the same cursor and the pages merged by (created_at, id), so
+    clients scroll past the retention cutoff without noticing that older
+    notifications live elsewhere. Archived rows keep their notification ID,
+    which keeps the key unique across the two tables.
+    """
+    page_size = 20
+    max_page_size = 100
+    ordering_query_param = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self._archive = view.get_archive_queryset()
+        rows = super().paginate_queryset(queryset, request, view)
+        if self.count is not None:
+            self.count += self._archive.count()
+        return rows
+
+    def fetch_rows(self, queryset, key_fields, after, limit):
+        rows = super().fetch_rows(queryset, key_fields, after, limit)
+        rows += super().fetch_rows(self._archive, key_fields, after, limit)
+        rows.sort(
+            key=lambda row: [getattr(row, name) for name in self._names],
+            reverse=key_fields[0].startswith('-'),
+        )
+        return rows[:limit]
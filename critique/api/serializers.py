@@ -2,11 +2,18 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from critique.models import (
-    ArtWork, ArtWorkVersion, Profile, Critique, Notification, Reaction, 
+    ArtWork, ArtWorkVersion, Profile, Critique, Notification, ArchivedNotification, Reaction, 
     CritiqueReply, Folder, AchievementBadge, UserAchievement,
     Tag, QuickCrit, QuickCritTag, PairSession
 )
+from critique.api.loaders import (
+    RECENT_CRITIQUES_LIMIT, LikedArtworkLoader, PrimingListSerializer, ReactionSummaryLoader,
+    recent_critiques_queryset
+)
 from critique.api.missing_image_handler import get_image_url
+from critique.feed_chips import bump_chips_version
+from critique.feed_pool import candidate_pool
+from critique.notification import describe_target, prefetch_targets
 
 class ProfileSerializer(serializers.ModelSerializer):
     """Serializer for the user Profile model."""
@@ -31,8 +38,7 @@ class ProfileSerializer(serializers.ModelSerializer):
         
     def get_unread_notifications_count(self, obj):
         """Return the count of unread notifications for the user."""
-        from critique.models import Notification
-        return Notification.objects.filter(recipient=obj.user, is_read=False).count()
+        return obj.unread_notifications_count
         
 class ProfileUpdateSerializer(serializers.ModelSerializer):
     """Serializer for updating user profile information."""
@@ -111,8 +117,9 @@ class UserProfileSerializer(serializers.ModelSerializer):
         
     def get_unread_notifications_count(self, obj):
         """Return the count of unread notifications for the user."""
-        from critique.models import Notification
-        return Notification.objects.filter(recipient=obj, is_read=False).count()
+        if hasattr(obj, 'profile'):
+            return obj.profile.unread_notifications_count
+        return 0
 
 class ArtWorkVersionSerializer(serializers.ModelSerializer):
     """Serializer for artwork versions."""
@@ -148,19 +155,24 @@ class ArtWorkSerializer(serializers.ModelSerializer):
     critiques = serializers.SerializerMethodField()
     folder_name = serializers.CharField(source='folder.name', read_only=True)
     folder_slug = serializers.CharField(source='folder.slug', read_only=True)
+    tags_list = serializers.ListField(child=serializers.CharField(), read_only=True)
     
     class Meta:
         model = ArtWork
         fields = [
             'id', 'title', 'description', 'image', 'image_url', 'image_display_url',
-            'created_at', 'updated_at', 'author', 'medium', 'dimensions', 'tags', 
+            'created_at', 'updated_at', 'author', 'medium', 'dimensions', 'tags', 'tags_list',
             'folder', 'folder_name', 'folder_slug',
             'likes_count', 'critiques_count', 'is_liked', 'critiques'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'author', 
                            'likes_count', 'critiques_count', 
                            'is_liked', 'image_display_url', 'critiques',
-                           'folder_name', 'folder_slug']
+                           'folder_name', 'folder_slug', 'tags_list']
+        list_serializer_class = PrimingListSerializer
+
+    def prime_loaders(self, artworks):
+        LikedArtworkLoader.for_context(self.context).prime(artwork.pk for artwork in artworks)
                            
     def get_image_display_url(self, obj):
         """Return the URL to display the image, prioritizing current_version."""
@@ -168,28 +180,27 @@ class ArtWorkSerializer(serializers.ModelSerializer):
     
     def get_likes_count(self, obj):
         """Return the number of likes for this artwork."""
-        return obj.likes.count()
+        return obj.likes_count
     
         
     def get_critiques_count(self, obj):
         """Return the number of critiques for this artwork."""
-        return obj.critiques.count()
+        return obj.critiques_count
     
     def get_critiques(self, obj):
         """Return the critiques for this artwork."""
         # For detail view, include critiques with the artwork
         if self.context.get('view') and self.context['view'].action == 'retrieve':
-            critiques = obj.critiques.all().order_by('-created_at')[:5]  # Limit to the 5 most recent critiques
-            from .serializers import CritiqueListSerializer
+            # ArtWorkViewSet prefetches these as recent_critiques
+            critiques = getattr(obj, 'recent_critiques', None)
+            if critiques is None:
+                critiques = recent_critiques_queryset().filter(artwork=obj)[:RECENT_CRITIQUES_LIMIT]
             return CritiqueListSerializer(critiques, many=True, context=self.context).data
         return None
     
     def get_is_liked(self, obj):
         """Return whether the current user has liked this artwork."""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.likes.filter(id=request.user.id).exists()
-        return False
+        return LikedArtworkLoader.for_context(self.context).get(obj.pk)
     
     def validate_folder(self, value):
         """Validate that the user can only assign artwork to their own folders."""
@@ -241,13 +252,11 @@ class ArtWorkListSerializer(serializers.ModelSerializer):
         
     def get_likes_count(self, obj):
         """Return the number of likes for this artwork."""
-        return obj.likes.count()
+        return obj.likes_count
     
     def get_tags_list(self, obj):
-        """Return the tags as a list."""
-        if not obj.tags:
-            return []
-        return [tag.strip() for tag in obj.tags.split(',') if tag.strip()]
+        """Return the normalized tags as a list of labels."""
+        return obj.tags_list
 
 
 
@@ -283,12 +292,7 @@ class CritiqueSerializer(serializers.ModelSerializer):
     
     def get_reactions_count(self, obj):
         """Return the total count of all reactions for this critique."""
-        return {
-            'HELPFUL': obj.reactions.filter(reaction_type='HELPFUL').count(),
-            'INSPIRING': obj.reactions.filter(reaction_type='INSPIRING').count(),
-            'DETAILED': obj.reactions.filter(reaction_type='DETAILED').count(),
-            'TOTAL': obj.reactions.count()
-        }
+        return dict(ReactionSummaryLoader.for_context(self.context).counts(obj))
     
     def get_can_hide(self, obj):
         """Return true if the current user can hide this critique (artwork owner)."""
@@ -321,6 +325,10 @@ class CritiqueSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at', 'replies', 'is_hidden_from_public', 
             'hidden_reason', 'is_flagged', 'can_hide', 'can_reply'
         ]
+        list_serializer_class = PrimingListSerializer
+
+    def prime_loaders(self, critiques):
+        ReactionSummaryLoader.for_context(self.context).prime(critique.pk for critique in critiques)
     
     def get_author_profile_url(self, obj):
         """Return a URL to the author's profile."""
@@ -332,23 +340,19 @@ class CritiqueSerializer(serializers.ModelSerializer):
         
     def get_helpful_count(self, obj):
         """Return the count of HELPFUL reactions for this critique."""
-        return obj.reactions.filter(reaction_type='HELPFUL').count()
+        return ReactionSummaryLoader.for_context(self.context).counts(obj)['HELPFUL']
         
     def get_inspiring_count(self, obj):
         """Return the count of INSPIRING reactions for this critique."""
-        return obj.reactions.filter(reaction_type='INSPIRING').count()
+        return ReactionSummaryLoader.for_context(self.context).counts(obj)['INSPIRING']
         
     def get_detailed_count(self, obj):
         """Return the count of DETAILED reactions for this critique."""
-        return obj.reactions.filter(reaction_type='DETAILED').count()
+        return ReactionSummaryLoader.for_context(self.context).counts(obj)['DETAILED']
         
     def get_user_reactions(self, obj):
         """Return a list of reaction types the current user has given to this critique."""
-        user = self.context.get('request').user
-        if not user or user.is_anonymous:
-            return []
-            
-        return list(obj.reactions.filter(user=user).values_list('reaction_type', flat=True))
+        return list(ReactionSummaryLoader.for_context(self.context).user_reactions(obj))
     
     def create(self, validated_data):
         """Create a new critique with the current user as author."""
@@ -374,12 +378,7 @@ class CritiqueListSerializer(serializers.ModelSerializer):
     
     def get_reactions_count(self, obj):
         """Return the total count of all reactions for this critique."""
-        return {
-            'HELPFUL': obj.reactions.filter(reaction_type='HELPFUL').count(),
-            'INSPIRING': obj.reactions.filter(reaction_type='INSPIRING').count(),
-            'DETAILED': obj.reactions.filter(reaction_type='DETAILED').count(),
-            'TOTAL': obj.reactions.count()
-        }
+        return dict(ReactionSummaryLoader.for_context(self.context).counts(obj))
     
     def get_can_hide(self, obj):
         """Return true if the current user can hide this critique (artwork owner)."""
@@ -397,6 +396,9 @@ class CritiqueListSerializer(serializers.ModelSerializer):
     
     def get_has_replies(self, obj):
         """Return true if this critique has any replies."""
+        # Annotated by with_reply_flag() where the queryset is built for lists
+        if hasattr(obj, 'reply_exists'):
+            return obj.reply_exists
         return obj.replies.exists()
     
     class Meta:
@@ -408,6 +410,10 @@ class CritiqueListSerializer(serializers.ModelSerializer):
             'user_reactions', 'created_at', 'is_hidden_from_public',
             'can_hide', 'can_reply', 'has_replies'
         ]
+        list_serializer_class = PrimingListSerializer
+
+    def prime_loaders(self, critiques):
+        ReactionSummaryLoader.for_context(self.context).prime(critique.pk for critique in critiques)
     
     def get_average_score(self, obj):
         """Return the average score for this critique."""
@@ -415,23 +421,19 @@ class CritiqueListSerializer(serializers.ModelSerializer):
         
     def get_helpful_count(self, obj):
         """Return the count of HELPFUL reactions for this critique."""
-        return obj.reactions.filter(reaction_type='HELPFUL').count()
+        return ReactionSummaryLoader.for_context(self.context).counts(obj)['HELPFUL']
         
     def get_inspiring_count(self, obj):
         """Return the count of INSPIRING reactions for this critique."""
-        return obj.reactions.filter(reaction_type='INSPIRING').count()
+        return ReactionSummaryLoader.for_context(self.context).counts(obj)['INSPIRING']
         
     def get_detailed_count(self, obj):
         """Return the count of DETAILED reactions for this critique."""
-        return obj.reactions.filter(reaction_type='DETAILED').count()
+        return ReactionSummaryLoader.for_context(self.context).counts(obj)['DETAILED']
         
     def get_user_reactions(self, obj):
         """Return a list of reaction types the current user has given to this critique."""
-        user = self.context.get('request').user
-        if not user or user.is_anonymous:
-            return []
-            
-        return list(obj.reactions.filter(user=user).values_list('reaction_type', flat=True))
+        return list(ReactionSummaryLoader.for_context(self.context).user_reactions(obj))
         
         
 class ReactionSerializer(serializers.ModelSerializer):
@@ -486,20 +488,30 @@ class NotificationSerializer(serializers.ModelSerializer):
     target_type = serializers.SerializerMethodField()
     target_id = serializers.SerializerMethodField()
     target_display = serializers.SerializerMethodField()
+    archived = serializers.SerializerMethodField()
     
     class Meta:
         model = Notification
         fields = [
             'id', 'recipient', 'recipient_username', 'message', 
             'target_type', 'target_id', 'target_display', 'url',
-            'created_at', 'is_read'
+            'created_at', 'is_read', 'kind', 'actor_count', 'archived'
         ]
-        read_only_fields = ['id', 'recipient', 'recipient_username', 'created_at']
+        read_only_fields = ['id', 'recipient', 'recipient_username', 'created_at', 'kind', 'actor_count']
+        list_serializer_class = PrimingListSerializer
+
+    def prime_loaders(self, notifications):
+        # Pages sliced from a with_targets() queryset are already loaded
+        prefetch_targets(
+            notification for notification in notifications
+            if not Notification.target.is_cached(notification)
+        )
     
     def get_target_type(self, obj):
         """Get the target content type name if available."""
-        if obj.target_content_type:
-            return obj.target_content_type.model
+        if obj.target_content_type_id:
+            # get_for_id is served from ContentType's process-wide cache
+            return ContentType.objects.get_for_id(obj.target_content_type_id).model
         return None
     
     def get_target_id(self, obj):
@@ -508,21 +520,13 @@ class NotificationSerializer(serializers.ModelSerializer):
     
     def get_target_display(self, obj):
         """Get a human-readable representation of the target."""
-        if not obj.target:
-            return None
-            
-        # Handle different types of target objects
-        if isinstance(obj.target, ArtWork):
-            return f"Artwork: {obj.target.title}"
-        elif isinstance(obj.target, Critique):
-            return f"Critique on: {obj.target.artwork.title}"
-        elif isinstance(obj.target, Reaction):
-            return f"Reaction on critique for: {obj.target.critique.artwork.title}"
-        elif isinstance(obj.target, User):
-            return f"User: {obj.target.username}"
-        
-        # Default fallback
-        return str(obj.target)
+        # Querysets built with critique.notification.with_targets() have the
+        # targets prefetched; otherwise this is a lookup per notification
+        return describe_target(obj.target)
+    
+    def get_archived(self, obj):
+        """Whether the notification was moved to the archive (see /history/)."""
+        return isinstance(obj, ArchivedNotification)
 
 # ============================================================================
 # FOLDER SERIALIZERS FOR PORTFOLIO MANAGEMENT
@@ -581,7 +585,11 @@ class FolderSerializer(serializers.ModelSerializer):
     def get_artworks(self, obj):
         """Return the artworks in this folder."""
         # Use ArtWorkListSerializer to avoid circular imports and provide efficient listing
-        artworks = obj.artworks.all().order_by('-created_at')
+        artworks = (
+            obj.artworks.select_related('author', 'folder', 'current_version')
+            .prefetch_related('normalized_tags')
+            .order_by('-created_at')
+        )
         return ArtWorkListSerializer(artworks, many=True, context=self.context).data
 
 class FolderListSerializer(serializers.ModelSerializer):
@@ -717,8 +725,142 @@ class ArtworkCardSerializer(serializers.ModelSerializer):
         return obj.get_display_image_url()
 
 
+def _parse_new_tag(raw):
+    """Split a new tag entry into (label, polarity), or None if it is empty."""
+    raw = raw.strip()
+    if not raw:
+        return None
+
+    # Determine polarity from prefix (+/-) or default to CON (constructive)
+    polarity = Tag.PRO if raw.startswith("+") else Tag.CON
+    label = raw.lstrip("+-").strip()[:64]
+    return (label, polarity) if label else None
+
+
+def resolve_new_tags(raw_tags):
+    """
+    Resolve new tag entries to tag IDs, creating the tags that don't exist yet.
+
+    Labels match existing tags case-insensitively. All entries are resolved
+    with one lookup query, plus one insert and one re-read if any are new.
+
+    Args:
+        raw_tags: Tag entries as submitted, e.g. "+clean linework"
+
+    Returns:
+        Dictionary mapping lowercased label to tag ID
+    """
+    from django.db.models.functions import Lower
+
+    wanted = {}
+    for raw in raw_tags:
+        parsed = _parse_new_tag(raw)
+        if parsed:
+            wanted.setdefault(parsed[0].lower(), parsed)
+    if not wanted:
+        return {}
+
+    def lookup(labels):
+        rows = (
+            Tag.objects.annotate(label_lower=Lower("label"))
+            .filter(label_lower__in=labels)
+            .values_list("label_lower", "id")
+        )
+        return dict(rows)
+
+    resolved = lookup(list(wanted))
+    missing = [key for key in wanted if key not in resolved]
+    if missing:
+        Tag.objects.bulk_create(
+            [
+                Tag(label=wanted[key][0], polarity=wanted[key][1], is_system=False)
+                for key in missing
+            ],
+            ignore_conflicts=True,
+        )
+        resolved.update(lookup(missing))
+        # bulk_create skips the Tag signals, so invalidate the feed chips here
+        bump_chips_version()
+    return resolved
+
+
+def _quick_crit_tag_ids(tag_ids, new_tags, resolved):
+    """Combine explicit tag IDs with the resolved IDs of new tag entries."""
+    ids = set(tag_ids)
+    for raw in new_tags:
+        parsed = _parse_new_tag(raw)
+        if parsed and parsed[0].lower() in resolved:
+            ids.add(resolved[parsed[0].lower()])
+    return ids
+
+
+class _BatchArtworkField(serializers.PrimaryKeyRelatedField):
+    """Artwork field that reuses artworks loaded in bulk for a batch payload."""
+
+    def to_internal_value(self, data):
+        artworks = self.context.get("batch_artworks")
+        if artworks is not None:
+            try:
+                return artworks[int(data)]
+            except (KeyError, TypeError, ValueError):
+                pass
+        return super().to_internal_value(data)
+
+
+class QuickCritListSerializer(serializers.ListSerializer):
+    """
+    Batch creation of quick critiques.
+
+    Artworks are validated with one query, new tag labels are resolved
+    together, and the critiques and their tag rows are written with
+    bulk_create, so the cost of a batch doesn't grow with its size.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            artwork_ids = set()
+            for item in data:
+                try:
+                    artwork_ids.add(int(item.get("artwork")))
+                except (AttributeError, TypeError, ValueError):
+                    continue
+            self.context["batch_artworks"] = ArtWork.objects.in_bulk(artwork_ids)
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        from django.db import transaction
+
+        user = self.context["request"].user
+        resolved = resolve_new_tags(
+            [raw for item in validated_data for raw in item.get("new_tags", [])]
+        )
+
+        crits = []
+        crit_tag_ids = []
+        for item in validated_data:
+            item = dict(item)
+            tag_ids = item.pop("tag_ids", [])
+            new_tags = item.pop("new_tags", [])
+            crits.append(QuickCrit(author=user, **item))
+            crit_tag_ids.append(_quick_crit_tag_ids(tag_ids, new_tags, resolved))
+
+        with transaction.atomic():
+            QuickCrit.objects.bulk_create(crits)
+            QuickCritTag.objects.bulk_create([
+                QuickCritTag(quickcrit=qc, tag_id=tid)
+                for qc, tag_ids in zip(crits, crit_tag_ids)
+                for tid in tag_ids
+            ])
+
+        # bulk_create skips post_save, so update the feed pool here
+        for qc in crits:
+            candidate_pool.adjust_need(qc.artwork_id, 1)
+        return crits
+
+
 class QuickCritSerializer(serializers.ModelSerializer):
     """Serializer for quick critiques with tag handling."""
+    artwork = _BatchArtworkField(queryset=ArtWork.objects.all())
     tag_ids = serializers.ListField(
         child=serializers.IntegerField(), 
         write_only=True, 
@@ -738,6 +880,7 @@ class QuickCritSerializer(serializers.ModelSerializer):
         model = QuickCrit
         fields = ["id", "artwork", "note", "summary", "tag_ids", "new_tags", "tags", "author_name", "created_at"]
         read_only_fields = ["id", "summary", "tags", "author_name", "created_at"]
+        list_serializer_class = QuickCritListSerializer
 
     def create(self, validated_data):
         """Create a new quick critique with tags."""
@@ -748,35 +891,13 @@ class QuickCritSerializer(serializers.ModelSerializer):
         # Create the quick critique
         qc = QuickCrit.objects.create(author=user, **validated_data)
 
-        # Attach existing tags
+        # Attach existing and new tags
+        tag_ids = _quick_crit_tag_ids(tag_ids, new_tags, resolve_new_tags(new_tags))
         if tag_ids:
-            from critique.models import QuickCritTag
             QuickCritTag.objects.bulk_create([
-                QuickCritTag(quickcrit=qc, tag_id=tid) for tid in set(tag_ids)
+                QuickCritTag(quickcrit=qc, tag_id=tid) for tid in tag_ids
             ])
 
-        # Create and attach new tags
-        for raw in new_tags:
-            raw = raw.strip()
-            if not raw:
-                continue
-            
-            # Determine polarity from prefix (+/-) or default to CON (constructive)
-            polarity = Tag.PRO if raw.startswith("+") else Tag.CON if raw.startswith("-") else Tag.CON
-            label = raw.lstrip("+-").strip()[:64]
-            
-            if label:
-                from critique.models import Tag, QuickCritTag
-                tag, _ = Tag.objects.get_or_create(
-                    label__iexact=label, 
-                    defaults={
-                        "label": label, 
-                        "polarity": polarity, 
-                        "is_system": False
-                    }
-                )
-                QuickCritTag.objects.get_or_create(quickcrit=qc, tag=tag)
-
         return qc
 
 
@@ -804,4 +925,4 @@ class ArtworkCardSerializer(serializers.ModelSerializer):
     
     def get_critique_count(self, obj):
         """Return the number of critiques this artwork has received."""
-        return obj.critiques.count() + getattr(obj, 'quick_crits', obj.quick_crits).count()
\ No newline at end of file
+        return obj.critiques_count + getattr(obj, 'quick_crits', obj.quick_crits).count()
\ No newline at end of file
@@ -11,7 +11,7 @@ from .views import (
     AchievementBadgeViewSet, UserAchievementViewSet, user_badge_overview, trigger_badge_check, badge_leaderboard
 )
 from .move_artwork import move_artwork_to_folder
-from .feed_views import feed_next_pair, QuickCritViewSet, TagViewSet
+from .feed_views import feed_next_pair, feed_queue_metrics, QuickCritViewSet, TagViewSet
 
 # Create a router and register our viewsets with it
 router = DefaultRouter()
@@ -35,6 +35,7 @@ urlpatterns = [
     
     # Two-at-a-time critique feed endpoints
     path('feed/next/', feed_next_pair, name='feed-next'),
+    path('feed/metrics/', feed_queue_metrics, name='feed-metrics'),
     
     # Achievement system endpoints - must be before router to prevent conflicts
     path('badges/overview/', user_badge_overview, name='user-badge-overview'),
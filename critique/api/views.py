@@ -7,7 +7,12 @@ from django.db import models
 from django.db.models import Max
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from critique.models import ArtWork, ArtWorkVersion, Profile, Critique, Reaction, Notification, CritiqueReply, Folder, AchievementBadge, UserAchievement
+from critique.models import ArtWork, ArtWorkVersion, Profile, Critique, Reaction, Notification, ArchivedNotification, CritiqueReply, Folder, AchievementBadge, UserAchievement
+from critique.artwork_tags import MATCH_ALL, MATCH_ANY, filter_by_tags, tag_facets
+from critique.feed_pool import candidate_pool
+from critique.feed_queue import restore_artwork, revoke_artwork
+from critique.notification import with_targets
+from critique.unread_counts import get_unread_count, mark_read, mark_unread
 from .serializers import (
     UserSerializer, ProfileSerializer, ProfileUpdateSerializer, ArtWorkSerializer, ArtWorkVersionSerializer,
     ArtWorkListSerializer, CritiqueSerializer, CritiqueListSerializer,
@@ -15,12 +20,16 @@ from .serializers import (
     FolderSerializer, FolderListSerializer, FolderCreateUpdateSerializer,
     AchievementBadgeSerializer, UserAchievementSerializer, UserBadgeOverviewSerializer
 )
+from .loaders import recent_critiques_prefetch, with_reply_flag
 from .permissions import (
     IsAuthorOrReadOnly, IsOwnerOrReadOnly, IsModeratorOrOwner, 
     IsModeratorOrAdmin, IsAdminOnly
 )
-from .filters import ArtWorkFilter, CritiqueFilter
-from .pagination import CustomPageNumberPagination, InfiniteScrollPagination
+from .filters import ArtWorkFilter, ArtWorkSearchFilter, CritiqueFilter
+from .pagination import (
+    CustomPageNumberPagination,
+    ArtWorkKeysetPagination, CritiqueKeysetPagination, NotificationHistoryPagination,
+)
 from django.db import connection
 
 class ProfileViewSet(viewsets.ModelViewSet):
@@ -110,10 +119,12 @@ class ArtWorkViewSet(viewsets.ModelViewSet):
     - Only the artwork's author or users with MODERATOR/ADMIN role can delete it (DELETE)
 
     Search and Filtering:
-    - Search: ?search=query (searches title, description, tags, author username)
+    - Search: ?search=query (full-text over title, tags, author username and description,
+      ranked by relevance unless ?ordering= is given)
     - Filter by author: ?author=user_id or ?author__username=username
     - Filter by medium: ?medium=acrylic
-    - Filter by tags: ?tags=landscape
+    - Filter by tags: ?tags=landscape,oil (all tags) or ?tags=landscape,oil&tags_match=any
+    - Tag counts for the current filters: /api/artworks/tag_facets/
     - Filter by date: ?created_after=2024-01-01&created_before=2024-12-31
     - Filter by popularity: ?min_likes=5&min_critiques=3
     - Ordering: ?ordering=-created_at (prefix with - for descending)
@@ -127,7 +138,7 @@ class ArtWorkViewSet(viewsets.ModelViewSet):
     serializer_class = ArtWorkSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     pagination_class = CustomPageNumberPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, ArtWorkSearchFilter]
     filterset_class = ArtWorkFilter
     search_fields = ['title', 'description', 'tags', 'author__username']
     ordering_fields = ['created_at', 'updated_at', 'title', 'likes_count', 'critiques_count', 'popularity_score']
@@ -135,7 +146,7 @@ class ArtWorkViewSet(viewsets.ModelViewSet):
 
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     pagination_class = CustomPageNumberPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, ArtWorkSearchFilter]
     filterset_class = ArtWorkFilter
     search_fields = ['title', 'description', 'tags', 'author__username']
     ordering_fields = ['created_at', 'updated_at', 'title', 'likes_count', 'critiques_count', 'popularity_score']
@@ -143,17 +154,18 @@ class ArtWorkViewSet(viewsets.ModelViewSet):
     parser_classes = [parsers.MultiPartParser, parsers.FormParser, parsers.JSONParser]
 
     def get_queryset(self):
-        """Return queryset with popularity annotations and folder visibility filtering."""
-        from django.db.models import Count, Q
-
-        queryset = ArtWork.objects.annotate(
-            critiques_count=Count('critiques', distinct=True),
-            likes_count=Count('likes', distinct=True),
-            # Calculate popularity score: critiques * 2 + likes + reactions
-            popularity_score=Count('critiques', distinct=True) * 2 + 
-                           Count('likes', distinct=True) + 
-                           Count('critiques__reactions', distinct=True)
-        ).order_by('-created_at')
+        """Return queryset with folder visibility filtering."""
+        from django.db.models import Q
+
+        # likes_count, critiques_count and popularity_score are stored columns;
+        # is_liked and the author's notification count come from the serializer loaders
+        queryset = (
+            ArtWork.objects.select_related('author__profile', 'folder', 'current_version')
+            .prefetch_related('normalized_tags')
+            .order_by('-created_at')
+        )
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(recent_critiques_prefetch())
 
         # Filter out artworks in private folders unless user is the folder owner
         user = self.request.user
@@ -186,17 +198,20 @@ class ArtWorkViewSet(viewsets.ModelViewSet):
         Infinite scroll endpoint optimized for mobile and desktop gallery.
         
         Returns artwork data optimized for infinite scrolling with smaller page sizes
-        and efficient loading. Uses InfiniteScrollPagination for better UX.
+        and efficient loading. Uses keyset pagination, so deep pages cost the same
+        as the first one.
         
         Parameters:
-        - page: Page number to load
+        - cursor: Opaque cursor from the previous response's next_cursor
         - page_size: Number of items per page (max 24)
+        - ordering: -created_at (default), -popularity_score, -likes_count or -critiques_count
+        - include_count: Set to true to also return the total count
         - All standard filtering and search parameters apply
         
-        Example: /api/artworks/infinite-scroll/?page=2&search=landscape
+        Example: /api/artworks/infinite-scroll/?cursor=<next_cursor>&search=landscape
         """
-        # Use specialized pagination for infinite scroll
-        self.pagination_class = InfiniteScrollPagination
+        # Use keyset pagination for infinite scroll
+        self.pagination_class = ArtWorkKeysetPagination
         
         # Get the same filtered queryset as the main list
         queryset = self.filter_queryset(self.get_queryset())
@@ -354,8 +369,17 @@ class ArtWorkViewSet(viewsets.ModelViewSet):
         
         if action_type == 'publish':
             artworks.update(is_published=True)
+            # Queryset updates bypass signals, so rebuild the feed pool lazily
+            # and do what the post_save handler does for the feed queues
+            candidate_pool.invalidate()
+            for artwork_id in artworks.filter(visibility=ArtWork.VISIBILITY_PUBLIC).values_list('id', flat=True):
+                restore_artwork(artwork_id)
         elif action_type == 'draft':
+            drafted_ids = list(artworks.values_list('id', flat=True))
             artworks.update(is_published=False)
+            candidate_pool.invalidate()
+            for artwork_id in drafted_ids:
+                revoke_artwork(artwork_id)
         elif action_type == 'toggle_critique':
             for artwork in artworks:
                 artwork.seeking_critique = not artwork.seeking_critique
@@ -412,10 +436,13 @@ class ArtWorkViewSet(viewsets.ModelViewSet):
         Optimized for loading additional pages with minimal metadata
         for better performance in infinite scroll scenarios.
 
-        Usage: /api/artworks/infinite_scroll/?page=2&search=landscape&medium=oil
+        Pages are addressed by cursor (pass back next_cursor as ?cursor=) and
+        the total count is only computed when ?include_count=true is given.
+
+        Usage: /api/artworks/infinite_scroll/?cursor=<next_cursor>&search=landscape&medium=oil
         """
-        # Temporarily use infinite scroll pagination
-        self.pagination_class = InfiniteScrollPagination
+        # Use keyset pagination so deep pages don't need OFFSET or COUNT(*)
+        self.pagination_class = ArtWorkKeysetPagination
 
         # Apply the same filtering as the main list
         queryset = self.filter_queryset(self.get_queryset())
@@ -437,7 +464,12 @@ class ArtWorkViewSet(viewsets.ModelViewSet):
         Example: /api/artworks/5/critiques/
         """
         artwork = self.get_object()
-        critiques = artwork.critiques.all().order_by('-created_at')
+        # Reaction counts come from the serializer's batch loader
+        critiques = (
+            artwork.critiques.select_related('author__profile', 'artwork__author')
+            .prefetch_related('replies__author__profile')
+            .order_by('-created_at')
+        )
 
         # Apply pagination
         page = self.paginate_queryset(critiques)
@@ -500,9 +532,13 @@ class ArtWorkViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def by_tag(self, request):
         """
-        Filter artworks by tag.
+        Filter artworks by one or more tags (whole-tag, case-insensitive match).
+
+        Parameters:
+        - tag: A tag, or comma-separated tags
+        - match: all (default, artworks with every tag) or any
 
-        Example: /api/artworks/by_tag/?tag=landscape
+        Example: /api/artworks/by_tag/?tag=landscape,oil&match=any
         """
         tag = request.query_params.get('tag', None)
         if not tag:
@@ -511,8 +547,8 @@ class ArtWorkViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Look for tag in the comma-separated tags field
-        artworks = self.get_queryset().filter(tags__contains=tag)
+        match = MATCH_ANY if request.query_params.get('match') == MATCH_ANY else MATCH_ALL
+        artworks = filter_by_tags(self.get_queryset(), tag, match)
 
         page = self.paginate_queryset(artworks)
         if page is not None:
@@ -522,6 +558,25 @@ class ArtWorkViewSet(viewsets.ModelViewSet):
         serializer = ArtWorkListSerializer(artworks, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def tag_facets(self, request):
+        """
+        Count artworks per tag, after applying the usual search and filters.
+
+        Parameters:
+        - limit: Number of tags to return (default 20, max 100)
+        - All standard filtering and search parameters apply
+
+        Example: /api/artworks/tag_facets/?search=portrait&tags=oil
+        """
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            limit = 20
+
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response({'facets': tag_facets(queryset, limit=limit)})
+
     @action(detail=False, methods=['get'])
     def popular(self, request):
         """
@@ -529,11 +584,7 @@ class ArtWorkViewSet(viewsets.ModelViewSet):
 
         Example: /api/artworks/popular/
         """
-        # Annotate the queryset with the count of likes
-        from django.db.models import Count
-        artworks = self.get_queryset().annotate(
-            like_count=Count('likes')
-        ).order_by('-like_count')
+        artworks = self.get_queryset().order_by('-likes_count')
 
         # Get limit from query params, default to 10
         limit = request.query_params.get('limit', 10)
@@ -559,9 +610,12 @@ class ArtWorkViewSet(viewsets.ModelViewSet):
         """
         Get recently added artworks.
 
+        Returns `limit` artworks per page, newest first; follow next_cursor
+        for older ones.
+
         Example: /api/artworks/recent/?limit=5
         """
-        artworks = self.get_queryset().order_by('-created_at')
+        artworks = self.get_queryset()
 
         # Get limit from query params, default to 10
         limit = request.query_params.get('limit', 10)
@@ -572,15 +626,14 @@ class ArtWorkViewSet(viewsets.ModelViewSet):
         except ValueError:
             limit = 10
 
-        artworks = artworks[:limit]
-
-        page = self.paginate_queryset(artworks)
-        if page is not None:
-            serializer = ArtWorkListSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+        paginator = ArtWorkKeysetPagination()
+        paginator.page_size = min(limit, paginator.max_page_size)
+        paginator.page_size_query_param = None
+        paginator.ordering_query_param = None
 
-        serializer = ArtWorkListSerializer(artworks, many=True)
-        return Response(serializer.data)
+        page = paginator.paginate_queryset(artworks, request, view=self)
+        serializer = ArtWorkListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def user_artworks(self, request):
@@ -656,10 +709,14 @@ class CritiqueViewSet(viewsets.ModelViewSet):
     - Filter by reactions: ?min_helpful_reactions=5
     - Hide status: ?is_hidden=false (show only visible critiques)
     - Ordering: ?ordering=-created_at (prefix with - for descending)
+
+    Lists are keyset paginated: follow next_cursor / previous_cursor, and pass
+    ?include_count=true if the total is needed.
     """
     queryset = Critique.objects.all().order_by('-created_at')
     serializer_class = CritiqueSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = CritiqueKeysetPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = CritiqueFilter
     search_fields = ['text', 'author__username', 'artwork__title']
@@ -694,7 +751,12 @@ class CritiqueViewSet(viewsets.ModelViewSet):
         Filter critiques by artwork ID or author ID.
         Only show hidden critiques to the artwork owner and critique author.
         """
-        queryset = Critique.objects.all().order_by('-created_at')
+        # Reaction counts come from the serializers' batch loader
+        queryset = Critique.objects.select_related('author__profile', 'artwork__author').order_by('-created_at')
+        if self.action == 'list':
+            queryset = with_reply_flag(queryset)
+        else:
+            queryset = queryset.prefetch_related('replies__author__profile')
 
         # Filter by artwork
         artwork_id = self.request.query_params.get('artwork', None)
@@ -1373,31 +1435,50 @@ class NotificationViewSet(viewsets.ModelViewSet):
     - DELETE /api/notifications/{id}/ - Delete a notification
     - GET /api/notifications/unread/ - Get count of unread notifications
     - POST /api/notifications/mark-all-read/ - Mark all notifications as read
+    - GET /api/notifications/history/ - All notifications, including archived ones
     """
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        """Return only notifications for the current user."""
-        return Notification.objects.filter(recipient=self.request.user).order_by('-created_at')
+        """Return only notifications for the current user, with targets loaded in bulk."""
+        return with_targets(
+            Notification.objects.filter(recipient=self.request.user).select_related('recipient')
+        ).order_by('-created_at')
+
+    def get_archive_queryset(self):
+        """Return the current user's archived notifications, with targets loaded in bulk."""
+        return with_targets(
+            ArchivedNotification.objects.filter(recipient=self.request.user).select_related('recipient')
+        )
+
+    @action(detail=False, methods=['get'])
+    def history(self, request):
+        """
+        List the user's notifications newest first, continuing into the archive.
+
+        Read notifications older than NOTIFICATION_RETENTION_DAYS are moved to
+        the archive table; this endpoint pages through both with one cursor.
+
+        Parameters:
+        - cursor: Opaque cursor from the previous response's next_cursor
+        - page_size: Number of items per page (max 100)
+        - include_count: Set to true to also return the total count
+        """
+        self.pagination_class = NotificationHistoryPagination
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def unread(self, request):
         """Return count of unread notifications for the current user."""
-        count = Notification.objects.filter(
-            recipient=request.user,
-            is_read=False
-        ).count()
-
-        return Response({"unread_count": count})
+        return Response({"unread_count": get_unread_count(request.user)})
 
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """Mark all notifications for the current user as read."""
-        Notification.objects.filter(
-            recipient=request.user,
-            is_read=False
-        ).update(is_read=True)
+        mark_read(request.user)
 
         return Response({"status": "success", "message": "All notifications marked as read"})
 
@@ -1419,10 +1500,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
             )
 
         # Update only notifications that belong to the current user
-        update_count = Notification.objects.filter(
-            id__in=notification_ids,
-            recipient=request.user
-        ).update(is_read=True)
+        update_count = mark_read(request.user, notification_ids)
 
         return Response({
             "status": "success", 
@@ -1433,8 +1511,7 @@ class NotificationViewSet(viewsets.ModelViewSet):
     def mark_read(self, request, pk=None):
         """Mark a specific notification as read."""
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        mark_read(request.user, [notification.pk])
 
         return Response({
             "status": "success", 
@@ -1461,9 +1538,15 @@ class NotificationViewSet(viewsets.ModelViewSet):
 
         serializer = self.get_serializer(instance, data=data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
 
-        return Response(serializer.data)
+        # Flip the flag through the counter-aware helpers rather than save()
+        if serializer.validated_data['is_read']:
+            mark_read(request.user, [instance.pk])
+        else:
+            mark_unread(request.user, [instance.pk])
+        instance.refresh_from_db(fields=['is_read'])
+
+        return Response(self.get_serializer(instance).data)
 
 # ============================================================================
 # FOLDER VIEWSET FOR PORTFOLIO MANAGEMENT
@@ -1556,14 +1639,18 @@ class FolderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        artworks = folder.artworks.all().order_by('-created_at')
+        artworks = (
+            folder.artworks.select_related('author', 'folder', 'current_version')
+            .prefetch_related('normalized_tags')
+            .order_by('-created_at')
+        )
 
         # Use the existing ArtWorkListSerializer for consistency
         serializer = ArtWorkListSerializer(artworks, many=True, context={'request': request})
         return Response({
             'folder': FolderSerializer(folder, context={'request': request}).data,
             'artworks': serializer.data,
-            'count': artworks.count()
+            'count': len(serializer.instance)
         })
 
     @action(detail=True, methods=['post'])
@@ -0,0 +1,142 @@
+"""
+Normalized artwork tags.
+
+Artists still type tags as comma-separated text into ArtWork.tags; on save
+the text is parsed into ArtWorkTag rows linked through ArtWork.normalized_tags
+(see the signal handler in critique.signals). Queries go through the join
+table, whose tag_id index acts as an inverted index from tag to artworks:
+
+    filter_by_tags(qs, 'oil, landscape')              artworks with both tags
+    filter_by_tags(qs, 'oil, landscape', MATCH_ANY)   artworks with either tag
+    tag_facets(qs)                                    tag counts within qs
+
+Tags match whole, case-insensitively: "oil" no longer matches "foil".
+"""
+
+from django.db.models import Count
+
+from .models import ArtWork, ArtWorkTag
+
+MATCH_ALL = 'all'
+MATCH_ANY = 'any'
+
+MAX_TAG_LENGTH = ArtWorkTag._meta.get_field('name').max_length
+
+ArtWorkTagLink = ArtWork.normalized_tags.through
+
+
+def normalize_tag(raw):
+    """
+    Normalize one tag as typed.
+
+    Args:
+        raw: Tag text, e.g. " #Oil  Painting"
+
+    Returns:
+        Tuple of (name, label), e.g. ("oil painting", "Oil Painting");
+        name is empty if there is no tag
+    """
+    label = ' '.join(raw.strip().lstrip('#').split())[:MAX_TAG_LENGTH]
+    return label.lower(), label
+
+
+def parse_tags(value):
+    """
+    Parse tags given as comma-separated text or a list of strings.
+
+    Returns:
+        List of (name, label) tuples, deduplicated by name in input order
+    """
+    if isinstance(value, str):
+        value = value.split(',')
+
+    parsed = {}
+    for raw in value or ():
+        name, label = normalize_tag(raw)
+        if name and name not in parsed:
+            parsed[name] = label
+    return list(parsed.items())
+
+
+def resolve_tags(parsed):
+    """
+    Fetch the ArtWorkTag rows for parsed tags, creating any that are missing.
+
+    Args:
+        parsed: List of (name, label) tuples from parse_tags()
+
+    Returns:
+        List of ArtWorkTag instances
+    """
+    names = [name for name, _ in parsed]
+    if not names:
+        return []
+
+    tags = ArtWorkTag.objects.in_bulk(names, field_name='name')
+    missing = [ArtWorkTag(name=name, label=label) for name, label in parsed if name not in tags]
+    if missing:
+        # A concurrent save may create the same tags; the unique index arbitrates
+        ArtWorkTag.objects.bulk_create(missing, ignore_conflicts=True)
+        tags = ArtWorkTag.objects.in_bulk(names, field_name='name')
+    return [tags[name] for name in names if name in tags]
+
+
+def sync_artwork_tags(artwork):
+    """
+    Make artwork.normalized_tags match the artwork's tags text.
+
+    Args:
+        artwork: A saved ArtWork instance
+    """
+    artwork.normalized_tags.set(resolve_tags(parse_tags(artwork.tags)))
+    # Drop the cached labels so they are read again
+    artwork.__dict__.pop('tags_list', None)
+
+
+def filter_by_tags(queryset, tags, match=MATCH_ALL):
+    """
+    Filter an ArtWork queryset by exact tags in a single query.
+
+    Args:
+        queryset: ArtWork queryset to filter
+        tags: Comma-separated text or list of tags
+        match: MATCH_ALL (artwork has every tag) or MATCH_ANY (at least one)
+
+    Returns:
+        Filtered queryset; unchanged if no tags were given
+    """
+    names = [name for name, _ in parse_tags(tags)]
+    if not names:
+        return queryset
+
+    links = ArtWorkTagLink.objects.filter(artworktag__name__in=names)
+    if match == MATCH_ALL and len(names) > 1:
+        links = (
+            links.values('artwork_id')
+            .annotate(matched=Count('artworktag_id'))
+            .filter(matched=len(names))
+        )
+    return queryset.filter(pk__in=links.values('artwork_id'))
+
+
+def tag_facets(queryset, limit=20):
+    """
+    Count how many artworks in a queryset carry each tag.
+
+    Args:
+        queryset: ArtWork queryset, e.g. the current search results
+        limit: Maximum number of tags to return
+
+    Returns:
+        List of {"name", "label", "count"} dicts, most used first
+    """
+    rows = (
+        ArtWorkTagLink.objects.filter(artwork_id__in=queryset.order_by().values('pk'))
+        .values('artworktag__name', 'artworktag__label')
+        .annotate(count=Count('artwork_id'))
+        .order_by('-count', 'artworktag__name')[:limit]
+    )
+    return [
+        {'name': row['artworktag__name'], 'label': row['artworktag__label'], 'count': row['count']}
+        for row in rows
+    ]
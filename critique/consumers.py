@@ -7,10 +7,17 @@ communication for notifications and other live features.
 
 import json
 import logging
+from urllib.parse import parse_qs
+
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import User
+from django.utils import timezone
 from .models import Notification
+from .notification import with_targets
+from .notification_sync import fetch_changes, notification_payload, parse_cursor, sync_token
+from .outbox import user_group
+from .unread_counts import get_unread_count, mark_read
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +27,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     
     When a user connects, they join a group specific to their user ID.
     When notifications are created, they are sent to the appropriate user group.
+    Reconnecting clients send their sync cursor and receive only what changed
+    (see critique.notification_sync).
     """
 
     async def connect(self):
@@ -33,7 +42,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             return
 
         # Create unique group name for this user
-        self.user_group_name = f'user_notifications_{self.user.id}'
+        self.user_group_name = user_group(self.user.id)
 
         # Join user notification group
         await self.channel_layer.group_add(
@@ -50,12 +59,19 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             'user_id': self.user.id
         }))
         
-        # Send initial unread notification count
-        unread_count = await self.get_unread_notification_count()
-        await self.send(text_data=json.dumps({
-            'type': 'unread_count',
-            'count': unread_count
-        }))
+        # A reconnecting client can pass its cursor (?since=<sync_token> or
+        # ?last_id=<id>) and gets only what changed while it was away
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        since, last_id = query.get('since', [None])[0], query.get('last_id', [None])[0]
+        if since or last_id:
+            await self.send_changes(since, last_id)
+        else:
+            # Send initial unread notification count
+            unread_count = await self.get_unread_notification_count()
+            await self.send(text_data=json.dumps({
+                'type': 'unread_count',
+                'count': unread_count
+            }))
         
         logger.info(f"User {self.user.username} connected to notifications WebSocket")
 
@@ -91,13 +107,19 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                     'type': 'all_notifications_marked_read'
                 }))
                 
-            elif message_type == 'get_notifications':
-                # Send recent notifications
-                notifications = await self.get_recent_notifications()
-                await self.send(text_data=json.dumps({
-                    'type': 'notifications_list',
-                    'notifications': notifications
-                }))
+            elif message_type in ('sync', 'get_notifications'):
+                since, last_id = text_data_json.get('since'), text_data_json.get('last_id')
+                if since or last_id is not None:
+                    # Delta since the client's cursor
+                    await self.send_changes(since, last_id)
+                else:
+                    # Send recent notifications
+                    notifications, token = await self.get_recent_notifications()
+                    await self.send(text_data=json.dumps({
+                        'type': 'notifications_list',
+                        'notifications': notifications,
+                        'sync_token': token
+                    }))
                 
         except json.JSONDecodeError:
             await self.send(text_data=json.dumps({
@@ -105,12 +127,38 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 'message': 'Invalid JSON received'
             }))
 
+    async def send_changes(self, since, last_id):
+        """Send the delta since a client cursor as one or more notifications_delta frames."""
+        try:
+            cursor = parse_cursor(since, last_id)
+        except (TypeError, ValueError):
+            cursor = None
+        if cursor is None:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'Invalid sync cursor'
+            }))
+            return
+
+        started_at = timezone.now()
+        after = None
+        while True:
+            batch = await self.get_changes(cursor, after, started_at)
+            after = batch.pop('after', None)
+            await self.send(text_data=json.dumps({'type': 'notifications_delta', **batch}))
+            if not batch['has_more']:
+                break
+
     # Message handlers for different notification types
     async def notification_message(self, event):
         """Send notification to WebSocket."""
+        notification = event['notification']
+        # A coalesced notification is re-sent under the same ID; clients
+        # replace the one they already show
+        updated = notification.get('actor_count', 1) > 1
         await self.send(text_data=json.dumps({
-            'type': 'new_notification',
-            'notification': event['notification']
+            'type': 'notification_updated' if updated else 'new_notification',
+            'notification': notification
         }))
 
     async def unread_count_update(self, event):
@@ -124,50 +172,34 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def get_unread_notification_count(self):
         """Get count of unread notifications for the user."""
-        return Notification.objects.filter(
-            recipient=self.user,
-            is_read=False
-        ).count()
+        return get_unread_count(self.user)
 
     @database_sync_to_async
     def get_recent_notifications(self, limit=20):
-        """Get recent notifications for the user."""
-        notifications = Notification.objects.filter(
-            recipient=self.user
+        """Get recent notifications for the user, and a sync token for later deltas."""
+        token = sync_token(timezone.now())
+        # Targets are loaded with one query per target type
+        notifications = with_targets(
+            Notification.objects.filter(recipient=self.user).select_related('target_content_type')
         ).order_by('-created_at')[:limit]
-        
-        return [{
-            'id': notification.id,
-            'type': 'notification',  # Generic type since model doesn't have a type field
-            'title': 'Notification',  # Generic title
-            'message': notification.message,
-            'read': notification.is_read,
-            'created_at': notification.created_at.isoformat(),
-            'url': notification.url,
-            'target_id': notification.target_object_id,
-        } for notification in notifications]
+        return [notification_payload(notification) for notification in notifications], token
+
+    @database_sync_to_async
+    def get_changes(self, cursor, after, started_at):
+        """Get one batch of the delta since a sync cursor."""
+        return fetch_changes(self.user, cursor, after=after, started_at=started_at)
 
     @database_sync_to_async
     def mark_notification_read(self, notification_id):
         """Mark a specific notification as read."""
-        try:
-            notification = Notification.objects.get(
-                id=notification_id,
-                recipient=self.user
-            )
-            notification.is_read = True
-            notification.save()
+        if mark_read(self.user, [notification_id]):
             return True
-        except Notification.DoesNotExist:
-            return False
+        return Notification.objects.filter(id=notification_id, recipient=self.user).exists()
 
     @database_sync_to_async
     def mark_all_notifications_read(self):
         """Mark all notifications as read for the user."""
-        Notification.objects.filter(
-            recipient=self.user,
-            is_read=False
-        ).update(is_read=True)
+        mark_read(self.user)
 
 
 class NotificationBroadcastConsumer(AsyncWebsocketConsumer):
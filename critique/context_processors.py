@@ -1,7 +1,5 @@
 from django.contrib.sites.shortcuts import get_current_site
-from django.contrib.sessions.models import Session
-from django.utils import timezone
-from critique.models import KarmaEvent, Notification
+from critique.karma import pop_karma_toast
 
 def site_info(request):
     """
@@ -17,42 +15,19 @@ def site_info(request):
 
 def karma_notifications(request):
     """
-    Context processor to add recent karma notifications to the context
+    Context processor to add the pending karma toast to the context
     for all templates.
+    
+    award_karma() leaves a toast in the cache when it awards points; it is
+    shown once, on the user's next page. No queries are run here.
     """
     context = {}
     
     # Only show karma notifications for authenticated users
     if request.user.is_authenticated:
-        # Check if there's a recent karma event that hasn't been seen yet
-        # Use session to track which karma events have been shown
-        session_key = f"shown_karma_event_{request.user.id}"
-        last_shown_id = request.session.get(session_key, 0)
-        
-        # Get the most recent karma event that hasn't been shown yet
-        recent_event = KarmaEvent.objects.filter(
-            user=request.user, 
-            id__gt=last_shown_id
-        ).order_by('-created_at').first()
-        
-        if recent_event:
-            # Store this event as shown
-            request.session[session_key] = recent_event.id
-            
+        toast = pop_karma_toast(request.user.pk)
+        if toast:
             # Prepare notification for the template
-            context['karma_notification'] = {
-                'points': recent_event.points,
-                'reason': recent_event.reason or f"for {recent_event.action}"
-            }
-            
-            # Create a notification for the user if it doesn't exist yet
-            Notification.objects.get_or_create(
-                recipient=request.user,
-                message=f"You earned {recent_event.points} karma points for {recent_event.action}",
-                defaults={
-                    'url': '/profile/',
-                    'is_read': False
-                }
-            )
+            context['karma_notification'] = toast
     
-    return context
\ No newline at end of file
+    return context
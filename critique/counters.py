@@ -0,0 +1,133 @@
+"""
+Denormalized engagement counters on ArtWork.
+
+likes_count, critiques_count, reactions_count and popularity_score are stored
+on the artwork row so list views can filter and order by indexed columns
+instead of aggregating likes, critiques and reactions on every request.
+
+The signal handlers in critique.signals keep the counters current with
+single-row F() updates inside the triggering transaction. Bulk operations
+bypass signals, so the reconcile_artwork_counters management command can
+recompute every counter from the source tables.
+"""
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import ArtWork, Critique, Reaction
+
+# Popularity score weights
+CRITIQUE_WEIGHT = 2
+LIKE_WEIGHT = 1
+REACTION_WEIGHT = 1
+
+COUNTER_FIELDS = list(ArtWork.COUNTER_FIELDS)
+
+
+def _shifted(field, delta):
+    # Never go below zero, even if the stored counter has drifted
+    return Greatest(F(field) + delta, 0)
+
+
+def adjust_counters(artworks, likes=0, critiques=0, reactions=0):
+    """
+    Add deltas to the counters of one or more artworks.
+
+    Args:
+        artworks: ArtWork queryset, or a single artwork ID
+        likes: Change in likes
+        critiques: Change in critiques
+        reactions: Change in reactions
+
+    Returns:
+        Number of artwork rows updated
+    """
+    if not hasattr(artworks, 'update'):
+        artworks = ArtWork.objects.filter(pk=artworks)
+
+    updates = {}
+    if likes:
+        updates['likes_count'] = _shifted('likes_count', likes)
+    if critiques:
+        updates['critiques_count'] = _shifted('critiques_count', critiques)
+    if reactions:
+        updates['reactions_count'] = _shifted('reactions_count', reactions)
+
+    popularity = likes * LIKE_WEIGHT + critiques * CRITIQUE_WEIGHT + reactions * REACTION_WEIGHT
+    if popularity:
+        updates['popularity_score'] = _shifted('popularity_score', popularity)
+
+    if not updates:
+        return 0
+    return artworks.update(**updates)
+
+
+def _count_subquery(queryset, outer_field):
+    """Correlated COUNT(*) subquery over queryset grouped by outer_field."""
+    counts = (
+        queryset.filter(**{outer_field: OuterRef('pk')})
+        .order_by()
+        .values(outer_field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def counter_expressions():
+    """
+    Return expressions that compute every counter from the source tables.
+
+    Each counter is its own correlated subquery, so no join fan-out occurs.
+    """
+    likes = _count_subquery(ArtWork.likes.through.objects.all(), 'artwork_id')
+    critiques = _count_subquery(Critique.objects.all(), 'artwork_id')
+    reactions = _count_subquery(Reaction.objects.all(), 'critique__artwork_id')
+    return {
+        'likes_count': likes,
+        'critiques_count': critiques,
+        'reactions_count': reactions,
+        'popularity_score': (
+            likes * LIKE_WEIGHT + critiques * CRITIQUE_WEIGHT + reactions * REACTION_WEIGHT
+        ),
+    }
+
+
+def recount_counters(artworks):
+    """
+    Recompute the counters of the given artworks from the source tables.
+
+    Args:
+        artworks: ArtWork queryset, or an iterable of artwork IDs
+
+    Returns:
+        Number of artwork rows updated
+    """
+    if not hasattr(artworks, 'update'):
+        artworks = ArtWork.objects.filter(pk__in=list(artworks))
+    return artworks.update(**counter_expressions())
+
+
+def find_drift(artworks):
+    """
+    Return (artwork_id, stored, actual) tuples for artworks whose counters are wrong.
+
+    Args:
+        artworks: ArtWork queryset to check
+
+    Returns:
+        List of tuples; stored and actual are dicts keyed by counter field
+    """
+    actual_names = {field: f'actual_{field}' for field in COUNTER_FIELDS}
+    expressions = counter_expressions()
+    rows = artworks.annotate(
+        **{actual_names[field]: expressions[field] for field in COUNTER_FIELDS}
+    ).values('pk', *COUNTER_FIELDS, *actual_names.values())
+
+    drift = []
+    for row in rows:
+        stored = {field: row[field] for field in COUNTER_FIELDS}
+        actual = {field: row[actual_names[field]] for field in COUNTER_FIELDS}
+        if stored != actual:
+            drift.append((row['pk'], stored, actual))
+    return drift
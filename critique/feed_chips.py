@@ -0,0 +1,92 @@
+"""
+Versioned tag chip payload for the two-at-a-time critique feed.
+
+The PRO/CON chip lists sent with every feed pair are serialized once per tag
+table version and reused. The version lives in the shared cache and is bumped
+by the Tag save/delete signal handlers; the serialized payload is kept both in
+the shared cache and in a process-local copy, so the steady-state cost of the
+chips is a single cache read for the version.
+
+Clients that send back the version they already hold can be answered with the
+version alone.
+"""
+
+import threading
+import time
+
+from django.core.cache import cache
+
+from .models import Tag
+
+CHIPS_VERSION_KEY = 'feed:chips:version'
+CHIPS_PAYLOAD_KEY = 'feed:chips:{version}'
+
+_local_lock = threading.Lock()
+_local = {'version': None, 'chips': None}
+
+
+def _initial_version():
+    # Seeded from the clock so a flushed cache never hands out a version a
+    # client may still be holding from before the flush
+    return int(time.time() * 1000)
+
+
+def get_chips_version():
+    """Return the current tag table version."""
+    version = cache.get(CHIPS_VERSION_KEY)
+    if version is None:
+        cache.add(CHIPS_VERSION_KEY, _initial_version(), None)
+        version = cache.get(CHIPS_VERSION_KEY)
+    return version
+
+
+def bump_chips_version():
+    """Invalidate the cached chips after tags are created, changed or deleted."""
+    try:
+        cache.incr(CHIPS_VERSION_KEY)
+    except ValueError:
+        cache.set(CHIPS_VERSION_KEY, _initial_version(), None)
+
+
+def _build_chips():
+    """Serialize every tag into PRO and CON chip lists with one query."""
+    from .api.serializers import TagSerializer
+
+    chips = {'pro': [], 'con': []}
+    tags = Tag.objects.order_by('is_system', 'category', 'label')
+    for tag_data in TagSerializer(tags, many=True).data:
+        if tag_data['polarity'] == Tag.PRO:
+            chips['pro'].append(tag_data)
+        elif tag_data['polarity'] == Tag.CON:
+            chips['con'].append(tag_data)
+    return chips
+
+
+def get_chips(version=None):
+    """
+    Return the serialized chip payload for a tag table version.
+
+    Args:
+        version: Version to load; defaults to the current version
+
+    Returns:
+        Dictionary with "pro" and "con" lists of serialized tags
+    """
+    if version is None:
+        version = get_chips_version()
+
+    with _local_lock:
+        if _local['version'] == version:
+            return _local['chips']
+
+    key = CHIPS_PAYLOAD_KEY.format(version=version)
+    chips = cache.get(key)
+    if chips is None:
+        chips = _build_chips()
+        # Older versions are never read again, so let them expire
+        cache.set(key, chips, 60 * 60 * 24)
+
+    with _local_lock:
+        _local['version'] = version
+        _local['chips'] = chips
+    return chips
@@ -0,0 +1,287 @@
+"""
+Candidate pool for the two-at-a-time critique feed.
+
+Keeps a compact, ranked in-memory index of every public published artwork
+(ID, author, medium, creation time and quick critique count) so the feed can
+pick pairs without annotating and sorting the ArtWork table on every swipe.
+
+The pool is built lazily once per process and then maintained incrementally
+by the signal handlers in critique.signals. A periodic rebuild
+(FEED_POOL_REFRESH_SECONDS) lets worker processes converge on changes that
+were applied in other processes.
+"""
+
+import bisect
+import threading
+import time
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.db.models import Count
+
+from .models import ArtWork
+
+# One ranked entry per eligible artwork. "crit_count" is the critique need:
+# the fewer quick critiques an artwork has, the earlier it is served.
+PoolEntry = namedtuple(
+    'PoolEntry',
+    ['artwork_id', 'author_id', 'medium', 'created_ts', 'crit_count']
+)
+
+
+def _rank_key(entry):
+    """Sort key: fewest quick critiques first, newest first among equals."""
+    return (entry.crit_count, -entry.created_ts, entry.artwork_id)
+
+
+def is_feed_eligible(artwork):
+    """Return True if the artwork may appear in the critique feed."""
+    return artwork.is_published and artwork.visibility == ArtWork.VISIBILITY_PUBLIC
+
+
+class CandidatePool:
+    """
+    Ranked index of feed-eligible artworks ordered by critique need.
+
+    Entries live in a dict keyed by artwork ID, and their rank keys live in a
+    sorted list, so lookups are O(1), updates are O(log n) searches and
+    reading the top of the ranking only touches the entries it returns.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}   # artwork_id -> PoolEntry
+        self._ranked = []    # sorted list of _rank_key(entry)
+        self._medium_counts = Counter()
+        self._loaded_at = None
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    @property
+    def is_loaded(self):
+        return self._loaded_at is not None
+
+    def _is_stale(self):
+        if self._loaded_at is None:
+            return True
+        refresh_seconds = getattr(settings, 'FEED_POOL_REFRESH_SECONDS', 300)
+        return refresh_seconds and time.monotonic() - self._loaded_at > refresh_seconds
+
+    def ensure_loaded(self):
+        """Build the pool if it has never been built or has gone stale."""
+        if self._is_stale():
+            self.rebuild()
+
+    def rebuild(self):
+        """Rebuild the pool from the database with a single aggregate query."""
+        rows = (
+            ArtWork.objects.filter(
+                is_published=True,
+                visibility=ArtWork.VISIBILITY_PUBLIC,
+            )
+            .annotate(crit_count=Count('quick_crits'))
+            .values_list('id', 'author_id', 'medium', 'created_at', 'crit_count')
+        )
+        self.load(
+            PoolEntry(artwork_id, author_id, medium or '', created_at.timestamp(), crit_count)
+            for artwork_id, author_id, medium, created_at, crit_count in rows
+        )
+
+    def load(self, entries):
+        """Replace the pool contents with the given PoolEntry objects."""
+        entries = {entry.artwork_id: entry for entry in entries}
+        ranked = sorted(_rank_key(entry) for entry in entries.values())
+        medium_counts = Counter(entry.medium for entry in entries.values())
+
+        with self._lock:
+            self._entries = entries
+            self._ranked = ranked
+            self._medium_counts = medium_counts
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Drop the pool so the next read rebuilds it (used after bulk updates)."""
+        with self._lock:
+            self._entries = {}
+            self._ranked = []
+            self._medium_counts = Counter()
+            self._loaded_at = None
+
+    # ------------------------------------------------------------------
+    # Incremental maintenance
+    # ------------------------------------------------------------------
+
+    def _insert(self, entry):
+        self._entries[entry.artwork_id] = entry
+        bisect.insort(self._ranked, _rank_key(entry))
+        self._medium_counts[entry.medium] += 1
+
+    def _remove(self, artwork_id):
+        entry = self._entries.pop(artwork_id, None)
+        if entry is None:
+            return None
+        self._medium_counts[entry.medium] -= 1
+        key = _rank_key(entry)
+        index = bisect.bisect_left(self._ranked, key)
+        if index < len(self._ranked) and self._ranked[index] == key:
+            del self._ranked[index]
+        return entry
+
+    def sync_artwork(self, artwork):
+        """
+        Add, refresh or remove an artwork after it has been saved.
+
+        Publishing (or making public) an artwork adds it to the pool and
+        unpublishing or hiding it removes it. Nothing happens if the pool has
+        not been built yet, since the lazy build will pick the change up.
+        """
+        if not self.is_loaded:
+            return
+
+        if not is_feed_eligible(artwork):
+            self.discard(artwork.id)
+            return
+
+        with self._lock:
+            existing = self._entries.get(artwork.id)
+        if existing is not None:
+            crit_count = existing.crit_count
+        else:
+            # Newly eligible; it may have been critiqued while unpublished
+            crit_count = artwork.quick_crits.count()
+
+        entry = PoolEntry(
+            artwork.id,
+            artwork.author_id,
+            artwork.medium or '',
+            artwork.created_at.timestamp(),
+            crit_count,
+        )
+        with self._lock:
+            self._remove(artwork.id)
+            self._insert(entry)
+
+    def discard(self, artwork_id):
+        """Remove an artwork from the pool if present."""
+        with self._lock:
+            self._remove(artwork_id)
+
+    def adjust_need(self, artwork_id, delta):
+        """Move an artwork in the ranking after quick critiques are added or removed."""
+        with self._lock:
+            entry = self._remove(artwork_id)
+            if entry is None:
+                return
+            self._insert(entry._replace(crit_count=max(0, entry.crit_count + delta)))
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def get(self, artwork_id):
+        """Return the PoolEntry for an artwork, or None."""
+        self.ensure_loaded()
+        return self._entries.get(artwork_id)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def medium_count(self, medium):
+        """Return how many pooled artworks share a medium."""
+        return self._medium_counts[medium]
+
+    def top(self, limit, exclude_ids=(), exclude_author_id=None, predicate=None):
+        """
+        Return up to ``limit`` entries in critique-need order.
+
+        Args:
+            limit: Maximum number of entries to return
+            exclude_ids: Artwork IDs to skip (e.g. recently seen)
+            exclude_author_id: Skip artworks by this author (e.g. the viewer)
+            predicate: Optional callable an entry must satisfy to be returned
+
+        Returns:
+            List of PoolEntry objects, highest need first
+        """
+        self.ensure_loaded()
+        results = []
+        with self._lock:
+            for crit_count, neg_created, artwork_id in self._ranked:
+                if artwork_id in exclude_ids:
+                    continue
+                entry = self._entries[artwork_id]
+                if exclude_author_id is not None and entry.author_id == exclude_author_id:
+                    continue
+                if predicate is not None and not predicate(entry):
+                    continue
+                results.append(entry)
+                if len(results) >= limit:
+                    break
+        return results
+
+    def first(self, exclude_ids=(), exclude_author_id=None, predicate=None):
+        """Return the highest-need entry matching the filters, or None."""
+        matches = self.top(1, exclude_ids, exclude_author_id, predicate)
+        return matches[0] if matches else None
+
+
+# Process-wide pool used by the feed views and kept current by signals
+candidate_pool = CandidatePool()
+
+
+def _pick_pair_entries(user, exclude_ids=()):
+    """Pick spotlight and counterpoint pool entries for the critique feed."""
+    from .feed_sampling import get_sampler
+    from .feed_seen import get_seen_ids
+
+    exclude_ids = set(exclude_ids)
+    exclude_author_id = None
+    if user.is_authenticated:
+        # Avoid user's own art and recently seen pairs
+        exclude_ids |= get_seen_ids(user)
+        exclude_author_id = user.id
+
+    return get_sampler().sample(candidate_pool, exclude_ids, exclude_author_id)
+
+
+def pick_pair(user, exclude_ids=(), attempts=3):
+    """
+    Pick a pair of artworks for the critique feed.
+
+    Candidates come from the in-memory pool; only the two chosen artworks are
+    loaded from the database. Entries that turn out to be stale (deleted or no
+    longer public in another process) are dropped and the pick is retried.
+
+    Args:
+        user: The viewer (may be anonymous)
+        exclude_ids: Extra artwork IDs to avoid, e.g. pairs already queued
+        attempts: How many times to retry after discarding stale entries
+
+    Returns:
+        Tuple of (spotlight, counterpoint) ArtWork objects; either may be None
+    """
+    for _ in range(attempts):
+        spotlight_entry, counter_entry = _pick_pair_entries(user, exclude_ids)
+        if not spotlight_entry:
+            return None, None
+
+        ids = [spotlight_entry.artwork_id]
+        if counter_entry:
+            ids.append(counter_entry.artwork_id)
+        artworks = ArtWork.objects.select_related('author').in_bulk(ids)
+
+        stale = [
+            artwork_id for artwork_id in ids
+            if artwork_id not in artworks or not is_feed_eligible(artworks[artwork_id])
+        ]
+        if stale:
+            for artwork_id in stale:
+                candidate_pool.discard(artwork_id)
+            continue
+
+        counter = artworks[counter_entry.artwork_id] if counter_entry else None
+        return artworks[spotlight_entry.artwork_id], counter
+
+    return None, None
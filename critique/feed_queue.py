@@ -0,0 +1,308 @@
+"""
+Per-user look-ahead queue for the two-at-a-time critique feed.
+
+Each signed-in user gets a short queue of precomputed pairs in the shared
+cache, with both ArtworkCardSerializer payloads already rendered. Serving the
+next pair is a cache pop; the PairSession row is buffered and bulk inserted
+off the request path, and the queue is topped up in the background once it
+falls below the low-water mark.
+
+Queued payloads can go stale. When an artwork is unpublished, made private
+or deleted, the ArtWork signal handlers mark it revoked in the shared cache
+(see revoke_artwork), and next_pair drops queued pairs that show a revoked
+artwork. Each queued pair is claimed with cache.add() before it is served,
+so two concurrent requests never get the same pair.
+
+Settings:
+    FEED_QUEUE_SIZE: Pairs kept ready per user
+    FEED_QUEUE_LOW_WATER: Refill when fewer than this many pairs remain
+    FEED_QUEUE_TTL: Seconds a queued pair may wait before it is discarded
+    FEED_QUEUE_BACKGROUND: Run refills and deferred writes on a worker thread
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .feed_pool import pick_pair
+from .feed_seen import get_seen_ids, mark_seen
+from .models import PairSession
+from .write_buffer import WriteBuffer
+
+logger = logging.getLogger(__name__)
+
+QUEUE_CACHE_KEY = 'feed:queue:{user_id}'
+REFILL_LOCK_KEY = 'feed:queue:refilling:{user_id}'
+METRICS_CACHE_KEY = 'feed:queue:metrics:{name}'
+REVOKED_KEY = 'feed:queue:revoked:{artwork_id}'
+CLAIM_KEY = 'feed:queue:claimed:{user_id}:{spotlight_id}:{counter_id}:{queued_at!r}'
+METRIC_NAMES = ['hits', 'misses', 'refills', 'refill_ms_total', 'refill_ms_max']
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='feed-queue')
+
+
+def _queue_size():
+    return getattr(settings, 'FEED_QUEUE_SIZE', 5)
+
+
+def _low_water():
+    return getattr(settings, 'FEED_QUEUE_LOW_WATER', 2)
+
+
+def _queue_ttl():
+    return getattr(settings, 'FEED_QUEUE_TTL', 600)
+
+
+def _run_in_background(func, *args):
+    """Run func on the worker pool, or inline when background work is disabled."""
+    if getattr(settings, 'FEED_QUEUE_BACKGROUND', True):
+        _executor.submit(_run_task, func, *args)
+    else:
+        func(*args)
+
+
+def _run_task(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Feed queue background task %s failed", func.__name__)
+    finally:
+        # Worker threads open their own connections; don't leak them
+        connection.close()
+
+
+# Pair views are written in batches (see critique.write_buffer)
+pair_session_buffer = WriteBuffer(PairSession, run=_run_in_background)
+
+
+# ----------------------------------------------------------------------
+# Metrics
+# ----------------------------------------------------------------------
+
+def _incr_metric(name, delta=1):
+    key = METRICS_CACHE_KEY.format(name=name)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Evicted between add() and incr(); start the counter again
+        cache.set(key, delta, None)
+
+
+def _record_refill_latency(elapsed_ms):
+    _incr_metric('refills')
+    _incr_metric('refill_ms_total', elapsed_ms)
+    max_key = METRICS_CACHE_KEY.format(name='refill_ms_max')
+    if elapsed_ms > (cache.get(max_key) or 0):
+        cache.set(max_key, elapsed_ms, None)
+
+
+def get_queue_metrics():
+    """
+    Return queue hit rate and refill latency statistics.
+
+    Returns:
+        Dictionary with raw counters plus hit_rate and avg_refill_ms
+    """
+    values = cache.get_many([METRICS_CACHE_KEY.format(name=name) for name in METRIC_NAMES])
+    metrics = {name: values.get(METRICS_CACHE_KEY.format(name=name), 0) for name in METRIC_NAMES}
+
+    served = metrics['hits'] + metrics['misses']
+    metrics['hit_rate'] = round(metrics['hits'] / served, 4) if served else None
+    metrics['avg_refill_ms'] = (
+        round(metrics['refill_ms_total'] / metrics['refills'], 2) if metrics['refills'] else None
+    )
+    return metrics
+
+
+def reset_queue_metrics():
+    """Reset all queue metric counters."""
+    cache.delete_many([METRICS_CACHE_KEY.format(name=name) for name in METRIC_NAMES])
+
+
+# ----------------------------------------------------------------------
+# Queue operations
+# ----------------------------------------------------------------------
+
+def build_pair_payload(spotlight, counter, context=None):
+    """Serialize a pair into the structure stored in the queue."""
+    from .api.serializers import ArtworkCardSerializer
+
+    context = context or {}
+    return {
+        'spotlight_id': spotlight.id,
+        'counter_id': counter.id,
+        'spotlight': ArtworkCardSerializer(spotlight, context=context).data,
+        'counterpoint': ArtworkCardSerializer(counter, context=context).data,
+        'queued_at': time.time(),
+    }
+
+
+def _get_queue(user_id):
+    return cache.get(QUEUE_CACHE_KEY.format(user_id=user_id)) or []
+
+
+def _set_queue(user_id, queue):
+    cache.set(QUEUE_CACHE_KEY.format(user_id=user_id), queue, _queue_ttl())
+
+
+def _fresh(queue):
+    """Drop pairs that have waited longer than the queue TTL."""
+    cutoff = time.time() - _queue_ttl()
+    return [pair for pair in queue if pair['queued_at'] >= cutoff]
+
+
+def _queued_ids(queue):
+    ids = set()
+    for pair in queue:
+        ids.add(pair['spotlight_id'])
+        ids.add(pair['counter_id'])
+    return ids
+
+
+def revoke_artwork(artwork_id):
+    """Stop serving queued pairs that show an artwork (no longer public, or deleted)."""
+    # Pairs queued before now expire within the queue TTL, and so does the mark
+    cache.set(REVOKED_KEY.format(artwork_id=artwork_id), True, _queue_ttl())
+
+
+def restore_artwork(artwork_id):
+    """Allow an artwork that is feed-eligible again to be served from queues."""
+    cache.delete(REVOKED_KEY.format(artwork_id=artwork_id))
+
+
+def _without_revoked(queue):
+    """Drop pairs showing a revoked artwork (one cache round trip)."""
+    if not queue:
+        return queue
+    keys = {artwork_id: REVOKED_KEY.format(artwork_id=artwork_id) for artwork_id in _queued_ids(queue)}
+    found = cache.get_many(list(keys.values()))
+    revoked = {artwork_id for artwork_id, key in keys.items() if key in found}
+    return [
+        pair for pair in queue
+        if pair['spotlight_id'] not in revoked and pair['counter_id'] not in revoked
+    ]
+
+
+def _claim(user_id, pair):
+    """Atomically claim a queued pair; False if another request already served it."""
+    key = CLAIM_KEY.format(
+        user_id=user_id,
+        spotlight_id=pair['spotlight_id'],
+        counter_id=pair['counter_id'],
+        queued_at=pair['queued_at'],
+    )
+    return cache.add(key, True, _queue_ttl())
+
+
+def refill_queue(user):
+    """
+    Top the user's queue back up to FEED_QUEUE_SIZE pairs.
+
+    Pairs already queued are excluded from new picks so the queue never
+    holds the same artwork twice. Only one refill per user runs at a time.
+    """
+    lock_key = REFILL_LOCK_KEY.format(user_id=user.id)
+    if not cache.add(lock_key, True, 60):
+        return
+
+    started = time.monotonic()
+    try:
+        queue = _fresh(_get_queue(user.id))
+        exclude_ids = _queued_ids(queue)
+        new_pairs = []
+        for _ in range(_queue_size() - len(queue)):
+            spotlight, counter = pick_pair(user, exclude_ids)
+            if not spotlight or not counter:
+                break
+            new_pairs.append(build_pair_payload(spotlight, counter))
+            exclude_ids.update((spotlight.id, counter.id))
+
+        if new_pairs:
+            # Re-read in case pairs were served while we were picking
+            current = _fresh(_get_queue(user.id))
+            current_ids = _queued_ids(current)
+            current.extend(
+                pair for pair in new_pairs
+                if pair['spotlight_id'] not in current_ids and pair['counter_id'] not in current_ids
+            )
+            _set_queue(user.id, current)
+    finally:
+        cache.delete(lock_key)
+
+    _record_refill_latency(int((time.monotonic() - started) * 1000))
+
+
+def schedule_refill(user):
+    """Refill the user's queue in the background."""
+    _run_in_background(refill_queue, user)
+
+
+def next_pair(user, context=None):
+    """
+    Return the next pair for a signed-in user and record that it was shown.
+
+    The pair is popped from the queue when one is ready (a hit), skipping
+    pairs that were revoked or already served; otherwise it is picked
+    synchronously (a miss). Either way a background refill is
+    scheduled once the queue drops below the low-water mark.
+
+    Args:
+        user: The authenticated viewer
+        context: Serializer context used when a pair has to be built inline
+
+    Returns:
+        Pair payload dictionary, or None if no pair is available
+    """
+    queue = _without_revoked(_fresh(_get_queue(user.id)))
+    pair = None
+    while queue:
+        candidate = queue.pop(0)
+        # A concurrent request may have read the same queue and served it
+        if _claim(user.id, candidate):
+            pair = candidate
+            break
+    _set_queue(user.id, queue)
+
+    if pair:
+        _incr_metric('hits')
+    else:
+        _incr_metric('misses')
+        spotlight, counter = pick_pair(user, _queued_ids(queue))
+        if spotlight and counter:
+            pair = build_pair_payload(spotlight, counter, context)
+
+    if pair:
+        record_pair_view(user, pair['spotlight_id'], pair['counter_id'])
+    if len(queue) < _low_water():
+        schedule_refill(user)
+    return pair
+
+
+def record_pair_view(user, spotlight_id, counter_id):
+    """
+    Record that a pair was shown.
+
+    The seen set is updated immediately so the next pick excludes the pair;
+    the PairSession row is buffered and inserted in a later batch.
+    """
+    # Make sure the seen set is cached so the append is not lost
+    get_seen_ids(user)
+    mark_seen(user.id, spotlight_id, counter_id)
+    pair_session_buffer.add(
+        PairSession(user_id=user.id, spotlight_id=spotlight_id, counter_id=counter_id)
+    )
+
+
+def flush_pair_sessions():
+    """Write any buffered PairSession rows now."""
+    return pair_session_buffer.flush()
+
+
+def clear_queue(user_id):
+    """Drop a user's queued pairs."""
+    cache.delete(QUEUE_CACHE_KEY.format(user_id=user_id))
@@ -0,0 +1,186 @@
+"""
+Pair samplers for the two-at-a-time critique feed.
+
+A sampler picks a spotlight and a counterpoint PoolEntry from the candidate
+pool, entirely in memory. The sampler used by the feed is chosen with the
+FEED_PAIR_SAMPLER setting:
+
+    weighted  - Weighted random sampling (default). Every candidate gets a
+                weight from its critique need, freshness and medium rarity,
+                and one pass over the pool draws a weighted sample without
+                replacement (Efraimidis-Spirakis reservoir keys).
+    top_need  - The original picker: a uniform choice among the
+                TOP_NEED_SIZE highest-need candidates.
+
+Both samplers prefer a counterpoint by a different author in a different
+medium, then one by a different author, then any other candidate.
+"""
+
+import heapq
+import math
+import random
+import time
+
+from django.conf import settings
+
+# Number of highest-need candidates the top_need spotlight is drawn from
+TOP_NEED_SIZE = 80
+
+
+def _is_contrasting(spotlight):
+    return lambda entry: entry.author_id != spotlight.author_id and entry.medium != spotlight.medium
+
+
+def _other_author(spotlight):
+    return lambda entry: entry.author_id != spotlight.author_id
+
+
+class TopNeedSampler:
+    """Uniform choice among the highest-need candidates."""
+
+    name = 'top_need'
+
+    def __init__(self, top_size=TOP_NEED_SIZE, rng=None):
+        self.top_size = top_size
+        self.rng = rng or random.Random()
+
+    def sample(self, pool, exclude_ids, exclude_author_id=None):
+        top_need = pool.top(self.top_size, exclude_ids, exclude_author_id)
+        if not top_need:
+            return None, None
+
+        spotlight = self.rng.choice(top_need)
+        exclude_ids = set(exclude_ids)
+        exclude_ids.add(spotlight.artwork_id)
+
+        # Counterpoint: different author/medium if possible
+        counter = pool.first(exclude_ids, exclude_author_id, predicate=_is_contrasting(spotlight))
+        if not counter:
+            candidates = pool.top(self.top_size, exclude_ids, exclude_author_id)
+            counter = self.rng.choice(candidates) if candidates else None
+        return spotlight, counter
+
+
+def _key(item):
+    return item[0]
+
+
+class WeightedSampler:
+    """
+    Weighted sampling over the whole candidate pool.
+
+    weight = need * freshness * diversity, where
+        need      = 1 / (1 + quick critique count)
+        freshness = decays by half every FEED_SAMPLER_HALF_LIFE_DAYS, down to
+                    FEED_SAMPLER_FRESHNESS_FLOOR so older work is never starved
+        diversity = 1 / sqrt(artworks in the pool with the same medium)
+
+    Each candidate gets the reservoir key u ** (1 / weight). The SAMPLE_SIZE
+    largest keys are a weighted sample without replacement: the largest is
+    the spotlight and the counterpoint is the best-ranked contrasting entry
+    among the rest.
+    """
+
+    name = 'weighted'
+
+    SAMPLE_SIZE = 16
+
+    # Weights change slowly (ageing, medium mix), so they are cached per entry
+    # and recomputed at most this often
+    WEIGHT_TTL = 60
+
+    def __init__(self, rng=None, now=None):
+        self.rng = rng or random.Random()
+        self._now = now
+        self._weights = {}   # artwork_id -> (PoolEntry, weight)
+        self._weights_at = None
+        self._weights_pool = None
+
+    def _weigher(self, pool, now):
+        """Return a function computing an entry's weight, with settings read once."""
+        if (self._weights_pool is not pool or self._weights_at is None
+                or abs(now - self._weights_at) > self.WEIGHT_TTL):
+            self._weights = {}
+            self._weights_at = now
+            self._weights_pool = pool
+        weights = self._weights
+
+        half_life = getattr(settings, 'FEED_SAMPLER_HALF_LIFE_DAYS', 14) * 86400
+        floor = getattr(settings, 'FEED_SAMPLER_FRESHNESS_FLOOR', 0.25)
+        decay_rate = math.log(2) / half_life if half_life else 0.0
+        diversity = {}
+
+        def compute(entry):
+            if entry.medium not in diversity:
+                diversity[entry.medium] = 1.0 / math.sqrt(max(1, pool.medium_count(entry.medium)))
+            age = now - entry.created_ts
+            freshness = floor + (1 - floor) * math.exp(-decay_rate * age) if age > 0 else 1.0
+            return freshness * diversity[entry.medium] / (1 + entry.crit_count)
+
+        def weight(entry):
+            cached = weights.get(entry.artwork_id)
+            # PoolEntry objects are replaced whenever an artwork changes
+            if cached is not None and cached[0] is entry:
+                return cached[1]
+            value = compute(entry)
+            weights[entry.artwork_id] = (entry, value)
+            return value
+
+        return weight
+
+    def _keyed(self, entries, weight):
+        # log(u) / w orders candidates exactly like u ** (1 / w) but is cheaper;
+        # random() can return 0.0, so nudge it to keep the log finite
+        random_value = self.rng.random
+        log = math.log
+        return [(log(random_value() or 1e-12) / weight(entry), entry) for entry in entries]
+
+    def sample(self, pool, exclude_ids, exclude_author_id=None):
+        now = self._now if self._now is not None else time.time()
+        scan_limit = getattr(settings, 'FEED_SAMPLER_SCAN_LIMIT', 2000)
+        candidates = pool.top(scan_limit, exclude_ids, exclude_author_id)
+        if not candidates:
+            return None, None
+
+        weight = self._weigher(pool, now)
+        keyed = heapq.nlargest(self.SAMPLE_SIZE, self._keyed(candidates, weight), key=_key)
+        spotlight = keyed[0][1]
+        rest = [entry for _, entry in keyed[1:]]
+
+        for predicate in (_is_contrasting(spotlight), _other_author(spotlight)):
+            for entry in rest:
+                if predicate(entry):
+                    return spotlight, entry
+            # Nothing suitable in the sample; draw from the matching candidates
+            matching = [entry for entry in candidates if predicate(entry)]
+            if matching:
+                return spotlight, max(self._keyed(matching, weight), key=_key)[1]
+
+        return spotlight, (rest[0] if rest else None)
+
+
+SAMPLERS = {
+    TopNeedSampler.name: TopNeedSampler,
+    WeightedSampler.name: WeightedSampler,
+}
+
+_samplers = {}
+
+
+def get_sampler(name=None):
+    """
+    Return the configured pair sampler.
+
+    Args:
+        name: Sampler name; defaults to the FEED_PAIR_SAMPLER setting
+
+    Returns:
+        Sampler instance with a sample(pool, exclude_ids, exclude_author_id) method
+    """
+    name = name or getattr(settings, 'FEED_PAIR_SAMPLER', WeightedSampler.name)
+    if name not in _samplers:
+        try:
+            _samplers[name] = SAMPLERS[name]()
+        except KeyError:
+            raise ValueError(f"Unknown feed pair sampler: {name}")
+    return _samplers[name]
@@ -0,0 +1,98 @@
+"""
+Per-user "recently seen" artwork sets for the two-at-a-time feed.
+
+Each user's recently shown artwork IDs are kept in the shared cache as a
+compact unsigned-int array (4 bytes per ID) in the order they were seen, so
+the feed can exclude them in memory instead of loading PairSession rows and
+pushing an ever-growing ``id__in`` list into SQL on every request.
+
+The array is appended to whenever a PairSession is created and is capped at
+FEED_SEEN_WINDOW IDs. If the cache entry expires (FEED_SEEN_TTL) or is
+evicted, it is rebuilt from the user's latest PairSession rows.
+"""
+
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import PairSession
+
+SEEN_CACHE_KEY = 'feed:seen:{user_id}'
+
+
+def _window():
+    """Number of artwork IDs remembered per user (two per pair shown)."""
+    return getattr(settings, 'FEED_SEEN_WINDOW', 600)
+
+
+def _ttl():
+    return getattr(settings, 'FEED_SEEN_TTL', 60 * 60 * 24)
+
+
+def _unpack(raw):
+    ids = array('I')
+    ids.frombytes(raw)
+    return ids
+
+
+def _store(user_id, ids):
+    window = _window()
+    if len(ids) > window:
+        ids = ids[-window:]
+    cache.set(SEEN_CACHE_KEY.format(user_id=user_id), ids.tobytes(), _ttl())
+    return ids
+
+
+def _load_from_db(user_id):
+    """Rebuild the seen array from the user's most recent pair sessions."""
+    rows = (
+        PairSession.objects.filter(user_id=user_id)
+        .order_by('-created_at')
+        .values_list('spotlight_id', 'counter_id')[:_window() // 2]
+    )
+    ids = array('I')
+    # Rows arrive newest first; store oldest first so the tail is the newest
+    for spotlight_id, counter_id in reversed(list(rows)):
+        ids.append(spotlight_id)
+        ids.append(counter_id)
+    return _store(user_id, ids)
+
+
+def get_seen_ids(user):
+    """
+    Return the set of artwork IDs the user has recently been shown.
+
+    Costs one cache read on the common path and a single PairSession query
+    when the cached array is missing.
+    """
+    if not user.is_authenticated:
+        return set()
+
+    raw = cache.get(SEEN_CACHE_KEY.format(user_id=user.id))
+    ids = _unpack(raw) if raw is not None else _load_from_db(user.id)
+    return set(ids)
+
+
+def mark_seen(user_id, *artwork_ids):
+    """
+    Append artwork IDs to a user's seen array.
+
+    Called when a PairSession is created. If the user has no cached array
+    yet, nothing is written; the next read rebuilds it from the database,
+    which already includes the new session.
+    """
+    key = SEEN_CACHE_KEY.format(user_id=user_id)
+    raw = cache.get(key)
+    if raw is None:
+        return
+
+    new_ids = set(artwork_ids)
+    ids = array('I', (artwork_id for artwork_id in _unpack(raw) if artwork_id not in new_ids))
+    ids.extend(artwork_ids)
+    _store(user_id, ids)
+
+
+def clear_seen(user_id):
+    """Forget a user's cached seen array."""
+    cache.delete(SEEN_CACHE_KEY.format(user_id=user_id))
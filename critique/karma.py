@@ -5,11 +5,29 @@ This module handles the logic for awarding and tracking karma points
 based on user actions and contributions to the community.
 """
 
+from datetime import datetime, time, timedelta
+from functools import partial, reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
 from django.contrib.auth.models import User
 from django.utils import timezone
 
-from .models import Profile, ArtWork, Comment, Critique
+from .models import Profile, ArtWork, Comment, Critique, KarmaEvent, KarmaRollup, KarmaTotal, Notification
+from .karma_leaderboard import karma_leaderboard
+from .unread_counts import adjust_unread_many
+from .write_buffer import WriteBuffer
+
+# Latest unseen karma award per user, shown once as a toast by the
+# karma_notifications context processor
+KARMA_TOAST_KEY = 'karma:toast:{user_id}'
+
+# Set once a user's daily visit karma for a day has been claimed
+DAILY_VISIT_KEY = 'karma:daily_visit:{user_id}:{day}'
+DAILY_VISIT_TTL = 60 * 60 * 25
 
 # Karma point values for different actions
 KARMA_VALUES = {
@@ -27,6 +45,10 @@ def award_karma(user, action, reason=None):
     """
     Award karma points to a user for a specific action.
     
+    Actions listed in KARMA_BUFFERED_ACTIONS are buffered and recorded in
+    batches once the caller's transaction commits; everything else is
+    recorded before this returns.
+    
     Args:
         user: User object to award karma to
         action: String identifying the action (must be a key in KARMA_VALUES)
@@ -35,28 +57,217 @@ def award_karma(user, action, reason=None):
     Returns:
         Boolean indicating success
     """
-    if action not in KARMA_VALUES:
-        return False
+    return award_karma_batch([(user, action, reason)]) > 0
+
+def award_karma_batch(awards):
+    """
+    Award karma for several actions at once.
+    
+    Args:
+        awards: Iterable of (user, action, reason) tuples; unknown actions
+            are skipped
+    
+    Returns:
+        Number of awards accepted
+    """
+    events = [
+        KarmaEvent(user_id=user.pk, action=action, points=KARMA_VALUES[action], reason=reason)
+        for user, action, reason in awards
+        if action in KARMA_VALUES
+    ]
+    buffered_actions = set(getattr(settings, 'KARMA_BUFFERED_ACTIONS', ()))
+    buffered = [event for event in events if event.action in buffered_actions]
+    record_karma_events([event for event in events if event.action not in buffered_actions])
+    if buffered:
+        # Buffer only awards whose cause committed. This also keeps a
+        # size-triggered flush, which records other users' awards too, out
+        # of the caller's transaction and its rollback.
+        transaction.on_commit(partial(_buffer_events, buffered))
+    return len(events)
+
+def _buffer_events(events):
+    for event in events:
+        karma_buffer.add(event)
+
+def record_karma_events(events):
+    """
+    Append events to the karma ledger and apply them to the profile totals.
     
-    points = KARMA_VALUES[action]
+    The events are inserted with one bulk_create and the totals moved with
+    one F() update covering every user involved, so concurrent awards can't
+    lose each other's points; the day's KarmaRollup rows move the same way.
+    Each user gets a notification per kind of award (see
+    notify_karma_awards) and a toast for the latest one.
+    
+    Args:
+        events: Unsaved KarmaEvent instances
+    """
+    if not events:
+        return
+    deltas = {}
+    for event in events:
+        deltas[event.user_id] = deltas.get(event.user_id, 0) + event.points
     
     with transaction.atomic():
-        # Create a KarmaEvent record
-        from .models import KarmaEvent
+        KarmaEvent.objects.bulk_create(events)
+        apply_karma_deltas(deltas)
+        apply_karma_rollups(events)
         
-        event = KarmaEvent.objects.create(
-            user=user,
-            action=action,
-            points=points,
-            reason=reason
-        )
+        notify_karma_awards(events)
         
-        # Update user's total karma
-        profile = user.profile
-        profile.karma += points
-        profile.save(update_fields=['karma'])
+        toasts = {}
+        for event in events:
+            toasts[event.user_id] = {'points': event.points, 'reason': event.reason or f"for {event.action}"}
         
-    return True
+        def show_toasts():
+            for user_id, toast in toasts.items():
+                set_karma_toast(user_id, toast)
+        
+        # Only show the toasts if the awards commit
+        transaction.on_commit(show_toasts)
+
+def notify_karma_awards(events):
+    """
+    Create the karma_awarded notifications for events that lack one.
+    
+    A user has at most one notification per message, as with get_or_create,
+    but the existing ones are found with one query and the missing ones
+    inserted with one bulk_create. bulk_create skips the post_save handler,
+    so the unread counters are moved here.
+    
+    Args:
+        events: KarmaEvent instances
+    
+    Returns:
+        Number of notifications created
+    """
+    wanted = {
+        (event.user_id, f"You earned {event.points} karma points for {event.action}")
+        for event in events
+    }
+    if not wanted:
+        return 0
+    existing = set(
+        Notification.objects.filter(
+            recipient_id__in={user_id for user_id, _ in wanted},
+            kind='karma_awarded',
+            message__in={message for _, message in wanted},
+        ).values_list('recipient_id', 'message')
+    )
+    missing = sorted(wanted - existing)
+    Notification.objects.bulk_create([
+        Notification(recipient_id=user_id, message=message, url='/profile/', is_read=False, kind='karma_awarded')
+        for user_id, message in missing
+    ])
+    unread = {}
+    for user_id, _ in missing:
+        unread[user_id] = unread.get(user_id, 0) + 1
+    adjust_unread_many(unread)
+    return len(missing)
+
+# Awards for actions in KARMA_BUFFERED_ACTIONS wait here and are recorded
+# in batches (see critique.write_buffer)
+karma_buffer = WriteBuffer(KarmaEvent, write=record_karma_events, settings_prefix='KARMA_BUFFER')
+
+def apply_karma_deltas(deltas):
+    """
+    Add point deltas to Profile.karma in a single UPDATE.
+    
+    Args:
+        deltas: Dict mapping user ID to change in karma
+    
+    Returns:
+        Number of profile rows updated
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    # Move the users on the leaderboard once the new totals are visible
+    transaction.on_commit(partial(karma_leaderboard.apply_deltas, deltas))
+    if len(deltas) == 1:
+        [(user_id, delta)] = deltas.items()
+        return Profile.objects.filter(user_id=user_id).update(karma=F('karma') + delta)
+    return Profile.objects.filter(user_id__in=deltas).update(
+        karma=F('karma') + Case(
+            *[When(user_id=user_id, then=Value(delta)) for user_id, delta in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+
+def _sum_case(keys, values):
+    return Case(
+        *[When(key, then=Value(value)) for key, value in zip(keys, values)],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+def _add_totals(model, fields, totals):
+    """Add (points, events) totals to the model's rows keyed on fields."""
+    model.objects.bulk_create(
+        [model(**dict(zip(fields, key))) for key in totals],
+        ignore_conflicts=True,
+    )
+    keys = [Q(**dict(zip(fields, key))) for key in totals]
+    return model.objects.filter(reduce(or_, keys)).update(
+        points=F('points') + _sum_case(keys, [points for points, _ in totals.values()]),
+        events=F('events') + _sum_case(keys, [count for _, count in totals.values()]),
+    )
+
+def apply_karma_rollups(events):
+    """
+    Add karma events to their users' KarmaRollup and KarmaTotal rows.
+    
+    For each of the two tables, missing rows are created with one
+    conflict-ignoring insert, then every row is moved with one F() update.
+    
+    Args:
+        events: KarmaEvent instances (saved or not)
+    
+    Returns:
+        Number of rollup rows updated
+    """
+    daily = {}
+    lifetime = {}
+    for event in events:
+        for totals, key in (
+            (daily, (event.user_id, event.action, timezone.localdate(event.created_at))),
+            (lifetime, (event.user_id, event.action)),
+        ):
+            points, count = totals.get(key, (0, 0))
+            totals[key] = (points + event.points, count + 1)
+    if not daily:
+        return 0
+    
+    _add_totals(KarmaTotal, ('user_id', 'action'), lifetime)
+    return _add_totals(KarmaRollup, ('user_id', 'action', 'day'), daily)
+
+def flush_karma_buffer():
+    """Record any buffered karma awards now."""
+    return karma_buffer.flush()
+
+def set_karma_toast(user_id, toast):
+    """
+    Store the karma toast the user sees on their next page.
+    
+    Args:
+        user_id: ID of the user who earned karma
+        toast: Dict with 'points' and 'reason'
+    """
+    timeout = getattr(settings, 'KARMA_TOAST_TTL', 60 * 60 * 24)
+    cache.set(KARMA_TOAST_KEY.format(user_id=user_id), toast, timeout)
+
+def pop_karma_toast(user_id):
+    """
+    Return and clear the user's pending karma toast, or None.
+    
+    Only touches the cache, so page renders run no karma queries.
+    """
+    key = KARMA_TOAST_KEY.format(user_id=user_id)
+    toast = cache.get(key)
+    if toast is not None:
+        cache.delete(key)
+    return toast
 
 def award_artwork_upload_karma(artwork):
     """Award karma for uploading a new artwork"""
@@ -69,84 +280,151 @@ def award_artwork_upload_karma(artwork):
 def award_comment_karma(comment):
     """Award karma for commenting and receiving comments"""
     # Award comment poster
-    award_karma(
-        comment.author, 
-        'comment_posted', 
-        f"Commented on artwork: {comment.artwork.title}"
-    )
+    awards = [(comment.author, 'comment_posted', f"Commented on artwork: {comment.artwork.title}")]
     
     # Award artwork author for receiving comment (if not self-commenting)
     if comment.author != comment.artwork.author:
-        award_karma(
-            comment.artwork.author, 
-            'comment_received', 
-            f"Received comment from {comment.author.username}"
+        awards.append(
+            (comment.artwork.author, 'comment_received', f"Received comment from {comment.author.username}")
         )
+    award_karma_batch(awards)
 
 def award_like_karma(artwork, user):
     """Award karma for liking and receiving likes"""
     # Award the person giving the like
-    award_karma(
-        user, 
-        'like_given', 
-        f"Liked artwork: {artwork.title}"
-    )
+    awards = [(user, 'like_given', f"Liked artwork: {artwork.title}")]
     
     # Award the artwork owner for receiving a like (if not self-liking)
     if user != artwork.author:
-        award_karma(
-            artwork.author, 
-            'artwork_liked', 
-            f"Artwork liked by {user.username}: {artwork.title}"
+        awards.append(
+            (artwork.author, 'artwork_liked', f"Artwork liked by {user.username}: {artwork.title}")
         )
+    award_karma_batch(awards)
 
 def award_critique_karma(critique):
     """Award karma for giving and receiving critiques"""
     # Award critique author
-    award_karma(
-        critique.author, 
-        'critique_posted', 
-        f"Posted critique on artwork: {critique.artwork.title}"
-    )
+    awards = [(critique.author, 'critique_posted', f"Posted critique on artwork: {critique.artwork.title}")]
     
     # Award artwork author for receiving critique (if not self-critique)
     if critique.author != critique.artwork.author:
-        award_karma(
-            critique.artwork.author, 
-            'critique_received', 
-            f"Received critique from {critique.author.username}"
+        awards.append(
+            (critique.artwork.author, 'critique_received', f"Received critique from {critique.author.username}")
         )
+    award_karma_batch(awards)
 
 
 
 def award_daily_visit_karma(user):
-    """Award karma for daily site visits"""
-    # Check if user already received daily visit karma today
-    from .models import KarmaEvent
-    today = timezone.now().date()
-    
-    already_awarded = KarmaEvent.objects.filter(
-        user=user,
-        action='daily_visit',
-        created_at__date=today
-    ).exists()
-    
-    if not already_awarded:
-        return award_karma(
-            user, 
-            'daily_visit', 
-            f"Daily visit on {today}"
-        )
+    """
+    Award karma for the user's first visit of the day.
+    
+    A day-keyed marker in the cache makes repeat visits free: cache.add()
+    lets exactly one request per user and day through, and every other
+    request returns without touching the database. The request that gets
+    through checks the ledger again under a lock on the user's profile, in
+    case the marker was evicted after an earlier award.
+    
+    Args:
+        user: The visiting user
+    
+    Returns:
+        Boolean indicating whether karma was awarded
+    """
+    today = timezone.localdate()
+    key = DAILY_VISIT_KEY.format(user_id=user.pk, day=today.isoformat())
+    if not cache.add(key, True, DAILY_VISIT_TTL):
+        return False
     
-    return False
+    day_start = timezone.make_aware(datetime.combine(today, time.min))
+    try:
+        with transaction.atomic():
+            # Serializes first visits of the same user across processes
+            list(Profile.objects.select_for_update().filter(user_id=user.pk).values_list('pk'))
+            # A range on created_at (rather than __date) can use an index
+            already_awarded = KarmaEvent.objects.filter(
+                user_id=user.pk,
+                action='daily_visit',
+                created_at__gte=day_start,
+                created_at__lt=day_start + timedelta(days=1),
+            ).exists()
+            if already_awarded:
+                return False
+            # Recorded directly, never buffered, so the check above sees it
+            record_karma_events([
+                KarmaEvent(
+                    user_id=user.pk,
+                    action='daily_visit',
+                    points=KARMA_VALUES['daily_visit'],
+                    reason=f"Daily visit on {today}",
+                )
+            ])
+    except Exception:
+        # Let a later visit retry the award
+        cache.delete(key)
+        raise
+    return True
+
+def _ranked_profiles(entries):
+    """Load the profiles for leaderboard entries, in order, with .rank set."""
+    profiles = Profile.objects.select_related('user').in_bulk(
+        [entry.user_id for entry in entries], field_name='user_id'
+    )
+    ranked = []
+    for entry in entries:
+        profile = profiles.get(entry.user_id)
+        if profile is not None:
+            profile.rank = entry.rank
+            ranked.append(profile)
+    return ranked
 
 def get_karma_leaderboard(limit=10):
-    """Get the top users by karma points"""
-    return Profile.objects.order_by('-karma')[:limit]
+    """Get the top users by karma points, as Profiles with a rank attribute"""
+    return _ranked_profiles(karma_leaderboard.top(limit))
+
+def get_karma_rank(user):
+    """Get a user's leaderboard rank, or None"""
+    return karma_leaderboard.rank_of(user.pk)
+
+def get_karma_neighbours(user, radius=2):
+    """Get the users ranked around a user, including them, as ranked Profiles"""
+    return _ranked_profiles(karma_leaderboard.around(user.pk, radius))
+
+def get_karma_breakdown(user):
+    """Get a user's karma per action, as dicts with action, total and count"""
+    return (
+        KarmaTotal.objects.filter(user=user)
+        .values('action', total=F('points'), count=F('events'))
+        .order_by('-points')
+    )
+
+def get_karma_daily_totals(user, days=30):
+    """
+    Get a user's karma per day for the last few days, oldest first.
+    
+    Returns:
+        List of dicts with day, points and height (percent of the busiest
+        day, for drawing a sparkline), one per day including empty ones
+    """
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    points_by_day = dict(
+        KarmaRollup.objects.filter(user=user, day__gte=start)
+        .values_list('day')
+        .annotate(points=Sum('points'))
+        .order_by()
+    )
+    history = [
+        {'day': start + timedelta(days=offset), 'points': points_by_day.get(start + timedelta(days=offset), 0)}
+        for offset in range(days)
+    ]
+    busiest = max((abs(entry['points']) for entry in history), default=0) or 1
+    for entry in history:
+        entry['height'] = round(100 * abs(entry['points']) / busiest)
+    return history
 
 def get_user_karma_history(user, limit=20):
     """Get recent karma events for a user"""
-    from .models import KarmaEvent
     return KarmaEvent.objects.filter(user=user).order_by('-created_at')[:limit]
 
 def deduct_critique_karma(user, critique):
@@ -164,9 +442,7 @@ def deduct_critique_karma(user, critique):
     points_to_deduct = -KARMA_VALUES['critique_posted']  # Negative to deduct
     
     with transaction.atomic():
-        # Create a negative KarmaEvent record
-        from .models import KarmaEvent
-        
+        # Create a negative KarmaEvent record and update the user's total
         event = KarmaEvent.objects.create(
             user=user,
             action='critique_deleted',
@@ -174,10 +450,7 @@ def deduct_critique_karma(user, critique):
             reason=f"Deleted critique on artwork: {critique.artwork.title}",
             created_at=timezone.now()
         )
+        apply_karma_deltas({user.pk: points_to_deduct})
+        apply_karma_rollups([event])
         
-        # Update user's total karma
-        profile, created = Profile.objects.get_or_create(user=user)
-        profile.karma += points_to_deduct
-        profile.save()
-        
-        return True
\ No newline at end of file
+        return True
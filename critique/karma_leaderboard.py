@@ -0,0 +1,198 @@
+"""
+Materialized karma leaderboard.
+
+Keeps every profile's karma in a sorted in-memory index so the leaderboard
+page doesn't sort the Profile table, and a user's rank doesn't need a
+count(karma > mine) range scan, on every view:
+
+    top(limit)                  the highest-karma users
+    rank_of(user_id)            a user's rank, by binary search
+    around(user_id, radius)     the users ranked just above and below
+
+Ranks are competition ranks: users with equal karma share a rank, and the
+next rank skips accordingly (1, 2, 2, 4).
+
+The index is built lazily once per process from a single query and then
+kept current by apply_karma_deltas() in critique.karma, the karma
+recomputation and the Profile signal handlers. A periodic rebuild
+(KARMA_LEADERBOARD_REFRESH_SECONDS) lets worker processes converge on
+awards applied in other processes.
+"""
+
+import bisect
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from .models import Profile
+
+LeaderboardEntry = namedtuple('LeaderboardEntry', ['rank', 'user_id', 'karma'])
+
+
+class KarmaLeaderboard:
+    """
+    Karma ranking of every profile.
+
+    Karma lives in a dict keyed by user ID and the rank keys, (-karma,
+    user_id), in a sorted list, so a rank is two O(1)/O(log n) lookups and
+    reading the top only touches the entries it returns.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._karma = {}     # user_id -> karma
+        self._ranked = []    # sorted list of (-karma, user_id)
+        self._loaded_at = None
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    @property
+    def is_loaded(self):
+        return self._loaded_at is not None
+
+    def _is_stale(self):
+        if self._loaded_at is None:
+            return True
+        refresh_seconds = getattr(settings, 'KARMA_LEADERBOARD_REFRESH_SECONDS', 300)
+        return refresh_seconds and time.monotonic() - self._loaded_at > refresh_seconds
+
+    def ensure_loaded(self):
+        """Build the index if it has never been built or has gone stale."""
+        if self._is_stale():
+            self.rebuild()
+
+    def rebuild(self):
+        """Rebuild the index from the database with a single query."""
+        self.load(Profile.objects.values_list('user_id', 'karma'))
+
+    def load(self, rows):
+        """Replace the index contents with (user_id, karma) pairs."""
+        karma = dict(rows)
+        ranked = sorted((-points, user_id) for user_id, points in karma.items())
+
+        with self._lock:
+            self._karma = karma
+            self._ranked = ranked
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Drop the index so the next read rebuilds it."""
+        with self._lock:
+            self._karma = {}
+            self._ranked = []
+            self._loaded_at = None
+
+    # ------------------------------------------------------------------
+    # Incremental maintenance
+    # ------------------------------------------------------------------
+
+    def _remove(self, user_id):
+        points = self._karma.pop(user_id, None)
+        if points is None:
+            return None
+        key = (-points, user_id)
+        index = bisect.bisect_left(self._ranked, key)
+        if index < len(self._ranked) and self._ranked[index] == key:
+            del self._ranked[index]
+        return points
+
+    def _insert(self, user_id, points):
+        self._karma[user_id] = points
+        bisect.insort(self._ranked, (-points, user_id))
+
+    def set_karma(self, user_id, points):
+        """
+        Add a user or move them to a new karma total.
+
+        Nothing happens if the index has not been built yet, since the lazy
+        build will pick the change up.
+        """
+        if not self.is_loaded:
+            return
+        with self._lock:
+            self._remove(user_id)
+            self._insert(user_id, points)
+
+    def apply_deltas(self, deltas):
+        """
+        Move users by karma deltas, as applied to Profile.karma.
+
+        Users the index doesn't know (profiles created in another process)
+        are left for the next rebuild, since their total isn't known here.
+
+        Args:
+            deltas: Dict mapping user ID to change in karma
+        """
+        if not self.is_loaded:
+            return
+        with self._lock:
+            for user_id, delta in deltas.items():
+                points = self._remove(user_id)
+                if points is not None:
+                    self._insert(user_id, points + delta)
+
+    def discard(self, user_id):
+        """Remove a user from the index if present."""
+        with self._lock:
+            self._remove(user_id)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self._karma)
+
+    def _rank_for(self, points):
+        # Number of users with strictly more karma, plus one
+        return bisect.bisect_left(self._ranked, (-points,)) + 1
+
+    def _entries(self, keys):
+        return [
+            LeaderboardEntry(self._rank_for(-neg_points), user_id, -neg_points)
+            for neg_points, user_id in keys
+        ]
+
+    def top(self, limit):
+        """Return the first ``limit`` LeaderboardEntry objects, best first."""
+        self.ensure_loaded()
+        with self._lock:
+            return self._entries(self._ranked[:limit])
+
+    def rank_of(self, user_id):
+        """Return a user's rank, or None if they have no profile."""
+        self.ensure_loaded()
+        with self._lock:
+            points = self._karma.get(user_id)
+            if points is None:
+                return None
+            return self._rank_for(points)
+
+    def around(self, user_id, radius=2):
+        """
+        Return the user's entry with up to ``radius`` entries either side.
+
+        Args:
+            user_id: The user to centre on
+            radius: Neighbours to include above and below
+
+        Returns:
+            List of LeaderboardEntry objects, best first; empty if the user
+            has no profile
+        """
+        self.ensure_loaded()
+        with self._lock:
+            points = self._karma.get(user_id)
+            if points is None:
+                return []
+            index = bisect.bisect_left(self._ranked, (-points, user_id))
+            return self._entries(self._ranked[max(0, index - radius):index + radius + 1])
+
+
+# Process-wide leaderboard used by the karma views and kept current by
+# critique.karma and the Profile signals
+karma_leaderboard = KarmaLeaderboard()
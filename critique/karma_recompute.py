@@ -0,0 +1,233 @@
+"""
+Set-based karma recomputation.
+
+Recomputes Profile.karma from what users have actually done, using the same
+point values as critique.karma.KARMA_VALUES:
+
+    artwork_upload      artworks authored
+    comment_posted      comments written
+    comment_received    comments by others on the user's artworks
+    like_given          likes given
+    artwork_liked       likes by others on the user's artworks
+    critique_posted     critiques written
+    critique_received   critiques by others on the user's artworks
+
+plus, from the KarmaEvent ledger, the points of the KARMA_VALUES actions that
+can't be derived from content (daily visits). Other ledger rows are left out:
+critique_deleted (the deleted critique no longer counts either) and rows
+written under other names by the old maintenance script.
+
+Each source is one grouped aggregate query per user-ID range, so a range
+costs a handful of queries however many users and rows it holds. Totals
+that differ from the stored value are written with a chunked bulk_update.
+No KarmaEvent rows are created.
+
+rebuild_karma_rollups() rebuilds the per-day KarmaRollup rows, and the
+per-action KarmaTotal rows summed from them, from the ledger the same way,
+one grouped query per range.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+from .karma import KARMA_VALUES
+from .karma_leaderboard import karma_leaderboard
+from .models import ArtWork, Comment, Critique, KarmaEvent, KarmaRollup, KarmaTotal, Profile
+
+ArtWorkLike = ArtWork.likes.through
+
+# Actions whose karma is recomputed from content rather than the ledger
+DERIVED_ACTIONS = [
+    'artwork_upload', 'comment_posted', 'comment_received', 'like_given',
+    'artwork_liked', 'critique_posted', 'critique_received', 'critique_deleted',
+]
+
+# Actions whose karma only the ledger knows. Anything else in the ledger,
+# e.g. the critique_given/likes_received rows the old maintenance script
+# wrote, duplicates content that is already counted.
+LEDGER_ACTIONS = sorted(set(KARMA_VALUES) - set(DERIVED_ACTIONS))
+
+
+def _counts(queryset, user_field):
+    return queryset.order_by().values_list(user_field).annotate(total=Count('pk'))
+
+
+def _in_range(field, first_id, last_id):
+    # Relation lookups don't support __range
+    return {f'{field}__gte': first_id, f'{field}__lte': last_id}
+
+
+def karma_sources(first_id, last_id):
+    """
+    Return (action, queryset) pairs counting each derived action per user.
+
+    Every queryset yields (user_id, count) rows for users in the ID range.
+    """
+    by_author = _in_range('author_id', first_id, last_id)
+    by_owner = _in_range('artwork__author_id', first_id, last_id)
+    by_user = _in_range('user_id', first_id, last_id)
+
+    return [
+        ('artwork_upload', _counts(ArtWork.objects.filter(**by_author), 'author_id')),
+        ('comment_posted', _counts(Comment.objects.filter(**by_author), 'author_id')),
+        ('comment_received', _counts(
+            Comment.objects.filter(**by_owner).exclude(author_id=F('artwork__author_id')),
+            'artwork__author_id',
+        )),
+        ('like_given', _counts(ArtWorkLike.objects.filter(**by_user), 'user_id')),
+        ('artwork_liked', _counts(
+            ArtWorkLike.objects.filter(**by_owner).exclude(user_id=F('artwork__author_id')),
+            'artwork__author_id',
+        )),
+        ('critique_posted', _counts(Critique.objects.filter(**by_author), 'author_id')),
+        ('critique_received', _counts(
+            Critique.objects.filter(**by_owner).exclude(author_id=F('artwork__author_id')),
+            'artwork__author_id',
+        )),
+    ]
+
+
+def expected_karma(first_id, last_id):
+    """
+    Compute the karma every user in an ID range should have.
+
+    Args:
+        first_id: Lowest user ID in the range
+        last_id: Highest user ID in the range
+
+    Returns:
+        Dict mapping user ID to karma, for users with any karma
+    """
+    totals = defaultdict(int)
+    for action, rows in karma_sources(first_id, last_id):
+        points = KARMA_VALUES[action]
+        for user_id, count in rows:
+            totals[user_id] += count * points
+
+    ledger = (
+        KarmaEvent.objects.filter(**_in_range('user_id', first_id, last_id))
+        .filter(action__in=LEDGER_ACTIONS)
+        .order_by()
+        .values_list('user_id')
+        .annotate(points=Sum('points'))
+    )
+    for user_id, points in ledger:
+        totals[user_id] += points
+    return totals
+
+
+def _update_leaderboard(totals):
+    for user_id, karma in totals.items():
+        karma_leaderboard.set_karma(user_id, karma)
+
+
+def recompute_range(first_id, last_id, dry_run=False, chunk_size=1000):
+    """
+    Recompute and store karma for users in an ID range.
+
+    The range's profiles are locked while their totals are computed and
+    written, so awards arriving meanwhile wait and then apply on top.
+
+    Args:
+        first_id: Lowest user ID in the range
+        last_id: Highest user ID in the range
+        dry_run: Compute the differences without writing them
+        chunk_size: Profiles per bulk_update batch
+
+    Returns:
+        List of (user_id, stored, expected) tuples for profiles that differed
+    """
+    with transaction.atomic():
+        profiles = Profile.objects.filter(**_in_range('user_id', first_id, last_id)).only('pk', 'user_id', 'karma')
+        if not dry_run:
+            profiles = profiles.select_for_update()
+        profiles = list(profiles.order_by('user_id'))
+        expected = expected_karma(first_id, last_id)
+
+        diff, changed = [], []
+        for profile in profiles:
+            karma = expected.get(profile.user_id, 0)
+            if profile.karma != karma:
+                diff.append((profile.user_id, profile.karma, karma))
+                profile.karma = karma
+                changed.append(profile)
+
+        if changed and not dry_run:
+            Profile.objects.bulk_update(changed, ['karma'], batch_size=chunk_size)
+            totals = {profile.user_id: profile.karma for profile in changed}
+            transaction.on_commit(lambda: _update_leaderboard(totals))
+    return diff
+
+
+def rebuild_karma_rollups(first_id, last_id, chunk_size=1000):
+    """
+    Rebuild the KarmaRollup and KarmaTotal rows of users in an ID range
+    from the ledger.
+
+    Args:
+        first_id: Lowest user ID in the range
+        last_id: Highest user ID in the range
+        chunk_size: Rows per bulk_create batch
+
+    Returns:
+        Number of rollup rows written
+    """
+    in_range = _in_range('user_id', first_id, last_id)
+    rows = (
+        KarmaEvent.objects.filter(**in_range)
+        .annotate(day=TruncDate('created_at'))
+        .order_by()
+        .values_list('user_id', 'action', 'day')
+        .annotate(points=Sum('points'), events=Count('pk'))
+    )
+    with transaction.atomic():
+        # Lock the users' profiles so awards wait until the rollups are rebuilt
+        list(Profile.objects.select_for_update().filter(**in_range).values_list('pk'))
+        KarmaRollup.objects.filter(**in_range).delete()
+        rollups = KarmaRollup.objects.bulk_create(
+            [
+                KarmaRollup(user_id=user_id, action=action, day=day, points=points, events=events)
+                for user_id, action, day, points, events in rows
+            ],
+            batch_size=chunk_size,
+        )
+
+        lifetime = defaultdict(lambda: [0, 0])
+        for rollup in rollups:
+            totals = lifetime[rollup.user_id, rollup.action]
+            totals[0] += rollup.points
+            totals[1] += rollup.events
+        KarmaTotal.objects.filter(**in_range).delete()
+        KarmaTotal.objects.bulk_create(
+            [
+                KarmaTotal(user_id=user_id, action=action, points=points, events=events)
+                for (user_id, action), (points, events) in lifetime.items()
+            ],
+            batch_size=chunk_size,
+        )
+    return len(rollups)
+
+
+def user_id_ranges(range_size, first_id=None, last_id=None):
+    """
+    Split the users' ID space into consecutive (first, last) ranges.
+
+    Args:
+        range_size: IDs per range
+        first_id: Start of the ID space (defaults to the lowest profile's user ID)
+        last_id: End of the ID space (defaults to the highest)
+    """
+    if first_id is None or last_id is None:
+        ids = Profile.objects.order_by('user_id').values_list('user_id', flat=True)
+        lowest, highest = ids.first(), ids.last()
+        if lowest is None:
+            return []
+        first_id = lowest if first_id is None else first_id
+        last_id = highest if last_id is None else last_id
+    return [
+        (start, min(start + range_size - 1, last_id))
+        for start in range(first_id, last_id + 1, range_size)
+    ]
@@ -0,0 +1,57 @@
+"""
+Management command that moves old read notifications into the archive.
+Run with: python manage.py archive_notifications [--days 90] [--dry-run]
+
+Schedule it daily, e.g. from cron:
+
+    15 3 * * * python manage.py archive_notifications
+
+or keep it running with --interval (seconds between passes). Rows move in
+chunks of --chunk-size, one transaction per chunk (see
+critique.notification_archive).
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from critique.notification_archive import (
+    archivable_notifications, archive_read_notifications,
+)
+
+
+class Command(BaseCommand):
+    help = 'Moves read notifications older than the retention period into the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Retention period (defaults to NOTIFICATION_RETENTION_DAYS)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Notifications per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Report how many would be archived')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Keep running, archiving every this many seconds')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is None:
+            days = getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90)
+
+        if options['dry_run']:
+            count = archivable_notifications(days).count()
+            self.stdout.write(
+                self.style.WARNING(f'{count} read notifications older than {days} days would be archived (dry run)')
+            )
+            return
+
+        try:
+            while True:
+                archived = archive_read_notifications(days, chunk_size=options['chunk_size'])
+                self.stdout.write(
+                    self.style.SUCCESS(f'Archived {archived} read notifications older than {days} days')
+                )
+                if options['interval'] is None:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,31 @@
+"""
+Management command to build KarmaRollup and KarmaTotal rows from the
+KarmaEvent ledger.
+Run with: python manage.py backfill_karma_rollups [--range-size 5000]
+
+Rollups are maintained as karma is awarded; run this once after deploying
+them, or whenever they need rebuilding. Each user-ID range is rebuilt in its
+own transaction with one grouped query (see critique.karma_recompute).
+"""
+
+from django.core.management.base import BaseCommand
+
+from critique.karma_recompute import rebuild_karma_rollups, user_id_ranges
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-day karma rollups and per-action karma totals from karma events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--range-size', type=int, default=5000, help='User IDs per rebuild transaction')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rollup rows per insert batch')
+
+    def handle(self, *args, **options):
+        total = 0
+        for first_id, last_id in user_id_ranges(options['range_size']):
+            written = rebuild_karma_rollups(first_id, last_id, chunk_size=options['chunk_size'])
+            total += written
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Users {first_id}-{last_id}: {written} rollups')
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {total} karma rollups'))
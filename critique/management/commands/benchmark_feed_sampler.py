@@ -0,0 +1,101 @@
+"""
+Management command to compare the feed pair samplers.
+Run with: python manage.py benchmark_feed_sampler
+
+Builds a synthetic candidate pool in memory (no database access), draws the
+same number of pairs with every sampler and reports latency and fairness:
+
+    mean/p95 us   Time per pick
+    coverage      Share of the pool shown at least once
+    zero-crit     Share of exposures that went to uncritiqued artworks
+    contrast      Share of pairs with a different author and medium
+    gini          Inequality of exposure across the pool (0 = perfectly even)
+"""
+
+import random
+import statistics
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from critique.feed_pool import CandidatePool, PoolEntry
+from critique.feed_sampling import SAMPLERS
+
+MEDIUMS = ['Oil', 'Acrylic', 'Watercolor', 'Ink', 'Digital', 'Pencil', 'Charcoal', 'Photography']
+
+
+def _gini(values):
+    values = sorted(values)
+    total = sum(values)
+    if not total:
+        return 0.0
+    weighted = sum((index + 1) * value for index, value in enumerate(values))
+    return (2 * weighted) / (len(values) * total) - (len(values) + 1) / len(values)
+
+
+class Command(BaseCommand):
+    help = 'Compares latency and fairness of the feed pair samplers on a synthetic pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=5000, help='Artworks in the synthetic pool')
+        parser.add_argument('--authors', type=int, default=400, help='Distinct authors')
+        parser.add_argument('--picks', type=int, default=2000, help='Pairs drawn per sampler')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    def _build_pool(self, size, authors, rng, now):
+        # Skewed like real traffic: most work has few critiques, a few have many,
+        # and a handful of mediums dominate
+        entries = [
+            PoolEntry(
+                artwork_id=artwork_id,
+                author_id=rng.randint(1, authors),
+                medium=rng.choices(MEDIUMS, weights=[8, 5, 4, 3, 10, 2, 1, 1])[0],
+                created_ts=now - rng.expovariate(1 / (30 * 86400)),
+                crit_count=int(rng.expovariate(1 / 3)),
+            )
+            for artwork_id in range(1, size + 1)
+        ]
+        pool = CandidatePool()
+        pool.load(entries)
+        return pool
+
+    def handle(self, *args, **options):
+        now = time.time()
+        pool = self._build_pool(options['size'], options['authors'], random.Random(options['seed']), now)
+        zero_crit = {entry.artwork_id for entry in pool.top(len(pool)) if entry.crit_count == 0}
+
+        self.stdout.write(
+            f"Pool: {len(pool)} artworks, {len(zero_crit)} uncritiqued, "
+            f"{options['picks']} picks per sampler\n"
+        )
+        self.stdout.write(
+            f"{'sampler':<10} {'mean us':>9} {'p95 us':>9} {'coverage':>9} "
+            f"{'zero-crit':>10} {'contrast':>9} {'gini':>6}"
+        )
+
+        for name, sampler_class in SAMPLERS.items():
+            sampler = sampler_class(rng=random.Random(options['seed']))
+            exposures = Counter()
+            timings = []
+            contrasting = 0
+
+            for _ in range(options['picks']):
+                started = time.perf_counter()
+                spotlight, counter = sampler.sample(pool, set())
+                timings.append((time.perf_counter() - started) * 1_000_000)
+                if not spotlight or not counter:
+                    continue
+                exposures.update((spotlight.artwork_id, counter.artwork_id))
+                if spotlight.author_id != counter.author_id and spotlight.medium != counter.medium:
+                    contrasting += 1
+
+            shown = sum(exposures.values()) or 1
+            all_exposures = [exposures.get(entry.artwork_id, 0) for entry in pool.top(len(pool))]
+            p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+            self.stdout.write(
+                f"{name:<10} {statistics.mean(timings):>9.1f} {p95:>9.1f} "
+                f"{len(exposures) / len(pool):>9.1%} "
+                f"{sum(exposures[i] for i in zero_crit) / shown:>10.1%} "
+                f"{contrasting / options['picks']:>9.1%} {_gini(all_exposures):>6.3f}"
+            )
@@ -0,0 +1,92 @@
+"""
+Management command to measure what the karma_notifications context processor costs per page.
+Run with: python manage.py benchmark_karma_context [--renders 200]
+
+Creates a throwaway user with some karma history (deleted afterwards), then
+calls the context processor for a series of page
+renders, with and without a karma award in between, and compares it with the
+previous implementation (a KarmaEvent lookup plus Notification.get_or_create
+on every render):
+
+    queries/render   Database queries per page render
+    us/render        Mean time per call
+"""
+
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from critique.context_processors import karma_notifications
+from critique.karma import award_karma
+from critique.models import KarmaEvent, Notification
+
+
+def legacy_karma_notifications(request):
+    """The context processor as it was before award_karma left toasts in the cache."""
+    context = {}
+    if request.user.is_authenticated:
+        session_key = f"shown_karma_event_{request.user.id}"
+        last_shown_id = request.session.get(session_key, 0)
+        recent_event = KarmaEvent.objects.filter(
+            user=request.user, id__gt=last_shown_id
+        ).order_by('-created_at').first()
+        if recent_event:
+            request.session[session_key] = recent_event.id
+            context['karma_notification'] = {
+                'points': recent_event.points,
+                'reason': recent_event.reason or f"for {recent_event.action}",
+            }
+            Notification.objects.get_or_create(
+                recipient=request.user,
+                message=f"You earned {recent_event.points} karma points for {recent_event.action}",
+                defaults={'url': '/profile/', 'is_read': False},
+            )
+    return context
+
+
+class Command(BaseCommand):
+    help = 'Compares per-render queries and time of the karma_notifications context processor'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=200, help='Page renders per scenario')
+        parser.add_argument('--award-every', type=int, default=10,
+                            help='Award karma before every Nth render in the "awards" scenario')
+
+    def _run(self, processor, request, renders, award_every=None):
+        queries, timings = 0, []
+        for index in range(renders):
+            if award_every and index % award_every == 0:
+                award_karma(request.user, 'like_given', f"Benchmark award {index}")
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                processor(request)
+                timings.append((time.perf_counter() - started) * 1_000_000)
+            queries += len(captured)
+        return queries / renders, statistics.mean(timings)
+
+    def handle(self, *args, **options):
+        renders = options['renders']
+        rows = []
+        user = User.objects.create_user(username='karma-benchmark-user')
+        try:
+            award_karma(user, 'artwork_upload', 'Benchmark history')
+            request = RequestFactory().get('/')
+            request.user = user
+            request.session = {}
+
+            for name, processor in [('legacy', legacy_karma_notifications), ('toast', karma_notifications)]:
+                request.session.clear()
+                rows.append((name, 'idle', *self._run(processor, request, renders)))
+                rows.append((name, 'awards', *self._run(processor, request, renders, options['award_every'])))
+        finally:
+            user.delete()
+
+        self.stdout.write(f"{renders} renders per scenario, awards before every {options['award_every']}th\n")
+        self.stdout.write(f"{'processor':<10} {'scenario':<8} {'queries/render':>15} {'us/render':>10}")
+        for name, scenario, queries, micros in rows:
+            self.stdout.write(f"{name:<10} {scenario:<8} {queries:>15.2f} {micros:>10.1f}")
@@ -0,0 +1,42 @@
+"""
+Management command that delivers queued WebSocket notifications.
+Run with: python manage.py dispatch_notifications [--once] [--interval 0.5]
+
+Drains the NotificationOutbox table through the channel layer (see
+critique.outbox). Run one long-lived dispatcher alongside the ASGI workers
+when USE_REDIS is on; several can run at once, they take turns on the rows.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from critique.outbox import dispatch_pending
+
+
+class Command(BaseCommand):
+    help = 'Sends pending notification outbox messages through the channel layer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the outbox once and exit')
+        parser.add_argument('--interval', type=float, default=0.5,
+                            help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--batch-size', type=int, default=None, help='Messages per pass')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+        try:
+            while True:
+                sent = dispatch_pending(batch_size=batch_size)
+                total += sent
+                if sent and options['verbosity'] > 1:
+                    self.stdout.write(f'Sent {sent} messages')
+                if not sent:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'Sent {total} notification messages'))
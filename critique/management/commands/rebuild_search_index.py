@@ -0,0 +1,29 @@
+"""
+Management command to rebuild the artwork full-text search index.
+Run with: python manage.py rebuild_search_index
+
+Reindexes every artwork, e.g. after bulk imports or raw SQL updates that
+bypassed the signal handlers in critique.signals.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from critique.search import FTS_TABLE, rebuild_index, search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index for artworks'
+
+    def handle(self, *args, **options):
+        backend = search_backend()
+        if not backend:
+            self.stdout.write(self.style.WARNING(
+                f'No search index on this database (is migration 0026 applied? expected {FTS_TABLE} '
+                'on SQLite or PostgreSQL); search falls back to icontains'
+            ))
+            return
+
+        with transaction.atomic():
+            indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} artworks ({backend})'))
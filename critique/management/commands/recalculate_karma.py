@@ -0,0 +1,64 @@
+"""
+Management command to recompute every user's karma from their activity.
+Run with: python manage.py recalculate_karma [--dry-run] [--workers 4]
+
+Replaces scripts/maintenance/recalculate_karma.py. Totals are computed with
+grouped aggregate queries per user-ID range (see critique.karma_recompute)
+and only profiles whose karma differs are written, with bulk_update. With
+--workers the ranges are spread over a process pool (ignored on SQLite,
+which only allows one writer).
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from critique.karma_recompute import recompute_range, user_id_ranges
+
+
+def _recompute_in_worker(first_id, last_id, dry_run, chunk_size):
+    try:
+        return recompute_range(first_id, last_id, dry_run=dry_run, chunk_size=chunk_size)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Profile.karma from artworks, comments, likes, critiques and the karma ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Show the differences without writing them')
+        parser.add_argument('--range-size', type=int, default=5000, help='User IDs per aggregate pass')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Profiles per bulk_update batch')
+        parser.add_argument('--workers', type=int, default=1, help='Processes to spread the ranges over')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        chunk_size = options['chunk_size']
+        ranges = user_id_ranges(options['range_size'])
+
+        if options['workers'] > 1 and len(ranges) > 1 and connection.vendor != 'sqlite':
+            # Children must open their own database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                results = pool.map(
+                    _recompute_in_worker, *zip(*[(first, last, dry_run, chunk_size) for first, last in ranges])
+                )
+                diffs = [row for result in results for row in result]
+        else:
+            diffs = [
+                row for first, last in ranges
+                for row in recompute_range(first, last, dry_run=dry_run, chunk_size=chunk_size)
+            ]
+
+        if options['verbosity'] > 1 or dry_run:
+            for user_id, stored, expected in diffs:
+                self.stdout.write(f'User {user_id}: {stored} -> {expected} ({expected - stored:+d})')
+
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING(f'{len(diffs)} profiles have different karma (dry run)')
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Updated karma on {len(diffs)} profiles'))
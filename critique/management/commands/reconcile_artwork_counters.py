@@ -0,0 +1,42 @@
+"""
+Management command to repair the denormalized ArtWork engagement counters.
+Run with: python manage.py reconcile_artwork_counters [--dry-run]
+
+Recomputes likes_count, critiques_count, reactions_count and popularity_score
+from the source tables in ID-ordered chunks, e.g. after bulk imports or raw
+SQL that bypassed the signal handlers.
+"""
+
+from django.core.management.base import BaseCommand
+
+from critique.counters import find_drift, recount_counters
+from critique.models import ArtWork
+from critique.reconcile import reconcile_in_chunks
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored like, critique and reaction counters on artworks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Artworks per batch')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        checked, drift = reconcile_in_chunks(
+            ArtWork.objects.all(), find_drift, recount_counters,
+            key='pk', chunk_size=options['chunk_size'], dry_run=dry_run,
+        )
+        drifted = len(drift)
+        if options['verbosity'] > 1:
+            for artwork_id, stored, actual in drift:
+                self.stdout.write(f'Artwork {artwork_id}: {stored} -> {actual}')
+
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING(f'{drifted} of {checked} artworks have drifted counters (dry run)')
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f'Reconciled {drifted} of {checked} artworks')
+            )
@@ -0,0 +1,42 @@
+"""
+Management command to repair the maintained unread-notification counters.
+Run with: python manage.py reconcile_unread_counts [--dry-run]
+
+Recomputes Profile.unread_notifications_count from the Notification table in
+user-ordered chunks, e.g. after admin edits or raw SQL that bypassed
+critique.unread_counts.
+"""
+
+from django.core.management.base import BaseCommand
+
+from critique.models import Profile
+from critique.reconcile import reconcile_in_chunks
+from critique.unread_counts import find_drift, recount_unread
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored unread notification counters on profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Profiles per batch')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        checked, drift = reconcile_in_chunks(
+            Profile.objects.all(), find_drift, recount_unread,
+            key='user_id', chunk_size=options['chunk_size'], dry_run=dry_run,
+        )
+        drifted = len(drift)
+        if options['verbosity'] > 1:
+            for user_id, stored, actual in drift:
+                self.stdout.write(f'User {user_id}: {stored} -> {actual}')
+
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING(f'{drifted} of {checked} profiles have a drifted unread count (dry run)')
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f'Reconciled {drifted} of {checked} profiles')
+            )
@@ -0,0 +1,61 @@
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count(queryset, outer_field):
+    counts = (
+        queryset.filter(**{outer_field: OuterRef('pk')})
+        .order_by()
+        .values(outer_field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def backfill_counters(apps, schema_editor):
+    ArtWork = apps.get_model('critique', 'ArtWork')
+    Critique = apps.get_model('critique', 'Critique')
+    Reaction = apps.get_model('critique', 'Reaction')
+
+    likes = _count(ArtWork.likes.through.objects.all(), 'artwork_id')
+    critiques = _count(Critique.objects.all(), 'artwork_id')
+    reactions = _count(Reaction.objects.all(), 'critique__artwork_id')
+    ArtWork.objects.update(
+        likes_count=likes,
+        critiques_count=critiques,
+        reactions_count=reactions,
+        popularity_score=critiques * 2 + likes + reactions,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('critique', '0023_artwork_critique_areas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artwork',
+            name='likes_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='artwork',
+            name='critiques_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='artwork',
+            name='reactions_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='artwork',
+            name='popularity_score',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
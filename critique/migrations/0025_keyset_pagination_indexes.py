@@ -0,0 +1,51 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('critique', '0024_artwork_engagement_counters'),
+    ]
+
+    operations = [
+        # The single-column counter indexes are superseded by the keyset indexes
+        migrations.AlterField(
+            model_name='artwork',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='artwork',
+            name='critiques_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='artwork',
+            name='popularity_score',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['-created_at', '-id'], name='artwork_created_keyset'),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['-popularity_score', '-id'], name='artwork_popularity_keyset'),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['-likes_count', '-id'], name='artwork_likes_keyset'),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['-critiques_count', '-id'], name='artwork_critiques_keyset'),
+        ),
+        migrations.AddIndex(
+            model_name='critique',
+            index=models.Index(fields=['-created_at', '-id'], name='critique_created_keyset'),
+        ),
+        migrations.AddIndex(
+            model_name='critique',
+            index=models.Index(fields=['artwork', '-created_at', '-id'], name='critique_artwork_keyset'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+from django.db import migrations
+
+FTS_TABLE = 'critique_artwork_fts'
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "ALTER TABLE critique_artwork ADD COLUMN IF NOT EXISTS search_vector tsvector"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS artwork_search_vector_gin "
+            "ON critique_artwork USING GIN (search_vector)"
+        )
+        schema_editor.execute(
+            "UPDATE critique_artwork AS a SET search_vector = "
+            "setweight(to_tsvector('english', coalesce(a.title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(a.tags, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce("
+            "(SELECT username FROM auth_user WHERE id = a.author_id), '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(a.description, '')), 'C')"
+        )
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "title, tags, author, description, "
+            "tokenize = 'porter unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, tags, author, description) "
+            "SELECT a.id, a.title, a.tags, coalesce(u.username, ''), a.description "
+            "FROM critique_artwork a LEFT JOIN auth_user u ON u.id = a.author_id"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS artwork_search_vector_gin")
+        schema_editor.execute("ALTER TABLE critique_artwork DROP COLUMN IF EXISTS search_vector")
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('critique', '0025_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
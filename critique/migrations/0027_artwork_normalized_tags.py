@@ -0,0 +1,63 @@
+from django.db import migrations, models
+
+
+def backfill_normalized_tags(apps, schema_editor):
+    ArtWork = apps.get_model('critique', 'ArtWork')
+    ArtWorkTag = apps.get_model('critique', 'ArtWorkTag')
+    Link = ArtWork.normalized_tags.through
+
+    # Same normalization as critique.artwork_tags.normalize_tag
+    labels = {}
+    artwork_names = []
+    for artwork_id, text in ArtWork.objects.exclude(tags='').values_list('id', 'tags').iterator():
+        names = []
+        for raw in text.split(','):
+            label = ' '.join(raw.strip().lstrip('#').split())[:50]
+            name = label.lower()
+            if name and name not in names:
+                names.append(name)
+                labels.setdefault(name, label)
+        artwork_names.append((artwork_id, names))
+
+    ArtWorkTag.objects.bulk_create(
+        [ArtWorkTag(name=name, label=label) for name, label in labels.items()],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    tag_ids = dict(ArtWorkTag.objects.values_list('name', 'id'))
+    Link.objects.bulk_create(
+        [
+            Link(artwork_id=artwork_id, artworktag_id=tag_ids[name])
+            for artwork_id, names in artwork_names
+            for name in names
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('critique', '0026_artwork_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtWorkTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Lowercased, whitespace-collapsed tag', max_length=50, unique=True)),
+                ('label', models.CharField(help_text='Tag as first entered, for display', max_length=50)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='artwork',
+            name='normalized_tags',
+            field=models.ManyToManyField(blank=True, related_name='artworks', to='critique.artworktag'),
+        ),
+        migrations.RunPython(backfill_normalized_tags, migrations.RunPython.noop),
+    ]
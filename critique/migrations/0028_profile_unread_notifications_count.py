@@ -0,0 +1,35 @@
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread_counts(apps, schema_editor):
+    Notification = apps.get_model('critique', 'Notification')
+    Profile = apps.get_model('critique', 'Profile')
+
+    counts = (
+        Notification.objects.filter(recipient_id=OuterRef('user_id'), is_read=False)
+        .order_by()
+        .values('recipient_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Profile.objects.update(
+        unread_notifications_count=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('critique', '0027_artwork_normalized_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='unread_notifications_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
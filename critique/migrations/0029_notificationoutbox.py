@@ -0,0 +1,29 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('critique', '0028_profile_unread_notifications_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('group', models.CharField(help_text='Channel layer group to send to', max_length=100)),
+                ('message', models.JSONField(help_text='Message passed to group_send')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Not sent before this time (retry backoff)')),
+                ('last_error', models.TextField(blank=True)),
+                ('failed', models.BooleanField(default=False, help_text='Gave up after too many attempts')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['failed', 'available_at', 'id'], name='outbox_pending')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('critique', '0029_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='kind',
+            field=models.CharField(blank=True, help_text='Event type, e.g. artwork_liked', max_length=30),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='actor_count',
+            field=models.PositiveIntegerField(default=1, help_text='Events merged into this notification'),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='last_actor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'target_content_type', 'target_object_id', 'kind'], name='notification_coalesce'),
+        ),
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='key',
+            field=models.CharField(blank=True, help_text='Messages with the same group and key replace each other until sent', max_length=100),
+        ),
+    ]
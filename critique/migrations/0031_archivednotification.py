@@ -0,0 +1,85 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_archive_table(apps, schema_editor):
+    ArchivedNotification = apps.get_model('critique', 'ArchivedNotification')
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.create_model(ArchivedNotification)
+        return
+
+    # Django can't declare partitioned tables. The primary key has to include
+    # the partition key; the ID alone is still unique, since it is copied
+    # from Notification. Monthly partitions are created by the archiver.
+    qn = schema_editor.quote_name
+    table = qn(ArchivedNotification._meta.db_table)
+    users = qn(apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table)
+    content_types = qn(apps.get_model('contenttypes', 'ContentType')._meta.db_table)
+    schema_editor.execute(f"""
+        CREATE TABLE {table} (
+            "id" bigint NOT NULL,
+            "recipient_id" integer NOT NULL REFERENCES {users} ("id") DEFERRABLE INITIALLY DEFERRED,
+            "message" text NOT NULL,
+            "target_content_type_id" integer NULL REFERENCES {content_types} ("id") DEFERRABLE INITIALLY DEFERRED,
+            "target_object_id" integer NULL CHECK ("target_object_id" >= 0),
+            "url" varchar(255) NOT NULL,
+            "created_at" timestamp with time zone NOT NULL,
+            "kind" varchar(30) NOT NULL,
+            "actor_count" integer NOT NULL CHECK ("actor_count" >= 0),
+            "last_actor_id" integer NULL REFERENCES {users} ("id") DEFERRABLE INITIALLY DEFERRED,
+            "archived_at" timestamp with time zone NOT NULL,
+            PRIMARY KEY ("id", "created_at")
+        ) PARTITION BY RANGE ("created_at")
+    """)
+    schema_editor.execute(
+        f'CREATE INDEX "archived_notification_recent" ON {table} ("recipient_id", "created_at" DESC, "id" DESC)'
+    )
+    schema_editor.execute(
+        f'CREATE INDEX "critique_archivednotification_last_actor_id" ON {table} ("last_actor_id")'
+    )
+    schema_editor.execute(
+        f'CREATE INDEX "critique_archivednotification_target_ct_id" ON {table} ("target_content_type_id")'
+    )
+
+
+def drop_archive_table(apps, schema_editor):
+    # Dropping a partitioned table drops its partitions too
+    schema_editor.delete_model(apps.get_model('critique', 'ArchivedNotification'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('critique', '0030_notification_coalescing'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ArchivedNotification',
+                    fields=[
+                        ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                        ('message', models.TextField()),
+                        ('target_object_id', models.PositiveIntegerField(blank=True, null=True)),
+                        ('url', models.CharField(blank=True, max_length=255)),
+                        ('created_at', models.DateTimeField()),
+                        ('kind', models.CharField(blank=True, max_length=30)),
+                        ('actor_count', models.PositiveIntegerField(default=1)),
+                        ('archived_at', models.DateTimeField(auto_now_add=True)),
+                        ('last_actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                        ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to=settings.AUTH_USER_MODEL)),
+                        ('target_content_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+                    ],
+                    options={
+                        'ordering': ['-created_at'],
+                        'indexes': [models.Index(fields=['recipient', '-created_at', '-id'], name='archived_notification_recent')],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_archive_table, drop_archive_table),
+    ]
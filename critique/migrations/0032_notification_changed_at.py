@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+def backfill_changed_at(apps, schema_editor):
+    Notification = apps.get_model('critique', 'Notification')
+    Notification.objects.update(changed_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('critique', '0031_archivednotification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='changed_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_changed_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'changed_at', 'id'], name='notification_changes'),
+        ),
+    ]
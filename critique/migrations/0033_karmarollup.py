@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('critique', '0032_notification_changed_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KarmaRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(max_length=50)),
+                ('day', models.DateField()),
+                ('points', models.IntegerField(default=0)),
+                ('events', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='karma_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Karma Rollup',
+                'verbose_name_plural': 'Karma Rollups',
+                'indexes': [models.Index(fields=['user', 'day'], name='karma_rollup_user_day')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'action', 'day'), name='unique_karma_rollup')],
+            },
+        ),
+    ]
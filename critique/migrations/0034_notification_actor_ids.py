@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+BATCH_SIZE = 1000
+
+
+def backfill_actor_ids(apps, schema_editor):
+    # Earlier actors of merged notifications weren't recorded; start from the last one
+    Notification = apps.get_model('critique', 'Notification')
+    rows = Notification.objects.filter(last_actor__isnull=False).order_by('pk').only('pk', 'last_actor_id')
+    last_pk = 0
+    while True:
+        # Keyset chunks, one bulk UPDATE each, however large the table is
+        chunk = list(rows.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not chunk:
+            break
+        for notification in chunk:
+            notification.actor_ids = [notification.last_actor_id]
+        Notification.objects.bulk_update(chunk, ['actor_ids'])
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('critique', '0033_karmarollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='actor_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='actor_count',
+            field=models.PositiveIntegerField(default=1, help_text='Distinct people merged into this notification'),
+        ),
+        migrations.RunPython(backfill_actor_ids, migrations.RunPython.noop),
+    ]
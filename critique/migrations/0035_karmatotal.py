@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def backfill_karma_totals(apps, schema_editor):
+    # Sum the existing daily rollups; backfill_karma_rollups rebuilds both from the ledger
+    KarmaRollup = apps.get_model('critique', 'KarmaRollup')
+    KarmaTotal = apps.get_model('critique', 'KarmaTotal')
+    rows = (
+        KarmaRollup.objects.order_by()
+        .values_list('user_id', 'action')
+        .annotate(points=Sum('points'), events=Sum('events'))
+    )
+    KarmaTotal.objects.bulk_create(
+        [
+            KarmaTotal(user_id=user_id, action=action, points=points, events=events)
+            for user_id, action, points, events in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('critique', '0034_notification_actor_ids'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KarmaTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(max_length=50)),
+                ('points', models.IntegerField(default=0)),
+                ('events', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='karma_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Karma Total',
+                'verbose_name_plural': 'Karma Totals',
+                'constraints': [models.UniqueConstraint(fields=('user', 'action'), name='unique_karma_total')],
+            },
+        ),
+        migrations.RunPython(backfill_karma_totals, migrations.RunPython.noop),
+    ]
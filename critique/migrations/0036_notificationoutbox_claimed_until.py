@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('critique', '0035_karmatotal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, help_text="A dispatcher is sending this row's group; others leave it alone until then", null=True),
+        ),
+    ]
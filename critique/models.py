@@ -6,6 +6,7 @@ from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.conf import settings
 from django.utils import timezone
+from django.utils.functional import cached_property
 from .validators import validate_image_file
 
 # Import S3 storage backend for files if S3 is enabled
@@ -15,8 +16,28 @@ if settings.USE_S3:
 else:
     s3_storage = None
 
+class CounterFieldsMixin:
+    """
+    Leaves COUNTER_FIELDS out of ordinary saves.
+
+    Counters are written only through F() updates; a full save() of an
+    instance loaded before such an update would write the stale value back.
+    Saves with explicit update_fields, or that insert, are left alone.
+    """
+    COUNTER_FIELDS = ()
+
+    def save(self, *args, **kwargs):
+        if not args and not self._state.adding and kwargs.get('update_fields') is None \
+                and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
 # Create your models here.
-class Profile(models.Model):
+class Profile(CounterFieldsMixin, models.Model):
     """
     Extended user profile model with additional information about the user.
     Includes karma points earned through positive contributions and user role.
@@ -47,6 +68,12 @@ class Profile(models.Model):
         default=ROLE_USER,
         help_text="User role determines permissions in the system"
     )
+    # Maintained by critique.unread_counts
+    unread_notifications_count = models.PositiveIntegerField(default=0)
+
+    # Written only through F() updates (karma: see critique.karma). Profiles
+    # are re-saved whenever their User is, so these matter here.
+    COUNTER_FIELDS = ('unread_notifications_count', 'karma')
     
     def __str__(self):
         return f"{self.user.username}'s profile"
@@ -203,7 +230,25 @@ class ArtWorkVersion(models.Model):
     def __str__(self):
         return f"{self.artwork.title} - Version {self.version_number}"
 
-class ArtWork(models.Model):
+class ArtWorkTag(models.Model):
+    """
+    A normalized artwork tag (e.g. "landscape", "oil painting").
+
+    ArtWork.tags keeps the comma-separated text the artist typed; it is parsed
+    into ArtWork.normalized_tags on save (see critique.artwork_tags) so tag
+    lookups hit an index instead of scanning with LIKE.
+    """
+    name = models.CharField(max_length=50, unique=True, help_text="Lowercased, whitespace-collapsed tag")
+    label = models.CharField(max_length=50, help_text="Tag as first entered, for display")
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.label
+
+
+class ArtWork(CounterFieldsMixin, models.Model):
     """
     Model representing an artwork submitted by a user.
     """
@@ -259,6 +304,8 @@ class ArtWork(models.Model):
     medium = models.CharField(max_length=100, blank=True)  # e.g., "Oil painting", "Digital art"
     dimensions = models.CharField(max_length=100, blank=True)  # e.g., "24x36 inches"
     tags = models.CharField(max_length=200, blank=True)  # Comma-separated tags
+    # Parsed from tags on save; query this rather than the text column
+    normalized_tags = models.ManyToManyField(ArtWorkTag, related_name='artworks', blank=True)
     
     # Portfolio folder organization
     folder = models.ForeignKey(
@@ -276,6 +323,13 @@ class ArtWork(models.Model):
         related_name='liked_artworks',
         blank=True,
     )
+
+    # Denormalized engagement counters, kept current by critique.counters.
+    # popularity_score = critiques * 2 + likes + reactions
+    likes_count = models.PositiveIntegerField(default=0)
+    critiques_count = models.PositiveIntegerField(default=0)
+    reactions_count = models.PositiveIntegerField(default=0)
+    popularity_score = models.PositiveIntegerField(default=0)
     
     # Current version pointer - all image data should live in versions
     current_version = models.ForeignKey(
@@ -287,19 +341,39 @@ class ArtWork(models.Model):
         help_text="Points to the current active version of this artwork"
     )
     
+    # Written only through F() updates (see critique.counters)
+    COUNTER_FIELDS = ('likes_count', 'critiques_count', 'reactions_count', 'popularity_score')
+
+    class Meta:
+        # Keyset pagination keys: each ordering column plus id as tie-breaker
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='artwork_created_keyset'),
+            models.Index(fields=['-popularity_score', '-id'], name='artwork_popularity_keyset'),
+            models.Index(fields=['-likes_count', '-id'], name='artwork_likes_keyset'),
+            models.Index(fields=['-critiques_count', '-id'], name='artwork_critiques_keyset'),
+        ]
+
     def __str__(self):
         return self.title
-        
+
     def total_likes(self):
         """Return the total number of likes for this artwork."""
         return self.likes.count()
     
-    @property
+    @cached_property
     def tags_list(self):
-        """Return tags as a list."""
-        if self.tags:
-            return [tag.strip() for tag in self.tags.split(',') if tag.strip()]
-        return []
+        """
+        Return tag labels as a list, in the order the artist typed them.
+
+        Computed once per instance; prefetch normalized_tags when listing.
+        """
+        if self.pk is None:
+            return []
+        from .artwork_tags import parse_tags
+
+        position = {name: index for index, (name, _) in enumerate(parse_tags(self.tags))}
+        tags = sorted(self.normalized_tags.all(), key=lambda tag: (position.get(tag.name, len(position)), tag.name))
+        return [tag.label for tag in tags]
     
     @property
     def critique_count(self):
@@ -444,6 +518,10 @@ class Critique(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Critique'
         verbose_name_plural = 'Critiques'
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='critique_created_keyset'),
+            models.Index(fields=['artwork', '-created_at', '-id'], name='critique_artwork_keyset'),
+        ]
     
     def __str__(self):
         return f"Critique by {self.author.username} on {self.artwork.title}"
@@ -663,6 +741,58 @@ class KarmaEvent(models.Model):
         return f"Karma: {self.points} points to {self.user.username} for {self.action}"
 
 
+class KarmaRollup(models.Model):
+    """
+    Karma a user earned for one action on one day.
+
+    Maintained alongside the KarmaEvent ledger (see critique.karma), so the
+    karma page's history reads a few rows per active day instead of
+    aggregating the user's whole ledger.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='karma_rollups')
+    action = models.CharField(max_length=50)
+    day = models.DateField()
+    points = models.IntegerField(default=0)
+    events = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'action', 'day'], name='unique_karma_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'day'], name='karma_rollup_user_day'),
+        ]
+        verbose_name = 'Karma Rollup'
+        verbose_name_plural = 'Karma Rollups'
+
+    def __str__(self):
+        return f"{self.user_id} {self.action} on {self.day}: {self.points} points"
+
+
+class KarmaTotal(models.Model):
+    """
+    Karma a user has earned for one action, all time.
+
+    Moved together with the day's KarmaRollup row (see critique.karma), so
+    the karma page's breakdown reads one row per action however long the
+    user has been active.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='karma_totals')
+    action = models.CharField(max_length=50)
+    points = models.IntegerField(default=0)
+    events = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'action'], name='unique_karma_total'),
+        ]
+        verbose_name = 'Karma Total'
+        verbose_name_plural = 'Karma Totals'
+
+    def __str__(self):
+        return f"{self.user_id} {self.action}: {self.points} points"
+
+
 class CritiqueReply(models.Model):
     """
     Model for artist replies to critiques.
@@ -704,11 +834,33 @@ class Notification(models.Model):
     url = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
+    # Coalesced notifications: repeated events of one kind on one target are
+    # merged into a single row (see critique.notification.coalesce_notification)
+    kind = models.CharField(max_length=30, blank=True, help_text="Event type, e.g. artwork_liked")
+    actor_count = models.PositiveIntegerField(default=1, help_text="Distinct people merged into this notification")
+    last_actor = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    # IDs of the users counted in actor_count, so a repeat isn't counted twice
+    actor_ids = models.JSONField(default=list, blank=True)
+    # Last change of any kind (read state, coalesced update); the WebSocket
+    # delta sync sends rows changed since the client's cursor. Queryset
+    # updates must set it explicitly.
+    changed_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['recipient', 'is_read', 'created_at'])
+            models.Index(fields=['recipient', 'is_read', 'created_at']),
+            models.Index(
+                fields=['recipient', 'target_content_type', 'target_object_id', 'kind'],
+                name='notification_coalesce',
+            ),
+            models.Index(fields=['recipient', 'changed_at', 'id'], name='notification_changes'),
         ]
         verbose_name = 'Notification'
         verbose_name_plural = 'Notifications'
@@ -717,6 +869,89 @@ class Notification(models.Model):
         return f"Notification for {self.recipient.username}: {self.message[:50]}"
 
 
+class NotificationOutbox(models.Model):
+    """
+    Channel-layer message waiting to be sent by the notification dispatcher.
+
+    Rows are written in the same transaction as the change that caused them
+    and deleted once sent (see critique.outbox).
+    """
+    group = models.CharField(max_length=100, help_text="Channel layer group to send to")
+    message = models.JSONField(help_text="Message passed to group_send")
+    key = models.CharField(
+        max_length=100, blank=True,
+        help_text="Messages with the same group and key replace each other until sent"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now, help_text="Not sent before this time (retry backoff)")
+    last_error = models.TextField(blank=True)
+    failed = models.BooleanField(default=False, help_text="Gave up after too many attempts")
+    claimed_until = models.DateTimeField(
+        null=True, blank=True,
+        help_text="A dispatcher is sending this row's group; others leave it alone until then"
+    )
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['failed', 'available_at', 'id'], name='outbox_pending'),
+        ]
+
+    def __str__(self):
+        return f"Outbox #{self.pk} to {self.group}"
+
+
+class ArchivedNotification(models.Model):
+    """
+    Read notification moved out of the Notification table by the retention job.
+
+    Rows keep their Notification ID, so IDs and (created_at, id) cursors are
+    unique across both tables (see critique.notification_archive). On
+    PostgreSQL the table is range-partitioned by month of created_at.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_notifications'
+    )
+    message = models.TextField()
+    target_content_type = models.ForeignKey(
+        ContentType,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    target_object_id = models.PositiveIntegerField(null=True, blank=True)
+    target = GenericForeignKey('target_content_type', 'target_object_id')
+    url = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField()
+    kind = models.CharField(max_length=30, blank=True)
+    actor_count = models.PositiveIntegerField(default=1)
+    last_actor = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', '-created_at', '-id'], name='archived_notification_recent'),
+        ]
+
+    # Only read notifications are archived
+    is_read = True
+
+    def __str__(self):
+        return f"Archived notification for {self.recipient.username}: {self.message[:50]}"
+
+
 class AchievementBadge(models.Model):
     """
     Model representing different achievement badges that users can earn.
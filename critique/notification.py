@@ -2,12 +2,21 @@
 Notification functionality for the Art Critique application.
 This module contains functions for creating notifications for various events.
 """
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from django.contrib.contenttypes.prefetch import GenericPrefetch
+from django.db.models import prefetch_related_objects
+from django.db import transaction
+from django.utils import timezone
 import json
-from .models import Notification
+from .models import ArtWork, Critique, Notification, Reaction
+from .outbox import enqueue, user_group
+from .unread_counts import get_unread_count
 
+@transaction.atomic
 def create_critique_notification(critique):
     """
     Create a notification for the artwork author when a new critique is posted.
@@ -36,7 +45,9 @@ def create_critique_notification(critique):
         message=message,
         target_content_type=content_type,
         target_object_id=critique.id,
-        url=f"/artworks/{critique.artwork.id}/"  # URL to the artwork detail page
+        url=f"/artworks/{critique.artwork.id}/",  # URL to the artwork detail page
+        kind='critique_posted',
+        last_actor=critique_author
     )
     
     # Send real-time WebSocket notification
@@ -46,149 +57,231 @@ def create_reaction_notification(reaction):
     """
     Create notification when someone reacts to a critique.
     
+    Reactions to the same critique are coalesced into one notification.
+    
     Args:
         reaction: The Reaction instance that triggered this notification
     """
+    critique = reaction.critique
     # Skip if user is reacting to their own critique
-    if reaction.user == reaction.critique.author:
-        return
-    
-    critique_author = reaction.critique.author
-    reactor_user = reaction.user
-    
-    # Create notification message based on reaction type
-    reaction_display = {
-        'helpful': 'found helpful',
-        'inspiring': 'found inspiring', 
-        'detailed': 'appreciated the detail in'
-    }.get(reaction.type, 'reacted to')
+    if reaction.user_id == critique.author_id:
+        return None
     
-    message = f"{reactor_user.username} {reaction_display} your critique on '{reaction.critique.artwork.title}'"
+    def describe(actor, count):
+        if count == 1:
+            return (f"{actor.username} found your critique on '{critique.artwork.title}' "
+                    f"{reaction.get_reaction_type_display().lower()}")
+        return f"{_actors(actor, count)} reacted to your critique on '{critique.artwork.title}'"
     
-    # Get content type for the reaction object
-    content_type = ContentType.objects.get_for_model(reaction)
-    
-    # Create notification in database
-    notification = Notification.objects.create(
-        recipient=critique_author,
-        message=message,
-        target_content_type=content_type,
-        target_object_id=reaction.id,
-        url=f"/artworks/{reaction.critique.artwork.id}/"
+    return coalesce_notification(
+        recipient=critique.author,
+        actor=reaction.user,
+        kind='reaction_received',
+        target=critique,
+        url=f"/artworks/{critique.artwork_id}/",
+        describe=describe,
     )
-    
-    # Send real-time WebSocket notification
-    send_websocket_notification(critique_author, notification, 'reaction_received')
 
 def create_like_notification(artwork, user):
     """
     Create notification when someone likes an artwork.
     
+    Likes of the same artwork are coalesced into one notification.
+    
     Args:
         artwork: The ArtWork instance that was liked
         user: The User who liked the artwork
     """
     # Skip if user is liking their own artwork
-    if user == artwork.author:
-        return
+    if user.pk == artwork.author_id:
+        return None
     
-    artwork_author = artwork.author
+    def describe(actor, count):
+        return f"{_actors(actor, count)} liked your artwork: '{artwork.title}'"
     
-    message = f"{user.username} liked your artwork: '{artwork.title}'"
+    return coalesce_notification(
+        recipient=artwork.author,
+        actor=user,
+        kind='artwork_liked',
+        target=artwork,
+        url=f"/artworks/{artwork.id}/",
+        describe=describe,
+    )
+
+def _actors(actor, count):
+    """'alice', 'alice and 1 other' or 'alice and 11 others'."""
+    if count == 1:
+        return actor.username
+    others = count - 1
+    return f"{actor.username} and {others} other{'s' if others > 1 else ''}"
+
+def coalesce_notification(recipient, actor, kind, target, url, describe):
+    """
+    Record an event, merging it into a recent notification about the same thing.
     
-    # Get content type for the artwork object
-    content_type = ContentType.objects.get_for_model(artwork)
+    An unread notification of the same kind on the same target created within
+    NOTIFICATION_COALESCE_SECONDS is updated in place ("alice and 11 others
+    liked ...") and pushed again under the same ID; otherwise a new
+    notification is created. Only people not yet counted (actor_ids) raise
+    the count. The row is locked while it is updated, so
+    concurrent events are all counted.
     
-    # Create notification in database
-    notification = Notification.objects.create(
-        recipient=artwork_author,
-        message=message,
-        target_content_type=content_type,
-        target_object_id=artwork.id,
-        url=f"/artworks/{artwork.id}/"
-    )
+    Args:
+        recipient: The User to notify
+        actor: The User who caused the event
+        kind: Event type, e.g. 'artwork_liked'
+        target: Object the event is about
+        url: Link for the notification
+        describe: Callable (actor, actor_count) returning the message text
     
-    # Send real-time WebSocket notification
-    send_websocket_notification(artwork_author, notification, 'artwork_liked')
+    Returns:
+        The created or updated Notification
+    """
+    content_type = ContentType.objects.get_for_model(target)
+    window = getattr(settings, 'NOTIFICATION_COALESCE_SECONDS', 3600)
+    
+    with transaction.atomic():
+        notification = None
+        if window:
+            notification = (
+                Notification.objects.select_for_update()
+                .filter(
+                    recipient=recipient,
+                    kind=kind,
+                    target_content_type=content_type,
+                    target_object_id=target.pk,
+                    is_read=False,
+                    created_at__gte=timezone.now() - timedelta(seconds=window),
+                )
+                .order_by('-created_at')
+                .first()
+            )
+        
+        if notification is None:
+            notification = Notification.objects.create(
+                recipient=recipient,
+                message=describe(actor, 1),
+                target_content_type=content_type,
+                target_object_id=target.pk,
+                url=url,
+                kind=kind,
+                last_actor=actor,
+                actor_ids=[actor.pk],
+            )
+            send_websocket_notification(recipient, notification, kind)
+            return notification
+        
+        actor_ids = notification.actor_ids or [notification.last_actor_id]
+        if actor.pk in actor_ids:
+            # Someone already counted (unlike and like again): nothing new to say
+            return notification
+        
+        notification.actor_ids = actor_ids + [actor.pk]
+        notification.actor_count += 1
+        notification.last_actor = actor
+        notification.message = describe(actor, notification.actor_count)
+        notification.save(update_fields=['actor_count', 'actor_ids', 'last_actor', 'message', 'changed_at'])
+        send_websocket_notification(recipient, notification, kind)
+        return notification
 
 def send_websocket_notification(user, notification, notification_type):
     """
-    Send real-time notification via WebSocket.
+    Queue a real-time notification for the user's WebSocket.
+    
+    The messages are written to the notification outbox in the caller's
+    transaction and delivered by the outbox dispatcher once it commits.
     
     Args:
         user: The User to send the notification to
         notification: The Notification instance
         notification_type: String indicating the type of notification
     """
-    channel_layer = get_channel_layer()
-    
-    if channel_layer is None:
-        # Channel layer not configured, skip WebSocket notification
-        return
-    
     # Prepare notification data
+    target_model = None
+    if notification.target_content_type_id:
+        target_model = ContentType.objects.get_for_id(notification.target_content_type_id).model_class()
     notification_data = {
         'id': notification.id,
         'type': notification_type,
         'title': f"New {notification_type.replace('_', ' ').title()}",
         'message': notification.message,
         'url': notification.url,
-        'read': notification.read,
+        'read': notification.is_read,
         'created_at': notification.created_at.isoformat(),
-        'artwork_id': getattr(notification.artwork, 'id', None) if hasattr(notification, 'artwork') else None,
-        'critique_id': getattr(notification.critique, 'id', None) if hasattr(notification, 'critique') else None,
+        'artwork_id': notification.target_object_id if target_model is ArtWork else None,
+        'critique_id': notification.target_object_id if target_model is Critique else None,
+        'actor_count': notification.actor_count,
     }
     
-    # Send to user's WebSocket group
-    group_name = f'user_notifications_{user.id}'
-    
-    async_to_sync(channel_layer.group_send)(
-        group_name,
-        {
-            'type': 'notification_message',
-            'notification': notification_data
-        }
-    )
+    # Send to user's WebSocket group. Keyed messages that are still queued
+    # are replaced, so a burst of updates to a coalesced notification (and
+    # to the unread count) reaches the client once, with the latest state
+    group_name = user_group(user.id)
+    enqueue(group_name, {
+        'type': 'notification_message',
+        'notification': notification_data
+    }, key=f'notification:{notification.id}')
     
     # Also send updated unread count
-    unread_count = Notification.objects.filter(recipient=user, is_read=False).count()
-    async_to_sync(channel_layer.group_send)(
-        group_name,
-        {
-            'type': 'unread_count_update',
-            'count': unread_count
-        }
-    )
+    enqueue(group_name, {
+        'type': 'unread_count_update',
+        'count': get_unread_count(user)
+    }, key='unread_count')
 
-def create_reaction_notification(reaction):
+def target_prefetch():
     """
-    Create a notification for the critique author when someone reacts to their critique.
-    
+    Prefetch for Notification.target that loads each target type in one query.
+
+    Targets are grouped by content type; critiques and reactions come with
+    the artwork that describe_target() needs.
+    """
+    return GenericPrefetch('target', [
+        ArtWork.objects.all(),
+        Critique.objects.select_related('artwork'),
+        Reaction.objects.select_related('critique__artwork'),
+        User.objects.all(),
+    ])
+
+
+def with_targets(notifications):
+    """
+    Return a Notification queryset that loads its targets in bulk.
+
     Args:
-        reaction: The Reaction instance that triggered this notification
+        notifications: Notification queryset
+
+    Returns:
+        Queryset with content types joined and targets prefetched
     """
-    # Skip if user is reacting to their own critique
-    if reaction.user == reaction.critique.author:
-        return
-        
-    # Get the users involved
-    critique_author = reaction.critique.author
-    reaction_user = reaction.user
-    
-    # Get human-readable reaction type
-    reaction_type_display = reaction.get_reaction_type_display()
-    
-    # Create notification message
-    message = f"{reaction_user.username} found your critique on '{reaction.critique.artwork.title}' {reaction_type_display.lower()}"
-    
-    # Get content type for the reaction object
-    content_type = ContentType.objects.get_for_model(reaction)
-    
-    # Create notification in database
-    Notification.objects.create(
-        recipient=critique_author,
-        message=message,
-        target_content_type=content_type,
-        target_object_id=reaction.id,
-        url=f"/artworks/{reaction.critique.artwork.id}/"  # URL to the artwork page
-    )
\ No newline at end of file
+    return notifications.select_related('target_content_type').prefetch_related(target_prefetch())
+
+
+def prefetch_targets(notifications):
+    """Bulk-load targets for already fetched notifications (e.g. a page)."""
+    prefetch_related_objects(list(notifications), target_prefetch())
+
+
+def describe_target(target):
+    """
+    Return a human-readable description of a notification target.
+
+    Args:
+        target: The notification's target object, or None
+
+    Returns:
+        String such as "Artwork: Sunset", or None without a target
+    """
+    if target is None:
+        return None
+
+    if isinstance(target, ArtWork):
+        return f"Artwork: {target.title}"
+    elif isinstance(target, Critique):
+        return f"Critique on: {target.artwork.title}"
+    elif isinstance(target, Reaction):
+        return f"Reaction on critique for: {target.critique.artwork.title}"
+    elif isinstance(target, User):
+        return f"User: {target.username}"
+
+    # Default fallback
+    return str(target)
@@ -0,0 +1,132 @@
+"""
+Notification retention.
+
+Read notifications older than NOTIFICATION_RETENTION_DAYS are moved from
+Notification into ArchivedNotification, so the live table (and its
+recipient/is_read/created_at index) only holds what users are likely to look
+at: unread notifications and recent history.
+
+    archive_read_notifications()    move every old read notification, chunk by chunk
+
+Rows move in ID-ordered chunks; each chunk is inserted into the archive and
+deleted from the live table in one transaction. Archived rows keep their ID,
+so the notification history endpoint can page through both tables with one
+(created_at, id) cursor. On PostgreSQL the archive is partitioned by month;
+ensure_archive_partitions() creates partitions as rows arrive, and old months
+can later be detached or dropped as a whole.
+
+Schedule the archive_notifications management command (cron, or its
+--interval loop) to run this regularly.
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArchivedNotification, Notification
+
+ARCHIVED_FIELDS = [
+    'id', 'recipient_id', 'message', 'target_content_type_id', 'target_object_id',
+    'url', 'created_at', 'kind', 'actor_count', 'last_actor_id',
+]
+
+
+def archive_is_partitioned():
+    """Whether the archive table is range-partitioned (PostgreSQL only)."""
+    return connection.vendor == 'postgresql'
+
+
+def _month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _next_month(start):
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def ensure_archive_partitions(timestamps):
+    """
+    Create the monthly archive partitions covering the given timestamps.
+
+    Does nothing unless the archive is partitioned.
+
+    Args:
+        timestamps: Iterable of aware datetimes that are about to be archived
+    """
+    if not archive_is_partitioned():
+        return
+    table = ArchivedNotification._meta.db_table
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for start in sorted({_month_start(value) for value in timestamps}):
+            partition = f'{table}_p{start:%Y%m}'
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote(partition)} PARTITION OF {quote(table)} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{_next_month(start).isoformat()}')"
+            )
+
+
+def archivable_notifications(days=None, now=None):
+    """
+    Return the read notifications old enough to archive.
+
+    Args:
+        days: Retention period (NOTIFICATION_RETENTION_DAYS by default)
+        now: Reference time (defaults to now)
+    """
+    if days is None:
+        days = getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90)
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    return Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+
+
+def archive_chunk(notifications, chunk_size=1000):
+    """
+    Move the first chunk_size notifications (by ID) into the archive.
+
+    Args:
+        notifications: Notification queryset, e.g. archivable_notifications()
+        chunk_size: Maximum rows to move
+
+    Returns:
+        Number of notifications archived
+    """
+    with transaction.atomic():
+        chunk = notifications.order_by('id')
+        if connection.features.has_select_for_update:
+            # Keeps a concurrent mark_unread from racing the move
+            chunk = chunk.select_for_update()
+        rows = list(chunk.values(*ARCHIVED_FIELDS)[:chunk_size])
+        if not rows:
+            return 0
+
+        ensure_archive_partitions(row['created_at'] for row in rows)
+        ArchivedNotification.objects.bulk_create([ArchivedNotification(**row) for row in rows])
+        Notification.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def archive_read_notifications(days=None, chunk_size=1000, now=None):
+    """
+    Archive every read notification older than the retention period.
+
+    Args:
+        days: Retention period (NOTIFICATION_RETENTION_DAYS by default)
+        chunk_size: Rows moved per transaction
+        now: Reference time (defaults to now)
+
+    Returns:
+        Number of notifications archived
+    """
+    notifications = archivable_notifications(days, now)
+    total = 0
+    while True:
+        moved = archive_chunk(notifications, chunk_size)
+        if not moved:
+            return total
+        total += moved
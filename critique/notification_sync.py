@@ -0,0 +1,154 @@
+"""
+Delta sync for the notification WebSocket.
+
+Instead of re-downloading its recent notifications on every reconnect, a
+client keeps the sync_token from its last response and sends it back:
+
+    {"type": "sync", "since": "<sync_token>"}
+
+or, if it only knows the newest notification it has, {"type": "sync",
+"last_id": 123}. The consumer answers with one or more notifications_delta
+frames holding
+
+    notifications   full payloads of notifications created since the cursor
+    changes         {id, read, message, actor_count} of older notifications
+                    whose read state or coalesced text changed since then
+    has_more        more frames follow (the delta is sent in batches of
+                    NOTIFICATION_SYNC_BATCH_SIZE)
+    sync_token      cursor for the next sync; the final frame also carries
+                    unread_count
+
+Notification.changed_at drives the "since" cursor. Rows changed shortly
+before the cursor (NOTIFICATION_SYNC_OVERLAP_SECONDS) are sent again, so a
+change whose transaction committed after the previous sync read the table
+isn't lost; clients apply entries by ID, which makes repeats harmless. A
+last_id cursor only returns newer notifications.
+"""
+
+from collections import namedtuple
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Notification
+from .notification import describe_target, with_targets
+from .unread_counts import get_unread_count
+
+SyncCursor = namedtuple('SyncCursor', ['since', 'last_id'])
+
+
+def parse_cursor(since=None, last_id=None):
+    """
+    Build a SyncCursor from client input.
+
+    Args:
+        since: sync_token from an earlier response (ISO 8601 timestamp)
+        last_id: ID of the newest notification the client has
+
+    Returns:
+        SyncCursor, or None if the client sent neither
+
+    Raises:
+        ValueError: If a value can't be parsed
+    """
+    if since:
+        parsed = parse_datetime(str(since))
+        if parsed is None:
+            raise ValueError(f'Invalid since: {since!r}')
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, dt_timezone.utc)
+        return SyncCursor(parsed, None)
+    if last_id not in (None, ''):
+        return SyncCursor(None, int(last_id))
+    return None
+
+
+def notification_payload(notification):
+    """Full WebSocket representation of a notification."""
+    return {
+        'id': notification.id,
+        'type': notification.kind or 'notification',
+        'title': 'Notification',  # Generic title
+        'message': notification.message,
+        'read': notification.is_read,
+        'created_at': notification.created_at.isoformat(),
+        'url': notification.url,
+        'target_type': getattr(notification.target_content_type, 'model', None),
+        'target_id': notification.target_object_id,
+        'target_display': describe_target(notification.target),
+        'actor_count': notification.actor_count,
+    }
+
+
+def change_payload(notification):
+    """Compact representation of a change to a notification the client already has."""
+    return {
+        'id': notification.id,
+        'read': notification.is_read,
+        'message': notification.message,
+        'actor_count': notification.actor_count,
+    }
+
+
+def sync_token(moment):
+    return moment.isoformat()
+
+
+def fetch_changes(user, cursor, after=None, limit=None, started_at=None):
+    """
+    Return one batch of the delta since a cursor.
+
+    Args:
+        user: The recipient
+        cursor: SyncCursor from parse_cursor()
+        after: Key of the last row of the previous batch in this sync, or None
+        limit: Batch size (NOTIFICATION_SYNC_BATCH_SIZE by default)
+        started_at: When this sync started; the final sync_token
+
+    Returns:
+        Dict with notifications, changes, has_more and sync_token, plus
+        unread_count on the final batch and 'after' (the key to pass for the
+        next batch) otherwise
+    """
+    limit = limit or getattr(settings, 'NOTIFICATION_SYNC_BATCH_SIZE', 50)
+    started_at = started_at or timezone.now()
+    notifications = with_targets(
+        Notification.objects.filter(recipient=user).select_related('target_content_type')
+    )
+
+    if cursor.since is not None:
+        overlap = timedelta(seconds=getattr(settings, 'NOTIFICATION_SYNC_OVERLAP_SECONDS', 5))
+        window_start = cursor.since - overlap
+        notifications = notifications.filter(changed_at__gte=window_start).order_by('changed_at', 'id')
+        if after is not None:
+            changed_at, pk = after
+            notifications = notifications.filter(Q(changed_at__gt=changed_at) | Q(changed_at=changed_at, id__gt=pk))
+    else:
+        notifications = notifications.filter(id__gt=after or cursor.last_id).order_by('id')
+
+    rows = list(notifications[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    batch = {
+        'notifications': [
+            notification_payload(row) for row in rows
+            if cursor.since is None or row.created_at >= window_start
+        ],
+        'changes': [
+            change_payload(row) for row in rows
+            if cursor.since is not None and row.created_at < window_start
+        ],
+        'has_more': has_more,
+    }
+    if has_more:
+        last = rows[-1]
+        batch['after'] = (last.changed_at, last.id) if cursor.since is not None else last.id
+        batch['sync_token'] = sync_token(last.changed_at if cursor.since is not None else last.created_at)
+    else:
+        batch['sync_token'] = sync_token(started_at)
+        batch['unread_count'] = get_unread_count(user)
+    return batch
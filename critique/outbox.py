@@ -0,0 +1,205 @@
+"""
+Transactional outbox for WebSocket notifications.
+
+Request code never talks to the channel layer directly. enqueue() writes a
+NotificationOutbox row in the caller's transaction, so a message exists if
+and only if the change that caused it committed, and the request doesn't
+wait on Redis. dispatch_pending() drains the outbox:
+
+    - Rows are taken in ID order and grouped by channel-layer group. Groups
+      are sent concurrently in one event loop pass; within a group, messages
+      go out strictly in order.
+    - A failed send stops its group for this pass: the row is retried with
+      exponential backoff, and later rows for the same group wait behind it.
+      Groups that are backing off are left out of the batch entirely.
+      After NOTIFICATION_OUTBOX_MAX_ATTEMPTS the row is marked failed and the
+      group moves on.
+    - A pass claims its batch's groups in one short transaction, sends with
+      no transaction or row locks held, then deletes sent rows and
+      reschedules failed ones in a second. The claim is a lease
+      (claimed_until), so a slow channel layer doesn't hold database locks,
+      and a crashed dispatcher's groups are taken over once it expires;
+      delivery is at least once.
+
+In production run the dispatcher as its own process:
+
+    python manage.py dispatch_notifications
+
+The in-memory channel layer used in development only reaches consumers in
+the same process, so with NOTIFICATION_DISPATCH_INLINE (the default when
+USE_REDIS is off) the outbox is drained in-process right after each commit.
+"""
+
+import asyncio
+import logging
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def user_group(user_id):
+    """Channel-layer group that a user's NotificationConsumer joins."""
+    return f'user_notifications_{user_id}'
+
+
+def enqueue(group, message, key=''):
+    """
+    Queue a channel-layer group_send. Call inside the transaction that made the change.
+
+    A message with a key replaces a still-unsent message with the same group
+    and key, so a burst of updates to one thing reaches the client once.
+
+    Args:
+        group: Channel-layer group name
+        message: JSON-serializable message dict with a 'type' key
+        key: Optional identity of what the message describes
+
+    Returns:
+        The new NotificationOutbox row, or None if a queued message was replaced
+    """
+    if key and _replace_queued(group, key, message):
+        return None
+    row = NotificationOutbox.objects.create(group=group, message=message, key=key)
+    if getattr(settings, 'NOTIFICATION_DISPATCH_INLINE', False):
+        transaction.on_commit(_dispatch_inline)
+    return row
+
+
+def _replace_queued(group, key, message):
+    """Overwrite the still-unsent keyed message, if any; return whether one was replaced."""
+    with transaction.atomic():
+        # A claimed row may be on its way out already; replacing it would
+        # lose the new message when the row is deleted, so queue a new row
+        queued = NotificationOutbox.objects.filter(group=group, key=key, failed=False).exclude(
+            claimed_until__gt=timezone.now()
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            # Skip rows a dispatcher is claiming rather than wait on it
+            queued = queued.select_for_update(skip_locked=True)
+        pks = list(queued.values_list('pk', flat=True))
+        return bool(pks) and NotificationOutbox.objects.filter(pk__in=pks).update(message=message) > 0
+
+
+def _dispatch_inline():
+    try:
+        dispatch_pending()
+    except Exception:
+        # The rows stay queued; a later commit or the dispatcher command retries
+        logger.exception("Inline outbox dispatch failed")
+
+
+def _retry_delay(attempts):
+    base = getattr(settings, 'NOTIFICATION_OUTBOX_RETRY_SECONDS', 2)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 300))
+
+
+async def _send_group(layer, group, rows):
+    """Send one group's rows in order; stop at the first failure."""
+    sent = []
+    for row in rows:
+        try:
+            await layer.group_send(group, row.message)
+        except Exception as exc:
+            return sent, row, exc
+        sent.append(row.pk)
+    return sent, None, None
+
+
+async def _send_groups(layer, groups):
+    return await asyncio.gather(*(_send_group(layer, group, rows) for group, rows in groups.items()))
+
+
+def dispatch_pending(channel_layer=None, batch_size=None):
+    """
+    Send the next batch of outbox messages.
+
+    Args:
+        channel_layer: Layer to send through (defaults to the configured one)
+        batch_size: Maximum rows to take (NOTIFICATION_OUTBOX_BATCH_SIZE)
+
+    Returns:
+        Number of messages sent
+    """
+    layer = channel_layer or get_channel_layer()
+    if layer is None:
+        return 0
+    batch_size = batch_size or getattr(settings, 'NOTIFICATION_OUTBOX_BATCH_SIZE', 200)
+    max_attempts = getattr(settings, 'NOTIFICATION_OUTBOX_MAX_ATTEMPTS', 8)
+
+    groups, lease = _claim_batch(batch_size)
+    if not groups:
+        return 0
+
+    results = async_to_sync(_send_groups)(layer, groups)
+
+    now = timezone.now()
+    sent_ids = []
+    with transaction.atomic():
+        for sent, failed_row, exc in results:
+            sent_ids.extend(sent)
+            if failed_row is None:
+                continue
+            failed_row.attempts += 1
+            failed_row.last_error = repr(exc)[:1000]
+            failed_row.available_at = now + _retry_delay(failed_row.attempts)
+            failed_row.failed = failed_row.attempts >= max_attempts
+            failed_row.claimed_until = None
+            failed_row.save(update_fields=['attempts', 'last_error', 'available_at', 'failed', 'claimed_until'])
+            log = logger.error if failed_row.failed else logger.warning
+            log("Outbox message %s to %s failed (attempt %s): %s",
+                failed_row.pk, failed_row.group, failed_row.attempts, exc)
+
+        NotificationOutbox.objects.filter(pk__in=sent_ids).delete()
+        # Release the rest of the claimed groups for the next pass
+        NotificationOutbox.objects.filter(group__in=groups, claimed_until=lease).update(claimed_until=None)
+    return len(sent_ids)
+
+
+def _claim_batch(batch_size):
+    """
+    Claim the next batch of rows, grouped by channel-layer group.
+
+    Groups with a row backing off or claimed by another dispatcher are left
+    out. Every pending row of the chosen groups is claimed, not just those in
+    the batch, so no other dispatcher can send a later row of a group first.
+
+    Returns:
+        (groups, lease): dict mapping group to its rows in ID order, and the
+        claimed_until value written to them
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=getattr(settings, 'NOTIFICATION_OUTBOX_LEASE_SECONDS', 60))
+    with transaction.atomic():
+        # A group with a row backing off, or being sent, waits as a whole.
+        # Leave such groups out of the query, so a backlog behind one failing
+        # group can't fill the batch and stall every other group.
+        busy = NotificationOutbox.objects.filter(failed=False).filter(
+            Q(available_at__gt=now) | Q(claimed_until__gt=now)
+        ).values('group')
+        pending = (
+            NotificationOutbox.objects.filter(failed=False, available_at__lte=now)
+            .exclude(claimed_until__gt=now)
+            .exclude(group__in=busy)
+            .order_by('id')
+        )
+        if connection.features.has_select_for_update:
+            # Concurrent dispatchers wait here, briefly, instead of claiming the same rows
+            pending = pending.select_for_update()
+        batch = list(pending[:batch_size])
+        if not batch:
+            return {}, lease
+
+        groups = {}
+        for row in batch:
+            groups.setdefault(row.group, []).append(row)
+        NotificationOutbox.objects.filter(group__in=groups, failed=False).update(claimed_until=lease)
+    return groups, lease
@@ -0,0 +1,38 @@
+"""
+Chunked repair of denormalized counters.
+
+The reconcile_artwork_counters and reconcile_unread_counts management
+commands share this loop: rows are checked in primary-key order, a chunk at
+a time, and each chunk's drifted rows are recounted in the same transaction
+that found them, so a long run never holds locks on the whole table.
+"""
+
+from django.db import transaction
+
+
+def reconcile_in_chunks(queryset, find_drift, recount, key='pk', chunk_size=1000, dry_run=False):
+    """
+    Find, and unless dry_run fix, counter drift in a queryset.
+
+    Args:
+        queryset: Rows whose counters to check
+        find_drift: Callable taking a queryset and returning
+            (key value, stored, actual) tuples for rows that drifted
+        recount: Callable recomputing the counters on a queryset
+        key: Field the first value of each drift tuple refers to
+        chunk_size: Rows per transaction
+        dry_run: Report drift without fixing it
+
+    Returns:
+        (checked, drift): number of rows checked and every drift tuple
+    """
+    ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    drift = []
+    for start in range(0, len(ids), chunk_size):
+        chunk = queryset.filter(pk__in=ids[start:start + chunk_size])
+        with transaction.atomic():
+            chunk_drift = find_drift(chunk)
+            if chunk_drift and not dry_run:
+                recount(chunk.filter(**{f'{key}__in': [value for value, _, _ in chunk_drift]}))
+        drift.extend(chunk_drift)
+    return len(ids), drift
@@ -0,0 +1,210 @@
+"""
+Full-text search over artworks.
+
+Artworks are indexed on title, tags, author username and description, with
+matches in the title ranked highest. The index lives outside the ORM model
+and is created by migration 0026:
+
+    PostgreSQL  A ``search_vector`` tsvector column on critique_artwork with a
+                GIN index, ranked with ts_rank.
+    SQLite      An FTS5 table (critique_artwork_fts) keyed by artwork ID,
+                ranked with bm25.
+
+Every search term is matched as a prefix ("lands" finds "landscape") and all
+terms must match. The signal handlers in critique.signals reindex an artwork
+when it (or its author's username) changes; the rebuild_search_index command
+reindexes everything after bulk updates. On other databases, or if the index
+is missing, search falls back to icontains filtering.
+"""
+
+import logging
+import re
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import ArtWork
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'critique_artwork_fts'
+SEARCH_CONFIG = 'english'
+MAX_TERMS = 10
+
+# Relative weight of each indexed field (title, tags, author, description)
+_FTS_WEIGHTS = '10.0, 4.0, 4.0, 1.0'
+
+_backend = None
+
+
+def search_backend():
+    """
+    Return the active search backend: 'postgresql', 'sqlite' or None.
+
+    The result is cached for the life of the process.
+    """
+    global _backend
+    if _backend is None:
+        _backend = ''
+        if connection.vendor == 'postgresql':
+            _backend = 'postgresql'
+        elif connection.vendor == 'sqlite':
+            if FTS_TABLE in connection.introspection.table_names():
+                _backend = 'sqlite'
+            else:
+                logger.warning("Artwork search index table %s is missing; using icontains", FTS_TABLE)
+    return _backend or None
+
+
+def _terms(query):
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+# ----------------------------------------------------------------------
+# Indexing
+# ----------------------------------------------------------------------
+
+def _postgres_document(alias):
+    user_table = User._meta.db_table
+    return (
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({alias}.title, '')), 'A') || "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({alias}.tags, '')), 'B') || "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce("
+        f"(SELECT username FROM {user_table} WHERE id = {alias}.author_id), '')), 'B') || "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({alias}.description, '')), 'C')"
+    )
+
+
+def _sqlite_insert_sql(where):
+    artwork_table = ArtWork._meta.db_table
+    user_table = User._meta.db_table
+    return (
+        f"INSERT INTO {FTS_TABLE} (rowid, title, tags, author, description) "
+        f"SELECT a.id, a.title, a.tags, coalesce(u.username, ''), a.description "
+        f"FROM {artwork_table} a LEFT JOIN {user_table} u ON u.id = a.author_id {where}"
+    )
+
+
+def index_artworks(artwork_ids):
+    """
+    (Re)index the given artworks.
+
+    Args:
+        artwork_ids: Iterable of artwork IDs
+    """
+    artwork_ids = list(artwork_ids)
+    backend = search_backend()
+    if not artwork_ids or not backend:
+        return
+
+    placeholders = ', '.join(['%s'] * len(artwork_ids))
+    with connection.cursor() as cursor:
+        if backend == 'postgresql':
+            cursor.execute(
+                f"UPDATE {ArtWork._meta.db_table} AS a SET search_vector = {_postgres_document('a')} "
+                f"WHERE a.id IN ({placeholders})",
+                artwork_ids,
+            )
+        else:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", artwork_ids)
+            cursor.execute(_sqlite_insert_sql(f"WHERE a.id IN ({placeholders})"), artwork_ids)
+
+
+def unindex_artwork(artwork_id):
+    """Remove a deleted artwork from the index (PostgreSQL needs nothing)."""
+    if search_backend() == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [artwork_id])
+
+
+def rebuild_index():
+    """
+    Reindex every artwork.
+
+    Returns:
+        Number of artworks indexed
+    """
+    backend = search_backend()
+    if not backend:
+        return 0
+
+    with connection.cursor() as cursor:
+        if backend == 'postgresql':
+            cursor.execute(
+                f"UPDATE {ArtWork._meta.db_table} AS a SET search_vector = {_postgres_document('a')}"
+            )
+        else:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(_sqlite_insert_sql(''))
+    return ArtWork.objects.count()
+
+
+# ----------------------------------------------------------------------
+# Querying
+# ----------------------------------------------------------------------
+
+def search_artworks(queryset, query):
+    """
+    Filter an ArtWork queryset to full-text matches of ``query``.
+
+    Matching artworks are annotated with ``search_rank`` (higher is better)
+    but the queryset's ordering is left alone; order by ``-search_rank`` to
+    get relevance order.
+
+    Args:
+        queryset: ArtWork queryset to filter
+        query: Search text as typed by the user
+
+    Returns:
+        Filtered queryset
+    """
+    terms = _terms(query)
+    if not terms:
+        return queryset
+
+    backend = search_backend()
+    table = ArtWork._meta.db_table
+
+    if backend == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        # search_vector isn't a model field, so the match is raw SQL, but as a
+        # boolean expression rather than .extra() it composes with other filters
+        return queryset.filter(
+            RawSQL(
+                f"{table}.search_vector @@ to_tsquery('{SEARCH_CONFIG}', %s)",
+                (tsquery,),
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f"ts_rank({table}.search_vector, to_tsquery('{SEARCH_CONFIG}', %s))",
+                (tsquery,),
+                output_field=FloatField(),
+            )
+        )
+
+    if backend == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,))
+        ).annotate(
+            # bm25 is lower-is-better; negate it so both backends rank descending
+            search_rank=RawSQL(
+                f"(SELECT -bm25({FTS_TABLE}, {_FTS_WEIGHTS}) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id)",
+                (match,),
+                output_field=FloatField(),
+            )
+        )
+
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(title__icontains=term) |
+            Q(description__icontains=term) |
+            Q(tags__icontains=term) |
+            Q(author__username__icontains=term)
+        )
+    return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
@@ -4,17 +4,106 @@ Handles business logic for achievements, notifications, and other features.
 """
 
 from django.contrib.auth.models import User
-from django.db.models import Count, Q
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from .models import (
     AchievementBadge, UserAchievement, ArtWork, Critique, 
-    Reaction, KarmaEvent, Notification
+    Folder, Reaction, KarmaEvent, Notification
 )
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _count_for_user(queryset, user_field):
+    """Correlated subquery counting a queryset's rows for the outer user."""
+    rows = (
+        queryset.filter(**{user_field: OuterRef('pk')})
+        .order_by()
+        .values(user_field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+class UserStats:
+    """
+    Snapshot of every metric the achievement badges are judged on.
+    
+    for_user() gathers them all in one query (one correlated subquery per
+    metric), so checking or showing progress on any number of badges costs
+    the same. Attribute names match AchievementBadge.criteria_type values.
+    """
+    
+    METRICS = [
+        'artwork_count', 'published_artwork_count', 'seeking_critique_count',
+        'critique_count', 'helpful_reactions', 'critique_reactions',
+        'artwork_likes', 'version_count', 'folder_count', 'karma_points',
+        'days_active',
+    ]
+    
+    def __init__(self, **metrics):
+        for name in self.METRICS:
+            setattr(self, name, metrics.get(name, 0))
+    
+    @classmethod
+    def for_user(cls, user):
+        """Load the snapshot for a user with a single query."""
+        artworks = ArtWork.objects.all()
+        reactions = Reaction.objects.all()
+        metrics = {
+            'karma_points': F('profile__karma'),
+            'artwork_count': _count_for_user(artworks.filter(is_published=True), 'author'),
+            'published_artwork_count': _count_for_user(
+                artworks.filter(is_published=True, visibility=ArtWork.VISIBILITY_PUBLIC), 'author'
+            ),
+            'seeking_critique_count': _count_for_user(
+                artworks.filter(seeking_critique=True, is_published=True), 'author'
+            ),
+            'critique_count': _count_for_user(Critique.objects.filter(is_hidden=False), 'author'),
+            'helpful_reactions': _count_for_user(
+                reactions.filter(reaction_type=Reaction.ReactionType.HELPFUL), 'critique__author'
+            ),
+            'critique_reactions': _count_for_user(reactions, 'critique__author'),
+            'artwork_likes': _count_for_user(ArtWork.likes.through.objects.all(), 'artwork__author'),
+            'folder_count': _count_for_user(Folder.objects.filter(is_public=Folder.VISIBILITY_PUBLIC), 'owner'),
+            # Versions of the user's most revised artwork
+            'version_count': Coalesce(
+                Subquery(
+                    artworks.filter(author=OuterRef('pk'))
+                    .annotate(versions_total=Count('versions'))
+                    .order_by('-versions_total')
+                    .values('versions_total')[:1],
+                    output_field=IntegerField(),
+                ),
+                0,
+            ),
+        }
+        # Prefixed so the names can't clash with User's reverse relations
+        row = User.objects.filter(pk=user.pk).values(
+            'date_joined', **{f'stat_{name}': expression for name, expression in metrics.items()}
+        ).get()
+        
+        values = {name: row[f'stat_{name}'] or 0 for name in metrics}
+        date_joined = row['date_joined']
+        values['days_active'] = (timezone.now().date() - date_joined.date()).days if date_joined else 0
+        return cls(**values)
+    
+    def value(self, criteria_type):
+        """Current value of a badge criterion (0 for unknown criteria)."""
+        if criteria_type not in self.METRICS:
+            return 0
+        return getattr(self, criteria_type)
+    
+    def meets(self, badge):
+        """Whether the user has reached a badge's threshold."""
+        if badge.criteria_type not in self.METRICS:
+            return False
+        return self.value(badge.criteria_type) >= badge.criteria_value
+
+
 class AchievementService:
     """
     Service class to handle achievement badge logic.
@@ -31,17 +120,21 @@ class AchievementService:
         
         # Get all active badges that user hasn't earned yet
         earned_badge_ids = user.achievements.values_list('badge_id', flat=True)
-        available_badges = AchievementBadge.objects.filter(
+        available_badges = list(AchievementBadge.objects.filter(
             is_active=True
-        ).exclude(id__in=earned_badge_ids)
+        ).exclude(id__in=earned_badge_ids))
+        if not available_badges:
+            return newly_awarded
         
+        # Every badge is judged against one snapshot of the user's stats
+        stats = UserStats.for_user(user)
         for badge in available_badges:
-            if AchievementService._check_badge_criteria(user, badge):
+            if AchievementService._check_badge_criteria(stats, badge):
                 # Award the badge
                 achievement = UserAchievement.objects.create(
                     user=user,
                     badge=badge,
-                    context_data=AchievementService._get_badge_context(user, badge)
+                    context_data=AchievementService._get_badge_context(stats, badge)
                 )
                 newly_awarded.append(achievement)
                 
@@ -53,76 +146,14 @@ class AchievementService:
         return newly_awarded
     
     @staticmethod
-    def _check_badge_criteria(user, badge):
+    def _check_badge_criteria(stats, badge):
         """
-        Check if a user meets the criteria for a specific badge.
+        Check if a user's UserStats meet the criteria for a specific badge.
         """
-        criteria_type = badge.criteria_type
-        criteria_value = badge.criteria_value
-        
-        try:
-            if criteria_type == 'artwork_count':
-                count = user.artworks.filter(is_published=True).count()
-                return count >= criteria_value
-                
-            elif criteria_type == 'published_artwork_count':
-                count = user.artworks.filter(is_published=True, visibility='public').count()
-                return count >= criteria_value
-                
-            elif criteria_type == 'critique_count':
-                count = user.critiques.filter(is_hidden=False).count()
-                return count >= criteria_value
-                
-            elif criteria_type == 'helpful_reactions':
-                count = user.critiques.aggregate(
-                    helpful_count=Count('reactions', filter=Q(reactions__reaction_type='HELPFUL'))
-                )['helpful_count'] or 0
-                return count >= criteria_value
-                
-            elif criteria_type == 'karma_points':
-                return user.profile.karma >= criteria_value
-                
-            elif criteria_type == 'artwork_likes':
-                count = user.artworks.aggregate(
-                    total_likes=Count('likes')
-                )['total_likes'] or 0
-                return count >= criteria_value
-                
-            elif criteria_type == 'critique_reactions':
-                count = user.critiques.aggregate(
-                    total_reactions=Count('reactions')
-                )['total_reactions'] or 0
-                return count >= criteria_value
-                
-            elif criteria_type == 'days_active':
-                if user.date_joined:
-                    days_active = (timezone.now().date() - user.date_joined.date()).days
-                    return days_active >= criteria_value
-                return False
-                
-            elif criteria_type == 'version_count':
-                # Check if user has artworks with multiple versions
-                artwork_with_versions = user.artworks.annotate(
-                    version_count=Count('versions')
-                ).filter(version_count__gte=criteria_value)
-                return artwork_with_versions.exists()
-                
-            elif criteria_type == 'folder_count':
-                count = user.folders.filter(visibility='public').count()
-                return count >= criteria_value
-                
-            elif criteria_type == 'seeking_critique_count':
-                count = user.artworks.filter(seeking_critique=True, is_published=True).count()
-                return count >= criteria_value
-                
-        except Exception as e:
-            logger.error(f"Error checking badge criteria for {badge.name}: {str(e)}")
-            return False
-        
-        return False
+        return stats.meets(badge)
     
     @staticmethod
-    def _get_badge_context(user, badge):
+    def _get_badge_context(stats, badge):
         """
         Get context data about when/why the badge was earned.
         """
@@ -134,16 +165,10 @@ class AchievementService:
             'earned_at': timezone.now().isoformat()
         }
         
-        try:
-            if criteria_type == 'artwork_count':
-                context['current_count'] = user.artworks.filter(is_published=True).count()
-            elif criteria_type == 'critique_count':
-                context['current_count'] = user.critiques.filter(is_hidden=False).count()
-            elif criteria_type == 'karma_points':
-                context['current_karma'] = user.profile.karma
-            # Add more context as needed
-        except Exception as e:
-            logger.error(f"Error getting badge context for {badge.name}: {str(e)}")
+        if criteria_type == 'karma_points':
+            context['current_karma'] = stats.karma_points
+        elif criteria_type in UserStats.METRICS:
+            context['current_count'] = stats.value(criteria_type)
         
         return context
     
@@ -180,15 +205,16 @@ class AchievementService:
         
         # Get available badges user hasn't earned
         earned_badge_ids = earned_badges.values_list('badge_id', flat=True)
-        available_badges = AchievementBadge.objects.filter(
+        available_badges = list(AchievementBadge.objects.filter(
             is_active=True,
             is_hidden=False
-        ).exclude(id__in=earned_badge_ids).order_by('category', 'tier', 'sort_order')
+        ).exclude(id__in=earned_badge_ids).order_by('category', 'tier', 'sort_order'))
         
-        # Calculate progress for available badges
+        # Calculate progress for available badges from one stats snapshot
         badge_progress = []
+        stats = UserStats.for_user(user) if available_badges else None
         for badge in available_badges:
-            current_value = AchievementService._get_current_value(user, badge)
+            current_value = AchievementService._get_current_value(stats, badge)
             progress_percentage = min(100, (current_value / badge.criteria_value) * 100) if badge.criteria_value > 0 else 0
             
             badge_progress.append({
@@ -205,45 +231,11 @@ class AchievementService:
         }
     
     @staticmethod
-    def _get_current_value(user, badge):
+    def _get_current_value(stats, badge):
         """
         Get the current value for a user's progress towards a badge.
         """
-        criteria_type = badge.criteria_type
-        
-        try:
-            if criteria_type == 'artwork_count':
-                return user.artworks.filter(is_published=True).count()
-            elif criteria_type == 'published_artwork_count':
-                return user.artworks.filter(is_published=True, visibility='public').count()
-            elif criteria_type == 'critique_count':
-                return user.critiques.filter(is_hidden=False).count()
-            elif criteria_type == 'helpful_reactions':
-                return user.critiques.aggregate(
-                    helpful_count=Count('reactions', filter=Q(reactions__reaction_type='HELPFUL'))
-                )['helpful_count'] or 0
-            elif criteria_type == 'karma_points':
-                return user.profile.karma
-            elif criteria_type == 'artwork_likes':
-                return user.artworks.aggregate(
-                    total_likes=Count('likes')
-                )['total_likes'] or 0
-            elif criteria_type == 'critique_reactions':
-                return user.critiques.aggregate(
-                    total_reactions=Count('reactions')
-                )['total_reactions'] or 0
-            elif criteria_type == 'days_active':
-                if user.date_joined:
-                    return (timezone.now().date() - user.date_joined.date()).days
-                return 0
-            elif criteria_type == 'folder_count':
-                return user.folders.filter(visibility='public').count()
-            elif criteria_type == 'seeking_critique_count':
-                return user.artworks.filter(seeking_critique=True, is_published=True).count()
-        except Exception as e:
-            logger.error(f"Error getting current value for {badge.name}: {str(e)}")
-        
-        return 0
+        return stats.value(badge.criteria_type)
     
     @staticmethod
     def trigger_badge_check(user, trigger_type=None):
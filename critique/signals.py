@@ -3,10 +3,20 @@ Signal handlers for the critique app.
 This module contains Django signal handlers to track user actions and award karma points.
 """
 
-from django.db.models.signals import post_save, m2m_changed
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 
-from .models import ArtWork, Comment, Critique, KarmaEvent
+from .models import ArtWork, Comment, Critique, KarmaEvent, Notification, Profile, QuickCrit, PairSession, Reaction, Tag
+from .artwork_tags import sync_artwork_tags
+from .counters import adjust_counters, recount_counters
+from .feed_chips import bump_chips_version
+from .feed_pool import candidate_pool, is_feed_eligible
+from .feed_queue import restore_artwork, revoke_artwork
+from .feed_seen import mark_seen
+from .karma_leaderboard import karma_leaderboard
+from .search import index_artworks, unindex_artwork
+from .unread_counts import adjust_unread
 from .karma import (
     award_artwork_upload_karma, 
     award_comment_karma, 
@@ -50,3 +60,147 @@ def award_karma_for_critique(sender, instance, created, **kwargs):
         award_critique_karma(instance)
 
 
+@receiver(post_save, sender=ArtWork)
+def sync_feed_pool_on_artwork_save(sender, instance, created, **kwargs):
+    """Add or remove the artwork from the feed pool and queues when it is (un)published."""
+    candidate_pool.sync_artwork(instance)
+    if not is_feed_eligible(instance):
+        revoke_artwork(instance.id)
+    elif not created:
+        restore_artwork(instance.id)
+
+
+@receiver(post_delete, sender=ArtWork)
+def remove_artwork_from_feed_pool(sender, instance, **kwargs):
+    """Drop deleted artworks from the feed pool and queues."""
+    candidate_pool.discard(instance.id)
+    revoke_artwork(instance.id)
+
+
+@receiver(post_save, sender=QuickCrit)
+def lower_feed_need_on_quick_crit(sender, instance, created, **kwargs):
+    """Lower an artwork's critique need when it receives a quick critique."""
+    if created:
+        candidate_pool.adjust_need(instance.artwork_id, 1)
+
+
+@receiver(post_delete, sender=QuickCrit)
+def raise_feed_need_on_quick_crit_delete(sender, instance, **kwargs):
+    """Raise an artwork's critique need when a quick critique is removed."""
+    candidate_pool.adjust_need(instance.artwork_id, -1)
+
+
+@receiver(post_save, sender=PairSession)
+def remember_seen_pair(sender, instance, created, **kwargs):
+    """Append a newly shown pair to the user's cached seen set."""
+    if created:
+        mark_seen(instance.user_id, instance.spotlight_id, instance.counter_id)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_feed_chips_version(sender, **kwargs):
+    """Invalidate the cached feed chip payload when tags change."""
+    bump_chips_version()
+
+
+@receiver(m2m_changed, sender=ArtWork.likes.through)
+def update_like_counters(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep ArtWork.likes_count and popularity_score in step with likes."""
+    if action == 'pre_clear' and reverse:
+        # user.liked_artworks.clear() doesn't say which artworks lost a like
+        instance._cleared_like_artwork_ids = list(instance.liked_artworks.values_list('pk', flat=True))
+    elif action == 'post_add' and pk_set:
+        # pk_set only holds the likes that were actually added
+        if reverse:
+            adjust_counters(ArtWork.objects.filter(pk__in=pk_set), likes=1)
+        else:
+            adjust_counters(instance.pk, likes=len(pk_set))
+    elif action in ('post_remove', 'post_clear'):
+        # pk_set for removals may include likes that never existed, so recount
+        if not reverse:
+            recount_counters([instance.pk])
+        elif action == 'post_remove':
+            recount_counters(pk_set or [])
+        else:
+            recount_counters(getattr(instance, '_cleared_like_artwork_ids', []))
+
+
+@receiver(post_save, sender=Critique)
+def increment_critique_counters(sender, instance, created, **kwargs):
+    """Count a new critique on its artwork."""
+    if created:
+        adjust_counters(instance.artwork_id, critiques=1)
+
+
+@receiver(post_delete, sender=Critique)
+def decrement_critique_counters(sender, instance, **kwargs):
+    """Uncount a deleted critique (its reactions are uncounted as they cascade)."""
+    adjust_counters(instance.artwork_id, critiques=-1)
+
+
+@receiver(post_save, sender=Reaction)
+def increment_reaction_counters(sender, instance, created, **kwargs):
+    """Count a new reaction on the critiqued artwork."""
+    if created:
+        adjust_counters(ArtWork.objects.filter(critiques=instance.critique_id), reactions=1)
+
+
+@receiver(post_delete, sender=Reaction)
+def decrement_reaction_counters(sender, instance, **kwargs):
+    """Uncount a deleted reaction."""
+    adjust_counters(ArtWork.objects.filter(critiques=instance.critique_id), reactions=-1)
+
+
+@receiver(post_save, sender=ArtWork)
+def sync_normalized_artwork_tags(sender, instance, update_fields=None, **kwargs):
+    """Parse the artwork's tags text into normalized_tags when it may have changed."""
+    if update_fields is None or 'tags' in update_fields:
+        sync_artwork_tags(instance)
+
+
+@receiver(post_save, sender=ArtWork)
+def index_artwork_for_search(sender, instance, **kwargs):
+    """Keep the full-text search index in step with artwork edits."""
+    index_artworks([instance.pk])
+
+
+@receiver(post_delete, sender=ArtWork)
+def unindex_deleted_artwork(sender, instance, **kwargs):
+    """Drop deleted artworks from the full-text search index."""
+    unindex_artwork(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def reindex_artworks_on_username_change(sender, instance, created, update_fields=None, **kwargs):
+    """Reindex a user's artworks, since the author's username is searchable."""
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    index_artworks(ArtWork.objects.filter(author=instance).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Notification)
+def increment_unread_count(sender, instance, created, **kwargs):
+    """Count new unread notifications on the recipient's profile."""
+    if created and not instance.is_read:
+        adjust_unread(instance.recipient_id, 1)
+
+
+@receiver(post_delete, sender=Notification)
+def decrement_unread_count(sender, instance, **kwargs):
+    """Uncount unread notifications that are deleted."""
+    if not instance.is_read:
+        adjust_unread(instance.recipient_id, -1)
+
+
+@receiver(post_save, sender=Profile)
+def add_profile_to_leaderboard(sender, instance, created, **kwargs):
+    """Put new users on the karma leaderboard."""
+    if created:
+        karma_leaderboard.set_karma(instance.user_id, instance.karma)
+
+
+@receiver(post_delete, sender=Profile)
+def remove_profile_from_leaderboard(sender, instance, **kwargs):
+    """Drop deleted users from the karma leaderboard."""
+    karma_leaderboard.discard(instance.user_id)
@@ -132,6 +132,10 @@ class NotificationManager {
                     this.handleNewNotification(data.notification);
                     break;
                     
+                case 'notification_updated':
+                    this.handleUpdatedNotification(data.notification);
+                    break;
+                    
                 case 'unread_count':
                     this.updateUnreadCount(data.count);
                     break;
@@ -322,6 +326,11 @@ class NotificationManager {
     }
     
     handleNewNotification(notification) {
+        if (this.notifications.some(existing => existing.id == notification.id)) {
+            this.handleUpdatedNotification(notification);
+            return;
+        }
+        
         this.notifications.unshift(notification);
         this.updateNotificationsList(this.notifications);
         this.updateUnreadCount(this.unreadCount + 1);
@@ -335,6 +344,24 @@ class NotificationManager {
         this.playNotificationSound();
     }
     
+    handleUpdatedNotification(notification) {
+        // A coalesced notification ("alice and 2 others liked...") is re-sent
+        // under the same ID; its first push may never have arrived
+        const index = this.notifications.findIndex(existing => existing.id == notification.id);
+        if (index === -1) {
+            this.handleNewNotification(notification);
+            return;
+        }
+        
+        const [existing] = this.notifications.splice(index, 1);
+        this.notifications.unshift({ ...existing, ...notification });
+        this.updateNotificationsList(this.notifications);
+        
+        if (this.options.enableToastNotifications) {
+            this.showToastNotification(notification);
+        }
+    }
+    
     updateNotificationsList(notifications) {
         this.notifications = notifications;
         
@@ -1,6 +1,43 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.db import connection, transaction
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
-from .models import ArtWork
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import AchievementBadge, ArchivedNotification, ArtWork, ArtWorkVersion, Critique, Folder, KarmaEvent, KarmaRollup, KarmaTotal, Notification, NotificationOutbox, Profile, QuickCrit, QuickCritTag, PairSession, Reaction, Tag
+from .api.serializers import CritiqueListSerializer, CritiqueSerializer, QuickCritSerializer
+from .artwork_tags import MATCH_ANY, filter_by_tags, tag_facets
+from .feed_chips import get_chips, get_chips_version
+from .feed_pool import CandidatePool, PoolEntry, candidate_pool
+from .feed_sampling import WeightedSampler
+from .feed_seen import get_seen_ids, clear_seen
+from .notification import create_like_notification, create_reaction_notification
+from .context_processors import karma_notifications
+from .karma import (
+    DAILY_VISIT_KEY, apply_karma_deltas, award_daily_visit_karma, award_karma, award_like_karma, flush_karma_buffer
+)
+from .karma_leaderboard import karma_leaderboard
+from .karma_recompute import expected_karma, user_id_ranges
+from .notification_sync import fetch_changes, parse_cursor, sync_token
+from .outbox import dispatch_pending, enqueue, user_group
+from .unread_counts import mark_read
+from .write_buffer import WriteBuffer
+from .search import search_artworks
+from .services import AchievementService, UserStats
+from .feed_queue import (
+    clear_queue, flush_pair_sessions, get_queue_metrics, next_pair, refill_queue, reset_queue_metrics, restore_artwork
+)
 
 # Create your tests here.
 class ArtWorkModelTest(TestCase):
@@ -15,3 +52,1226 @@ class ArtWorkModelTest(TestCase):
         self.assertEqual(self.artwork.__str__(), self.artwork.title)
 
 
+class CandidatePoolTest(TestCase):
+    def setUp(self):
+        self.artist = User.objects.create_user(username="artist", password="pw")
+        self.critic = User.objects.create_user(username="critic", password="pw")
+        self.older = ArtWork.objects.create(title="Older", author=self.artist, medium="Oil")
+        self.newer = ArtWork.objects.create(title="Newer", author=self.artist, medium="Ink")
+        candidate_pool.rebuild()
+
+    def tearDown(self):
+        candidate_pool.invalidate()
+
+    def test_ranks_by_need_then_freshness(self):
+        ranked = [entry.artwork_id for entry in candidate_pool.top(10)]
+        self.assertEqual(ranked, [self.newer.id, self.older.id])
+
+        QuickCrit.objects.create(artwork=self.newer, author=self.critic)
+        ranked = [entry.artwork_id for entry in candidate_pool.top(10)]
+        self.assertEqual(ranked, [self.older.id, self.newer.id])
+
+    def test_publish_and_unpublish_update_pool(self):
+        self.older.is_published = False
+        self.older.save()
+        self.assertIsNone(candidate_pool.get(self.older.id))
+
+        self.older.is_published = True
+        self.older.save()
+        self.assertIsNotNone(candidate_pool.get(self.older.id))
+
+    def test_top_reads_do_not_query(self):
+        with self.assertNumQueries(0):
+            candidate_pool.top(10, exclude_ids={self.older.id}, exclude_author_id=self.critic.id)
+
+
+class WeightedSamplerTest(TestCase):
+    def test_counterpoint_contrasts_and_need_is_favoured(self):
+        pool = CandidatePool()
+        pool.load([
+            PoolEntry(1, 10, "Oil", 1000.0, 0),
+            PoolEntry(2, 10, "Ink", 1000.0, 0),
+            PoolEntry(3, 20, "Oil", 1000.0, 0),
+            PoolEntry(4, 20, "Ink", 1000.0, 50),
+        ])
+        sampler = WeightedSampler(now=1000.0)
+
+        spotlights = []
+        for _ in range(200):
+            spotlight, counter = sampler.sample(pool, set())
+            spotlights.append(spotlight.artwork_id)
+            self.assertNotEqual(spotlight.author_id, counter.author_id)
+            self.assertNotEqual(spotlight.medium, counter.medium)
+        self.assertLess(spotlights.count(4), 20)
+
+
+class SeenSetTest(TestCase):
+    def setUp(self):
+        self.viewer = User.objects.create_user(username="viewer", password="pw")
+        artist = User.objects.create_user(username="painter", password="pw")
+        self.first = ArtWork.objects.create(title="First", author=artist)
+        self.second = ArtWork.objects.create(title="Second", author=artist)
+        self.third = ArtWork.objects.create(title="Third", author=artist)
+        clear_seen(self.viewer.id)
+
+    def test_seen_set_is_appended_and_read_without_queries(self):
+        self.assertEqual(get_seen_ids(self.viewer), set())
+
+        PairSession.objects.create(user=self.viewer, spotlight=self.first, counter=self.second)
+        with self.assertNumQueries(0):
+            seen = get_seen_ids(self.viewer)
+        self.assertEqual(seen, {self.first.id, self.second.id})
+
+    def test_window_keeps_most_recent_ids(self):
+        get_seen_ids(self.viewer)
+        with self.settings(FEED_SEEN_WINDOW=2):
+            PairSession.objects.create(user=self.viewer, spotlight=self.first, counter=self.second)
+            PairSession.objects.create(user=self.viewer, spotlight=self.third, counter=self.first)
+            self.assertEqual(get_seen_ids(self.viewer), {self.third.id, self.first.id})
+
+
+@override_settings(
+    FEED_QUEUE_BACKGROUND=False, FEED_QUEUE_SIZE=2, FEED_QUEUE_LOW_WATER=0, FEED_WRITE_FLUSH_SECONDS=0
+)
+class PairQueueTest(TestCase):
+    def setUp(self):
+        self.viewer = User.objects.create_user(username="swiper", password="pw")
+        painter = User.objects.create_user(username="oils", password="pw")
+        sketcher = User.objects.create_user(username="inks", password="pw")
+        for index in range(2):
+            ArtWork.objects.create(title=f"Oil {index}", author=painter, medium="Oil")
+            ArtWork.objects.create(title=f"Ink {index}", author=sketcher, medium="Ink")
+        candidate_pool.rebuild()
+        clear_seen(self.viewer.id)
+        clear_queue(self.viewer.id)
+        reset_queue_metrics()
+
+    def tearDown(self):
+        flush_pair_sessions()
+        candidate_pool.invalidate()
+
+    def test_queued_pairs_are_served_without_picking(self):
+        refill_queue(self.viewer)
+
+        with self.assertNumQueries(0):
+            first = next_pair(self.viewer)
+        second = next_pair(self.viewer)
+
+        served = {first["spotlight_id"], first["counter_id"], second["spotlight_id"], second["counter_id"]}
+        self.assertEqual(len(served), 4)
+
+        # PairSession rows are buffered and written together
+        self.assertEqual(PairSession.objects.filter(user=self.viewer).count(), 0)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(flush_pair_sessions(), 2)
+        inserts = [query for query in queries.captured_queries if query["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(PairSession.objects.filter(user=self.viewer).count(), 2)
+
+        metrics = get_queue_metrics()
+        self.assertEqual(metrics["hits"], 2)
+        self.assertEqual(metrics["refills"], 1)
+        self.assertEqual(metrics["hit_rate"], 1.0)
+
+    def test_revoked_artworks_are_not_served_from_the_queue(self):
+        refill_queue(self.viewer)
+        queued = cache.get(f"feed:queue:{self.viewer.id}")
+        hidden = ArtWork.objects.get(pk=queued[0]["spotlight_id"])
+        hidden.is_published = False
+        hidden.save()
+        deleted_id = queued[1]["counter_id"]
+        ArtWork.objects.filter(pk=deleted_id).delete()
+
+        # Both queued pairs are dropped and a pair is picked afresh
+        pair = next_pair(self.viewer)
+        self.assertEqual(get_queue_metrics()["hits"], 0)
+        self.assertFalse({hidden.id, deleted_id} & {pair["spotlight_id"], pair["counter_id"]})
+
+    def test_bulk_drafted_artworks_are_not_served_from_the_queue(self):
+        refill_queue(self.viewer)
+        queued = cache.get(f"feed:queue:{self.viewer.id}")
+        drafted = ArtWork.objects.get(pk=queued[0]["spotlight_id"])
+        self.addCleanup(restore_artwork, drafted.id)
+
+        self.client.login(username=drafted.author.username, password="pw")
+        response = self.client.post(
+            "/api/artworks/bulk_actions/", {"artwork_ids": [drafted.id], "action": "draft"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+        pair = next_pair(self.viewer)
+        self.assertNotIn(drafted.id, (pair["spotlight_id"], pair["counter_id"]))
+
+    def test_a_queued_pair_is_served_once(self):
+        refill_queue(self.viewer)
+        stale_read = cache.get(f"feed:queue:{self.viewer.id}")
+        first = next_pair(self.viewer)
+        # A concurrent request that read the queue before the pop
+        cache.set(f"feed:queue:{self.viewer.id}", stale_read)
+        second = next_pair(self.viewer)
+        self.assertNotEqual(
+            (first["spotlight_id"], first["counter_id"]), (second["spotlight_id"], second["counter_id"])
+        )
+
+
+class WriteBufferTest(TestCase):
+    def test_a_bad_row_only_drops_itself(self):
+        user = User.objects.create_user(username="buffered", password="pw")
+        buffer = WriteBuffer(KarmaEvent, settings_prefix='TEST_BUFFER')
+        buffer.add(KarmaEvent(user=user, action='daily_visit', points=1))
+        buffer.add(KarmaEvent(user_id=None, action='daily_visit', points=1))
+        buffer.add(KarmaEvent(user=user, action='daily_visit', points=1))
+
+        with self.assertLogs('critique.write_buffer', level='ERROR'):
+            self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(KarmaEvent.objects.filter(user=user).count(), 2)
+        self.assertEqual(len(buffer), 0)
+
+
+class FeedChipsTest(TestCase):
+    def setUp(self):
+        Tag.objects.create(label="strong focal point", polarity=Tag.PRO)
+        Tag.objects.create(label="muddy values", polarity=Tag.CON)
+
+    def test_chips_are_cached_until_tags_change(self):
+        version = get_chips_version()
+        chips = get_chips()
+        self.assertEqual([chip["label"] for chip in chips["pro"]], ["strong focal point"])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_chips(), chips)
+
+        Tag.objects.create(label="tangent issues", polarity=Tag.CON)
+        self.assertNotEqual(get_chips_version(), version)
+        self.assertEqual(len(get_chips()["con"]), 2)
+
+    def test_feed_omits_chips_for_current_version(self):
+        for username in ("left", "right"):
+            author = User.objects.create_user(username=username, password="pw")
+            ArtWork.objects.create(title=username, author=author)
+        candidate_pool.invalidate()
+        self.addCleanup(candidate_pool.invalidate)
+
+        response = self.client.get("/api/feed/next/")
+        version = response.data["chips_version"]
+        self.assertEqual(len(response.data["chips"]["con"]), 1)
+
+        response = self.client.get("/api/feed/next/", {"chips_version": version})
+        self.assertIsNotNone(response.data["spotlight"])
+        self.assertIsNone(response.data["chips"])
+        self.assertEqual(response.data["chips_version"], version)
+
+
+class QuickCritBatchTest(TestCase):
+    def setUp(self):
+        self.critic = User.objects.create_user(username="batcher", password="pw")
+        artist = User.objects.create_user(username="sitter", password="pw")
+        self.artworks = [ArtWork.objects.create(title=f"Piece {i}", author=artist) for i in range(4)]
+        self.existing = Tag.objects.create(label="Clean Linework", polarity=Tag.PRO)
+
+    def test_batch_create_uses_constant_queries(self):
+        payload = [
+            {
+                "artwork": self.artworks[i % 4].id,
+                "tag_ids": [self.existing.id],
+                "new_tags": ["+clean linework", "-muddy values", f"-issue {i % 3}"],
+            }
+            for i in range(20)
+        ]
+        serializer = QuickCritSerializer(
+            data=payload, many=True, context={"request": SimpleNamespace(user=self.critic)}
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            crits = serializer.save()
+        self.assertLessEqual(len(queries), 8)
+
+        self.assertEqual(len(crits), 20)
+        self.assertTrue(all(qc.pk for qc in crits))
+        # "+clean linework" matches the existing tag case-insensitively
+        self.assertEqual(Tag.objects.count(), 5)
+        self.assertEqual(QuickCritTag.objects.filter(quickcrit__in=crits).count(), 60)
+
+
+class EngagementCounterTest(TestCase):
+    def setUp(self):
+        self.artist = User.objects.create_user(username="counted", password="pw")
+        self.fan = User.objects.create_user(username="fan", password="pw")
+        self.artwork = ArtWork.objects.create(title="Counted", author=self.artist)
+
+    def counters(self):
+        self.artwork.refresh_from_db()
+        return (
+            self.artwork.likes_count,
+            self.artwork.critiques_count,
+            self.artwork.reactions_count,
+            self.artwork.popularity_score,
+        )
+
+    def test_signals_keep_counters_current(self):
+        self.artwork.likes.add(self.fan)
+        self.fan.liked_artworks.add(self.artwork)  # already liked; no change
+        critique = Critique.objects.create(artwork=self.artwork, author=self.fan, text="Nice values")
+        Reaction.objects.create(critique=critique, user=self.artist, reaction_type="HELPFUL")
+        self.assertEqual(self.counters(), (1, 1, 1, 4))
+
+        # A stale instance must not overwrite the counters
+        stale = ArtWork.objects.get(pk=self.artwork.pk)
+        self.artwork.likes.remove(self.fan)
+        stale.title = "Renamed"
+        stale.save()
+        self.assertEqual(self.counters(), (0, 1, 1, 3))
+
+        critique.delete()
+        self.assertEqual(self.counters(), (0, 0, 0, 0))
+
+    def test_reconcile_command_repairs_drift(self):
+        self.artwork.likes.add(self.fan)
+        ArtWork.objects.filter(pk=self.artwork.pk).update(likes_count=7, popularity_score=7)
+
+        call_command("reconcile_artwork_counters", stdout=StringIO())
+        self.assertEqual(self.counters(), (1, 0, 0, 1))
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        artist = User.objects.create_user(username="scroller", password="pw")
+        self.artworks = [ArtWork.objects.create(title=f"Scroll {i}", author=artist) for i in range(5)]
+        # Give two artworks the same popularity to exercise the id tie-breaker
+        for artwork, score in zip(self.artworks, [3, 1, 3, 0, 2]):
+            ArtWork.objects.filter(pk=artwork.pk).update(popularity_score=score)
+
+    def walk(self, params):
+        ids = []
+        response = self.client.get("/api/artworks/infinite_scroll/", {"page_size": 2, **params})
+        pages = [response.data]
+        while response.data["next_cursor"]:
+            response = self.client.get(
+                "/api/artworks/infinite_scroll/",
+                {"page_size": 2, "cursor": response.data["next_cursor"], **params},
+            )
+            pages.append(response.data)
+        for page in pages:
+            ids.extend(item["id"] for item in page["results"])
+        return ids, pages
+
+    def test_cursor_walk_matches_full_ordering(self):
+        ids, pages = self.walk({})
+        self.assertEqual(ids, [artwork.id for artwork in reversed(self.artworks)])
+        self.assertNotIn("count", pages[0])
+
+        ids, _ = self.walk({"ordering": "-popularity_score"})
+        expected = ArtWork.objects.order_by("-popularity_score", "-id").values_list("id", flat=True)
+        self.assertEqual(ids, list(expected))
+
+    def test_previous_cursor_returns_previous_page(self):
+        _, pages = self.walk({})
+        response = self.client.get(
+            "/api/artworks/infinite_scroll/",
+            {"page_size": 2, "cursor": pages[1]["previous_cursor"]},
+        )
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [item["id"] for item in pages[0]["results"]],
+        )
+        self.assertFalse(response.data["has_previous"])
+
+
+class ArtworkSearchTest(TestCase):
+    def setUp(self):
+        self.artist = User.objects.create_user(username="painter", password="pw")
+        self.title_match = ArtWork.objects.create(title="Mountain Landscape", author=self.artist)
+        self.text_match = ArtWork.objects.create(
+            title="Evening study", description="A small landscape sketch", author=self.artist
+        )
+        ArtWork.objects.create(title="Portrait", tags="oil", author=self.artist)
+
+    def search(self, query):
+        return list(search_artworks(ArtWork.objects.all(), query).order_by("-search_rank", "-id"))
+
+    def test_prefix_match_ranks_title_first(self):
+        self.assertEqual(self.search("lands"), [self.title_match, self.text_match])
+        self.assertEqual(self.search("lands mount"), [self.title_match])
+
+        response = self.client.get("/api/artworks/", {"search": "landscape"})
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [self.title_match.id, self.text_match.id],
+        )
+
+    def test_index_follows_saves_and_deletes(self):
+        self.text_match.title = "Harbour at dusk"
+        self.text_match.description = ""
+        self.text_match.save()
+        self.assertEqual(self.search("harb"), [self.text_match])
+        self.assertEqual(self.search("landscape"), [self.title_match])
+
+        self.artist.username = "sculptor"
+        self.artist.save()
+        self.assertEqual(len(self.search("sculpt")), 3)
+
+        self.title_match.delete()
+        self.assertEqual(self.search("landscape"), [])
+
+
+class ArtworkTagTest(TestCase):
+    def setUp(self):
+        artist = User.objects.create_user(username="tagger", password="pw")
+        self.oil = ArtWork.objects.create(title="Harbour", tags="Oil, Landscape", author=artist)
+        self.foil = ArtWork.objects.create(title="Shiny", tags="foil,  #landscape ", author=artist)
+        self.portrait = ArtWork.objects.create(title="Sitter", tags="oil,portrait", author=artist)
+
+    def ids(self, queryset):
+        return set(queryset.values_list("id", flat=True))
+
+    def test_whole_tag_and_or_matching(self):
+        artworks = ArtWork.objects.all()
+        self.assertEqual(self.ids(filter_by_tags(artworks, "oil")), {self.oil.id, self.portrait.id})
+        self.assertEqual(self.ids(filter_by_tags(artworks, "OIL, landscape")), {self.oil.id})
+        self.assertEqual(
+            self.ids(filter_by_tags(artworks, ["foil", "portrait"], MATCH_ANY)),
+            {self.foil.id, self.portrait.id},
+        )
+        self.assertEqual(self.oil.tags_list, ["Oil", "Landscape"])
+
+        response = self.client.get("/api/artworks/", {"tags": "oil,portrait"})
+        self.assertEqual([item["id"] for item in response.data["results"]], [self.portrait.id])
+        response = self.client.get("/api/artworks/by_tag/", {"tag": "foil,portrait", "match": "any"})
+        self.assertEqual({item["id"] for item in response.data["results"]}, {self.foil.id, self.portrait.id})
+
+    def test_my_artworks_page_loads_tags_in_one_query(self):
+        self.client.login(username="tagger", password="pw")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("critique:my_artworks"))
+        self.assertEqual(response.status_code, 200)
+        tag_queries = [q for q in queries.captured_queries if "critique_artworktag" in q["sql"]]
+        self.assertEqual(len(tag_queries), 1)
+        self.assertContains(response, "Oil</span>")
+
+    def test_folder_artworks_load_tags_in_constant_queries(self):
+        folder = Folder.objects.create(name="Studies", owner=self.oil.author)
+        ArtWork.objects.filter(pk=self.oil.pk).update(folder=folder)
+        self.client.login(username="tagger", password="pw")
+        url = f"/api/folders/{folder.id}/artworks/"
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+
+        ArtWork.objects.update(folder=folder)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data["artworks"]), 3)
+        self.assertEqual(response.data["folder"]["artworks"][-1]["tags_list"], ["Oil", "Landscape"])
+
+    def test_tags_follow_text_and_facets_count(self):
+        self.portrait.tags = "portrait, charcoal"
+        self.portrait.save()
+        self.assertEqual(self.ids(filter_by_tags(ArtWork.objects.all(), "oil")), {self.oil.id})
+
+        facets = {facet["name"]: facet["count"] for facet in tag_facets(ArtWork.objects.all())}
+        self.assertEqual(facets, {"landscape": 2, "oil": 1, "foil": 1, "portrait": 1, "charcoal": 1})
+        response = self.client.get("/api/artworks/tag_facets/", {"tags": "landscape"})
+        self.assertEqual(response.data["facets"][0], {"name": "landscape", "label": "Landscape", "count": 2})
+
+
+class ReactionSummaryLoaderTest(TestCase):
+    def setUp(self):
+        artist = User.objects.create_user(username="owner", password="pw")
+        self.viewer = User.objects.create_user(username="viewer", password="pw")
+        other = User.objects.create_user(username="other", password="pw")
+        artwork = ArtWork.objects.create(title="Reacted", author=artist)
+        self.critiques = [
+            Critique.objects.create(artwork=artwork, author=other, text=f"Critique {i}") for i in range(6)
+        ]
+        for critique in self.critiques[:3]:
+            Reaction.objects.create(critique=critique, user=self.viewer, reaction_type="HELPFUL")
+            Reaction.objects.create(critique=critique, user=other, reaction_type="HELPFUL")
+        Reaction.objects.create(critique=self.critiques[0], user=self.viewer, reaction_type="DETAILED")
+
+    def test_page_reactions_load_in_two_queries(self):
+        critiques = list(Critique.objects.select_related("artwork__author").order_by("id"))
+        serializer = CritiqueListSerializer(
+            critiques, many=True, context={"request": SimpleNamespace(user=self.viewer)}
+        )
+        with CaptureQueriesContext(connection) as queries:
+            data = serializer.data
+        reaction_queries = [q for q in queries.captured_queries if "critique_reaction" in q["sql"]]
+        self.assertEqual(len(reaction_queries), 2)
+
+        first = data[0]
+        self.assertEqual(first["reactions_count"], {"HELPFUL": 2, "INSPIRING": 0, "DETAILED": 1, "TOTAL": 3})
+        self.assertEqual(first["helpful_count"], 2)
+        self.assertEqual(sorted(first["user_reactions"]), ["DETAILED", "HELPFUL"])
+        self.assertEqual(data[5]["reactions_count"]["TOTAL"], 0)
+        self.assertEqual(data[5]["user_reactions"], [])
+
+        single = CritiqueSerializer(critiques[1], context={"request": SimpleNamespace(user=self.viewer)})
+        self.assertEqual(single.data["user_reactions"], ["HELPFUL"])
+
+
+class ArtWorkQueryCountTest(TestCase):
+    def setUp(self):
+        self.viewer = User.objects.create_user(username="looker", password="pw")
+        self.artworks = []
+        for i in range(6):
+            artist = User.objects.create_user(username=f"artist{i}", password="pw")
+            artwork = ArtWork.objects.create(title=f"Work {i}", tags="ink, study", author=artist)
+            artwork.likes.add(self.viewer)
+            Critique.objects.create(artwork=self.artworks[0] if self.artworks else artwork, author=artist, text="Nice")
+            self.artworks.append(artwork)
+        # artworks[0] has six critiques, artworks[1] has one
+        Critique.objects.create(artwork=self.artworks[1], author=self.viewer, text="Lovely")
+        self.client.force_login(self.viewer)
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.data
+
+    def test_list_endpoints_use_constant_queries(self):
+        for url in ("/api/artworks/", "/api/artworks/infinite_scroll/"):
+            small, _ = self.count_queries(url, {"page_size": 2})
+            large, data = self.count_queries(url, {"page_size": 6})
+            self.assertEqual(small, large, url)
+            self.assertEqual(len(data["results"]), 6)
+
+        _, data = self.count_queries("/api/artworks/infinite_scroll/", {"page_size": 6})
+        self.assertTrue(all(item["is_liked"] for item in data["results"]))
+
+    def test_detail_critiques_use_constant_queries(self):
+        few, _ = self.count_queries(f"/api/artworks/{self.artworks[1].id}/")
+        many, data = self.count_queries(f"/api/artworks/{self.artworks[0].id}/")
+        self.assertEqual(few, many)
+        self.assertEqual(len(data["critiques"]), 5)
+        self.assertTrue(data["is_liked"])
+
+
+class NotificationTargetPrefetchTest(TestCase):
+    def setUp(self):
+        from django.contrib.contenttypes.models import ContentType
+
+        self.user = User.objects.create_user(username="notified", password="pw")
+        fan = User.objects.create_user(username="fan", password="pw")
+        notifications = []
+        for i in range(4):
+            artwork = ArtWork.objects.create(title=f"Target {i}", author=self.user)
+            critique = Critique.objects.create(artwork=artwork, author=fan, text="Good")
+            reaction = Reaction.objects.create(critique=critique, user=self.user, reaction_type="HELPFUL")
+            for target in (artwork, critique, reaction):
+                notifications.append(Notification(
+                    recipient=self.user, message="Hi",
+                    target_content_type=ContentType.objects.get_for_model(target),
+                    target_object_id=target.pk,
+                ))
+        Notification.objects.bulk_create(notifications)
+        self.client.force_login(self.user)
+
+    def test_list_loads_targets_per_type(self):
+        response = self.client.get("/api/notifications/")  # warm the session and content types
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/notifications/")
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"] if isinstance(response.data, dict) else response.data
+        self.assertEqual(len(results), 10)
+        self.assertIn("Reaction on critique for: Target 3", [item["target_display"] for item in results])
+
+        target_queries = [
+            q for q in queries.captured_queries
+            if 'FROM "critique_artwork"' in q["sql"] or 'FROM "critique_critique"' in q["sql"]
+            or 'FROM "critique_reaction"' in q["sql"]
+        ]
+        self.assertEqual(len(target_queries), 3)
+
+
+class UnreadCounterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="pw")
+        self.notifications = [
+            Notification.objects.create(recipient=self.user, message=f"Note {i}") for i in range(4)
+        ]
+        self.client.force_login(self.user)
+
+    def stored(self):
+        return Profile.objects.get(user=self.user).unread_notifications_count
+
+    def test_counter_follows_read_state_changes(self):
+        stale_profile = Profile.objects.get(user=self.user)
+        self.assertEqual(self.stored(), 4)
+
+        first, second, third, fourth = self.notifications
+        self.client.post(f"/api/notifications/{first.id}/mark_read/")
+        self.client.post(f"/api/notifications/{first.id}/mark_read/")
+        self.assertEqual(self.stored(), 3)
+
+        self.client.post(
+            "/api/notifications/mark_multiple_read/",
+            {"notification_ids": [first.id, second.id, third.id]},
+            content_type="application/json",
+        )
+        self.assertEqual(self.stored(), 1)
+
+        self.client.patch(f"/api/notifications/{second.id}/", {"is_read": False}, content_type="application/json")
+        self.assertEqual(self.client.get("/api/notifications/unread/").data["unread_count"], 2)
+
+        # Re-saving a stale profile must not overwrite the counter
+        stale_profile.bio = "Updated"
+        stale_profile.save()
+        self.assertEqual(self.stored(), 2)
+
+        fourth.delete()
+        self.assertEqual(self.stored(), 1)
+        self.client.post("/api/notifications/mark_all_read/")
+        self.assertEqual(self.stored(), 0)
+
+    def test_user_admin_shows_counters_read_only(self):
+        admin_user = User.objects.create_superuser(username="staff", password="pw", email="staff@example.com")
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse("admin:auth_user_change", args=[self.user.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'name="profile-0-unread_notifications_count"')
+        self.assertNotContains(response, 'name="profile-0-karma"')
+
+    def test_reconcile_command_repairs_drift(self):
+        Notification.objects.bulk_create([Notification(recipient=self.user, message="Bulk") for _ in range(2)])
+        out = StringIO()
+        call_command("reconcile_unread_counts", "--dry-run", stdout=out)
+        self.assertIn("1 of", out.getvalue())
+        self.assertEqual(self.stored(), 4)
+
+        call_command("reconcile_unread_counts", stdout=StringIO())
+        self.assertEqual(self.stored(), 6)
+
+
+class FlakyChannelLayer(InMemoryChannelLayer):
+    """In-memory layer whose first send to each group in fail_groups raises."""
+
+    def __init__(self, fail_groups=(), **kwargs):
+        super().__init__(**kwargs)
+        self.fail_groups = set(fail_groups)
+
+    async def group_send(self, group, message):
+        if group in self.fail_groups:
+            self.fail_groups.discard(group)
+            raise ConnectionError("layer unavailable")
+        await super().group_send(group, message)
+
+
+class HookedChannelLayer(InMemoryChannelLayer):
+    """In-memory layer that runs a sync callback before its first send."""
+
+    def __init__(self, before_send, **kwargs):
+        super().__init__(**kwargs)
+        self.before_send = before_send
+
+    async def group_send(self, group, message):
+        if self.before_send is not None:
+            callback, self.before_send = self.before_send, None
+            await sync_to_async(callback)()
+        await super().group_send(group, message)
+
+
+@override_settings(NOTIFICATION_DISPATCH_INLINE=False)
+class NotificationOutboxTest(TestCase):
+    def setUp(self):
+        self.layer = InMemoryChannelLayer()
+        self.artist = User.objects.create_user(username="artist", password="pw")
+        self.fan = User.objects.create_user(username="fan", password="pw")
+        self.artwork = ArtWork.objects.create(title="Harbour", author=self.artist)
+        # Start from an empty inbox (uploading awards karma, which notifies)
+        Notification.objects.all().delete()
+
+    def listen(self, layer, group):
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(group, channel)
+        return channel
+
+    def receive(self, layer, channel, count):
+        return [async_to_sync(layer.receive)(channel) for _ in range(count)]
+
+    def test_messages_are_queued_then_sent_in_order(self):
+        group = user_group(self.artist.id)
+        channel = self.listen(self.layer, group)
+
+        create_like_notification(self.artwork, self.fan)
+        for i in range(3):
+            enqueue(group, {"type": "unread_count_update", "count": i})
+        self.assertEqual(NotificationOutbox.objects.count(), 5)
+
+        self.assertEqual(dispatch_pending(channel_layer=self.layer), 5)
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+        first, second, *rest = self.receive(self.layer, channel, 5)
+        self.assertEqual(first["type"], "notification_message")
+        self.assertEqual(first["notification"]["artwork_id"], self.artwork.id)
+        self.assertFalse(first["notification"]["read"])
+        self.assertEqual(second, {"type": "unread_count_update", "count": 1})
+        self.assertEqual([message["count"] for message in rest], [0, 1, 2])
+
+    def test_failed_send_backs_off_and_holds_its_group(self):
+        artist_group, fan_group = user_group(self.artist.id), user_group(self.fan.id)
+        layer = FlakyChannelLayer(fail_groups=[artist_group])
+        artist_channel = self.listen(layer, artist_group)
+        fan_channel = self.listen(layer, fan_group)
+        for i in range(2):
+            enqueue(artist_group, {"type": "unread_count_update", "count": i})
+        enqueue(fan_group, {"type": "unread_count_update", "count": 7})
+
+        self.assertEqual(dispatch_pending(channel_layer=layer), 1)
+        self.assertEqual(self.receive(layer, fan_channel, 1)[0]["count"], 7)
+        held = NotificationOutbox.objects.order_by("id")
+        self.assertEqual(held.count(), 2)
+        self.assertEqual(held[0].attempts, 1)
+        self.assertIn("layer unavailable", held[0].last_error)
+
+        # Still backing off: nothing is sent for the group
+        self.assertEqual(dispatch_pending(channel_layer=layer), 0)
+
+        NotificationOutbox.objects.update(available_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(dispatch_pending(channel_layer=layer), 2)
+        self.assertEqual([m["count"] for m in self.receive(layer, artist_channel, 2)], [0, 1])
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_a_backing_off_group_does_not_fill_the_batch(self):
+        artist_group, fan_group = user_group(self.artist.id), user_group(self.fan.id)
+        layer = FlakyChannelLayer(fail_groups=[artist_group])
+        fan_channel = self.listen(layer, fan_group)
+        for i in range(3):
+            enqueue(artist_group, {"type": "unread_count_update", "count": i})
+        enqueue(fan_group, {"type": "unread_count_update", "count": 7})
+
+        self.assertEqual(dispatch_pending(channel_layer=layer, batch_size=2), 0)
+        # The artist's backlog is older, but it is backing off
+        self.assertEqual(dispatch_pending(channel_layer=layer, batch_size=2), 1)
+        self.assertEqual(self.receive(layer, fan_channel, 1)[0]["count"], 7)
+
+    def test_claimed_groups_are_left_alone_while_sending(self):
+        group = user_group(self.artist.id)
+        enqueue(group, {"type": "unread_count_update", "count": 1}, key="unread")
+        during_send = {}
+
+        def while_sending():
+            # Another dispatcher skips the claimed group, and an update
+            # queues a new row instead of rewriting the one being sent
+            during_send["sent"] = dispatch_pending(channel_layer=InMemoryChannelLayer())
+            during_send["row"] = enqueue(group, {"type": "unread_count_update", "count": 2}, key="unread")
+
+        layer = HookedChannelLayer(while_sending)
+        channel = self.listen(layer, group)
+        self.assertEqual(dispatch_pending(channel_layer=layer), 1)
+        self.assertEqual(during_send["sent"], 0)
+        self.assertIsNotNone(during_send["row"])
+        self.assertEqual(self.receive(layer, channel, 1)[0]["count"], 1)
+
+        queued = NotificationOutbox.objects.get()
+        self.assertEqual((queued.message["count"], queued.claimed_until), (2, None))
+        self.assertEqual(dispatch_pending(channel_layer=layer), 1)
+        self.assertEqual(self.receive(layer, channel, 1)[0]["count"], 2)
+
+    @override_settings(NOTIFICATION_DISPATCH_INLINE=True)
+    def test_inline_dispatch_runs_after_commit(self):
+        layer = get_channel_layer()
+        channel = self.listen(layer, user_group(self.artist.id))
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            create_like_notification(self.artwork, self.fan)
+        self.assertEqual(NotificationOutbox.objects.count(), 2)
+
+        for callback in callbacks:
+            callback()
+        self.assertFalse(NotificationOutbox.objects.exists())
+        self.assertEqual(self.receive(layer, channel, 1)[0]["type"], "notification_message")
+
+
+@override_settings(NOTIFICATION_DISPATCH_INLINE=False, NOTIFICATION_COALESCE_SECONDS=3600)
+class NotificationCoalescingTest(TestCase):
+    def setUp(self):
+        self.artist = User.objects.create_user(username="artist", password="pw")
+        self.fans = [User.objects.create_user(username=f"fan{i}", password="pw") for i in range(3)]
+        self.artwork = ArtWork.objects.create(title="Harbour", author=self.artist)
+        # Start from an empty inbox (uploading awards karma, which notifies)
+        Notification.objects.all().delete()
+
+    def test_likes_on_one_artwork_merge_into_one_notification(self):
+        for fan in self.fans:
+            create_like_notification(self.artwork, fan)
+        # Repeats by anyone already counted change nothing
+        create_like_notification(self.artwork, self.fans[0])
+        create_like_notification(self.artwork, self.fans[-1])
+
+        notification = Notification.objects.get(recipient=self.artist, kind="artwork_liked")
+        self.assertEqual(notification.actor_count, 3)
+        self.assertEqual(notification.message, "fan2 and 2 others liked your artwork: 'Harbour'")
+        self.assertEqual(Profile.objects.get(user=self.artist).unread_notifications_count, 1)
+
+        # One queued push for the notification and one for the count, latest state
+        messages = [row.message for row in NotificationOutbox.objects.all()]
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(messages[0]["notification"]["actor_count"], 3)
+        self.assertEqual(messages[1]["count"], 1)
+
+        # Once read, the next like starts a new notification
+        mark_read(self.artist)
+        create_like_notification(self.artwork, self.fans[0])
+        self.assertEqual(Notification.objects.get(recipient=self.artist, kind="artwork_liked", is_read=False).actor_count, 1)
+
+    def test_reactions_merge_per_critique(self):
+        critic = User.objects.create_user(username="critic", password="pw")
+        critique = Critique.objects.create(artwork=self.artwork, author=critic, text="Nice light")
+        for fan in self.fans[:2]:
+            reaction = Reaction.objects.create(critique=critique, user=fan, reaction_type="HELPFUL")
+            create_reaction_notification(reaction)
+
+        notification = Notification.objects.get(recipient=critic, kind="reaction_received")
+        self.assertEqual(notification.target, critique)
+        self.assertEqual(notification.message, "fan1 and 1 other reacted to your critique on 'Harbour'")
+
+    @override_settings(NOTIFICATION_COALESCE_SECONDS=0)
+    def test_coalescing_can_be_disabled(self):
+        for fan in self.fans:
+            create_like_notification(self.artwork, fan)
+        self.assertEqual(Notification.objects.filter(recipient=self.artist, kind="artwork_liked").count(), 3)
+
+
+class NotificationArchiveTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="pw")
+        now = timezone.now()
+        for i in range(9):
+            notification = Notification.objects.create(recipient=self.user, message=f"Note {i}")
+            # i < 5: old and read, 5-6: old but unread, 7-8: recent and read
+            Notification.objects.filter(pk=notification.pk).update(
+                created_at=now - timedelta(days=200 - i if i < 7 else 1, minutes=i),
+                is_read=i not in (5, 6),
+            )
+        self.client.force_login(self.user)
+
+    def test_command_moves_old_read_notifications(self):
+        out = StringIO()
+        call_command("archive_notifications", "--days", "90", "--dry-run", stdout=out)
+        self.assertIn("5 read notifications", out.getvalue())
+        self.assertEqual(ArchivedNotification.objects.count(), 0)
+
+        live_ids = set(Notification.objects.values_list("id", flat=True))
+        unread = Profile.objects.get(user=self.user).unread_notifications_count
+        call_command("archive_notifications", "--days", "90", "--chunk-size", "2", stdout=StringIO())
+
+        archived = set(ArchivedNotification.objects.values_list("id", flat=True))
+        self.assertEqual(len(archived), 5)
+        self.assertEqual(archived | set(Notification.objects.values_list("id", flat=True)), live_ids)
+        self.assertFalse(Notification.objects.filter(pk__in=archived).exists())
+        # Only read notifications move, so the unread counter is untouched
+        self.assertEqual(Profile.objects.get(user=self.user).unread_notifications_count, unread)
+
+    def test_history_pages_into_the_archive(self):
+        expected = list(Notification.objects.filter(recipient=self.user).values_list("id", flat=True))
+        call_command("archive_notifications", "--days", "90", stdout=StringIO())
+
+        seen, archived = [], []
+        url = "/api/notifications/history/?page_size=3&include_count=true"
+        while url:
+            data = self.client.get(url).data
+            self.assertEqual(data["count"], 9)
+            seen += [item["id"] for item in data["results"]]
+            archived += [item["archived"] for item in data["results"]]
+            url = data["next"]
+
+        self.assertEqual(seen, expected)
+        self.assertEqual(archived.count(True), 5)
+        self.assertEqual(len(self.client.get("/api/notifications/").data["results"]), 4)
+
+
+@override_settings(NOTIFICATION_SYNC_OVERLAP_SECONDS=5)
+class NotificationDeltaSyncTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="pw")
+        self.seen = [Notification.objects.create(recipient=self.user, message=f"Seen {i}") for i in range(3)]
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Notification.objects.update(created_at=an_hour_ago, changed_at=an_hour_ago)
+        self.cursor = parse_cursor(since=sync_token(an_hour_ago + timedelta(minutes=30)))
+
+    def sync(self, cursor, limit):
+        batches, after = [], None
+        while True:
+            batch = fetch_changes(self.user, cursor, after=after, limit=limit)
+            after = batch.pop("after", None)
+            batches.append(batch)
+            if not batch["has_more"]:
+                return batches
+
+    def test_only_new_rows_and_changes_are_sent(self):
+        mark_read(self.user, [self.seen[0].id])
+        new = [Notification.objects.create(recipient=self.user, message=f"New {i}") for i in range(2)]
+
+        batches = self.sync(self.cursor, limit=2)
+        self.assertEqual(len(batches), 2)
+        self.assertEqual(
+            [item["id"] for batch in batches for item in batch["notifications"]], [n.id for n in new]
+        )
+        changes = [change for batch in batches for change in batch["changes"]]
+        self.assertEqual(changes, [{
+            "id": self.seen[0].id, "read": True, "message": "Seen 0", "actor_count": 1,
+        }])
+        self.assertEqual(batches[-1]["unread_count"], 4)
+        self.assertNotIn("unread_count", batches[0])
+
+        # Nothing changed since the final token
+        later = parse_cursor(since=batches[-1]["sync_token"])
+        with override_settings(NOTIFICATION_SYNC_OVERLAP_SECONDS=0):
+            batch = fetch_changes(self.user, later)
+        self.assertEqual((batch["notifications"], batch["changes"]), ([], []))
+
+    def test_last_id_cursor_returns_newer_notifications(self):
+        new = Notification.objects.create(recipient=self.user, message="New")
+        batch = fetch_changes(self.user, parse_cursor(last_id=self.seen[-1].id))
+        self.assertEqual([item["id"] for item in batch["notifications"]], [new.id])
+
+        with self.assertRaises(ValueError):
+            parse_cursor(since="yesterday")
+
+
+class KarmaToastTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="earner", password="pw")
+        self.request = SimpleNamespace(user=self.user, session={})
+
+    def test_toast_is_shown_once_without_queries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            award_karma(self.user, "artwork_upload", "Uploaded artwork: Harbour")
+        self.assertTrue(Notification.objects.filter(recipient=self.user, message__contains="karma").exists())
+
+        with CaptureQueriesContext(connection) as queries:
+            first = karma_notifications(self.request)
+            second = karma_notifications(self.request)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(first["karma_notification"], {"points": 5, "reason": "Uploaded artwork: Harbour"})
+        self.assertEqual(second, {})
+
+
+class KarmaLedgerTest(TestCase):
+    def setUp(self):
+        self.artist = User.objects.create_user(username="artist", password="pw")
+        self.fan = User.objects.create_user(username="fan", password="pw")
+        self.artwork = ArtWork.objects.create(title="Harbour", author=self.artist)
+
+    def karma(self, user):
+        return Profile.objects.get(user=user).karma
+
+    def test_awards_are_applied_with_f_updates(self):
+        stale_profile = Profile.objects.get(user=self.artist)
+        before = self.karma(self.artist)
+
+        with CaptureQueriesContext(connection) as queries:
+            award_like_karma(self.artwork, self.fan)
+        updates = [q["sql"] for q in queries if q["sql"].startswith('UPDATE "critique_profile" SET "karma"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.karma(self.artist), before + 3)
+        self.assertEqual(self.karma(self.fan), 1)
+
+        # A stale full save must not roll the karma back
+        stale_profile.bio = "Updated"
+        stale_profile.save()
+        self.assertEqual(self.karma(self.artist), before + 3)
+
+    @override_settings(KARMA_BUFFERED_ACTIONS=["like_given", "artwork_liked"], KARMA_BUFFER_FLUSH_SECONDS=0)
+    def test_buffered_awards_are_recorded_on_flush(self):
+        before = self.karma(self.artist)
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(4):
+                award_like_karma(self.artwork, self.fan)
+        self.assertEqual(self.karma(self.artist), before)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(flush_karma_buffer(), 8)
+        self.assertEqual(self.karma(self.artist), before + 12)
+        self.assertEqual(self.karma(self.fan), 4)
+        self.assertEqual(KarmaEvent.objects.filter(action="artwork_liked").count(), 4)
+
+        # One notification per kind of award, found with one lookup and counted as unread
+        lookups = [q["sql"] for q in queries if q["sql"].startswith('SELECT "critique_notification"')]
+        self.assertEqual(len(lookups), 1)
+        self.assertEqual(Notification.objects.filter(recipient=self.fan, kind="karma_awarded").count(), 1)
+        self.assertEqual(Profile.objects.get(user=self.fan).unread_notifications_count, 1)
+
+    @override_settings(KARMA_BUFFERED_ACTIONS=["like_given", "artwork_liked"], KARMA_BUFFER_FLUSH_SECONDS=0)
+    def test_buffered_awards_wait_for_the_caller_to_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    award_like_karma(self.artwork, self.fan)
+                    raise RuntimeError("like rolled back")
+            except RuntimeError:
+                pass
+        self.assertEqual(flush_karma_buffer(), 0)
+
+
+class KarmaRecomputeTest(TestCase):
+    def setUp(self):
+        self.artist = User.objects.create_user(username="artist", password="pw")
+        self.fan = User.objects.create_user(username="fan", password="pw")
+        artwork = ArtWork.objects.create(title="Harbour", author=self.artist)
+        artwork.likes.add(self.fan, self.artist)
+        Critique.objects.create(artwork=artwork, author=self.fan, text="Strong composition")
+        KarmaEvent.objects.create(user=self.fan, action="daily_visit", points=1)
+        # Written by the old maintenance script for karma that content already accounts for
+        KarmaEvent.objects.create(user=self.fan, action="critique_given", points=3)
+        KarmaEvent.objects.create(user=self.artist, action="likes_received", points=3)
+        Profile.objects.update(karma=0)
+
+    def karma(self, user):
+        return Profile.objects.get(user=user).karma
+
+    def test_expected_karma_uses_karma_values(self):
+        first, last = user_id_ranges(1000)[0]
+        totals = expected_karma(first, last)
+        # upload 5 + fan's like 3 + critique received 5 + like given 1; the self-like earns no artwork_liked
+        self.assertEqual(totals[self.artist.id], 14)
+        # like given 1 + critique posted 3 + daily visit 1
+        self.assertEqual(totals[self.fan.id], 5)
+
+    def test_dry_run_reports_without_writing(self):
+        out = StringIO()
+        call_command("recalculate_karma", "--dry-run", stdout=out)
+        self.assertIn("2 profiles have different karma", out.getvalue())
+        self.assertEqual(self.karma(self.artist), 0)
+
+    def test_command_writes_recomputed_totals(self):
+        out = StringIO()
+        call_command("recalculate_karma", "--range-size", "1", stdout=out)
+        self.assertIn("Updated karma on 2 profiles", out.getvalue())
+        self.assertEqual(self.karma(self.artist), 14)
+        self.assertEqual(self.karma(self.fan), 5)
+        self.assertFalse(KarmaEvent.objects.filter(action="recalculation").exists())
+
+        call_command("recalculate_karma", stdout=out)
+        self.assertIn("Updated karma on 0 profiles", out.getvalue())
+
+
+class KarmaLeaderboardTest(TestCase):
+    def setUp(self):
+        karma_leaderboard.invalidate()
+        self.users = [User.objects.create_user(username=name, password="pw") for name in "abcd"]
+        karma_leaderboard.rebuild()
+        a, b, c, _ = self.users
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_karma_deltas({a.id: 10, b.id: 5, c.id: 5})
+
+    def tearDown(self):
+        karma_leaderboard.invalidate()
+
+    def test_ranks_follow_awards_without_queries(self):
+        a, b, c, d = self.users
+        with self.assertNumQueries(0):
+            self.assertEqual([karma_leaderboard.rank_of(user.id) for user in self.users], [1, 2, 2, 4])
+            self.assertEqual(
+                [(entry.user_id, entry.rank, entry.karma) for entry in karma_leaderboard.top(2)],
+                [(a.id, 1, 10), (b.id, 2, 5)],
+            )
+            self.assertEqual(
+                [(entry.user_id, entry.rank) for entry in karma_leaderboard.around(c.id, radius=1)][:2],
+                [(b.id, 2), (c.id, 2)],
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_karma_deltas({d.id: 20})
+        self.assertEqual(karma_leaderboard.rank_of(d.id), 1)
+        self.assertEqual(karma_leaderboard.rank_of(a.id), 2)
+
+        newcomer = User.objects.create_user(username="e", password="pw")
+        self.assertEqual(karma_leaderboard.rank_of(newcomer.id), 5)
+        newcomer.delete()
+        self.assertIsNone(karma_leaderboard.rank_of(newcomer.id))
+
+    def test_leaderboard_view_uses_ranks(self):
+        self.client.login(username="d", password="pw")
+        response = self.client.get(reverse("critique:karma_leaderboard"))
+        self.assertEqual(response.context["user_rank"], 4)
+        self.assertEqual(
+            [(profile.user.username, profile.rank) for profile in response.context["top_profiles"]][:3],
+            [("a", 1), ("b", 2), ("c", 2)],
+        )
+
+
+class KarmaRollupTest(TestCase):
+    def setUp(self):
+        self.artist = User.objects.create_user(username="artist", password="pw")
+        self.fan = User.objects.create_user(username="fan", password="pw")
+        self.artwork = ArtWork.objects.create(title="Harbour", author=self.artist)
+        award_like_karma(self.artwork, self.fan)
+        award_like_karma(self.artwork, self.fan)
+        award_karma(self.fan, "daily_visit")
+
+    def rollups(self):
+        return set(KarmaRollup.objects.values_list("user_id", "action", "day", "points", "events"))
+
+    def test_awards_update_daily_rollups(self):
+        today = timezone.localdate()
+        self.assertEqual(self.rollups(), {
+            (self.artist.id, "artwork_upload", today, 5, 1),
+            (self.artist.id, "artwork_liked", today, 6, 2),
+            (self.fan.id, "like_given", today, 2, 2),
+            (self.fan.id, "daily_visit", today, 1, 1),
+        })
+
+    def totals(self):
+        return set(KarmaTotal.objects.values_list("user_id", "action", "points", "events"))
+
+    def test_awards_update_lifetime_totals(self):
+        # An older rollup day counts towards the total but not today's row
+        KarmaRollup.objects.filter(user=self.artist, action="artwork_liked").update(
+            day=timezone.localdate() - timedelta(days=400)
+        )
+        award_like_karma(self.artwork, self.fan)
+        self.assertIn((self.artist.id, "artwork_liked", 9, 3), self.totals())
+        self.assertIn((self.artist.id, "artwork_liked", timezone.localdate(), 3, 1), self.rollups())
+
+    def test_karma_view_reads_rollups(self):
+        self.client.login(username="artist", password="pw")
+        response = self.client.get(reverse("critique:my_karma"))
+        self.assertEqual(
+            [(row["action"], row["total"], row["count"]) for row in response.context["karma_by_category"]],
+            [("artwork_liked", 6, 2), ("artwork_upload", 5, 1)],
+        )
+        history = response.context["karma_history"]
+        self.assertEqual(len(history), 30)
+        self.assertEqual((history[-1]["day"], history[-1]["points"], history[-1]["height"]), (timezone.localdate(), 11, 100))
+
+    def test_backfill_rebuilds_rollups_from_events(self):
+        expected, expected_totals = self.rollups(), self.totals()
+        KarmaRollup.objects.all().delete()
+        KarmaRollup.objects.create(user=self.fan, action="like_given", day=timezone.localdate(), points=99, events=1)
+        KarmaTotal.objects.filter(user=self.fan, action="like_given").update(points=99)
+
+        out = StringIO()
+        call_command("backfill_karma_rollups", "--range-size", "1", stdout=out)
+        self.assertIn("Wrote 4 karma rollups", out.getvalue())
+        self.assertEqual(self.rollups(), expected)
+        self.assertEqual(self.totals(), expected_totals)
+
+
+def clear_daily_visit_marker(user):
+    cache.delete(DAILY_VISIT_KEY.format(user_id=user.pk, day=timezone.localdate().isoformat()))
+
+
+class DailyVisitKarmaTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="visitor", password="pw")
+        clear_daily_visit_marker(self.user)
+
+    def test_repeat_visits_cost_no_queries(self):
+        self.assertTrue(award_daily_visit_karma(self.user))
+        with self.assertNumQueries(0):
+            self.assertFalse(award_daily_visit_karma(self.user))
+        self.assertEqual(KarmaEvent.objects.filter(user=self.user, action="daily_visit").count(), 1)
+
+    def test_evicted_marker_falls_back_to_the_ledger(self):
+        self.assertTrue(award_daily_visit_karma(self.user))
+        clear_daily_visit_marker(self.user)
+
+        self.assertFalse(award_daily_visit_karma(self.user))
+        self.assertEqual(KarmaEvent.objects.filter(user=self.user, action="daily_visit").count(), 1)
+        with self.assertNumQueries(0):
+            self.assertFalse(award_daily_visit_karma(self.user))
+
+
+class DailyVisitKarmaRaceTest(TransactionTestCase):
+    def test_parallel_first_visits_award_once(self):
+        user = User.objects.create_user(username="visitor", password="pw")
+        clear_daily_visit_marker(user)
+        barrier = threading.Barrier(8)
+        results = []
+
+        def visit():
+            try:
+                barrier.wait()
+                results.append(award_daily_visit_karma(user))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=visit) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(results), [False] * 7 + [True])
+        self.assertEqual(KarmaEvent.objects.filter(user=user, action="daily_visit").count(), 1)
+        self.assertEqual(Profile.objects.get(user=user).karma, 1)
+
+    @skipUnlessDBFeature("has_select_for_update")
+    def test_parallel_first_visits_award_once_without_the_marker(self):
+        # As if the marker had been evicted: every request reaches the ledger
+        # check, so only the profile row lock keeps the award single
+        user = User.objects.create_user(username="visitor", password="pw")
+        barrier = threading.Barrier(8)
+        results = []
+
+        def visit():
+            try:
+                barrier.wait()
+                results.append(award_daily_visit_karma(user))
+            finally:
+                connection.close()
+
+        # Patch the module's reference: the cache proxy is per thread
+        with mock.patch("critique.karma.cache") as karma_cache:
+            karma_cache.add.return_value = True
+            threads = [threading.Thread(target=visit) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(sorted(results), [False] * 7 + [True])
+        self.assertEqual(KarmaEvent.objects.filter(user=user, action="daily_visit").count(), 1)
+        self.assertEqual(Profile.objects.get(user=user).karma, 1)
+
+
+class UserStatsTest(TestCase):
+    def setUp(self):
+        self.artist = User.objects.create_user(username="artist", password="pw")
+        self.fan = User.objects.create_user(username="fan", password="pw")
+        sketch = ArtWork.objects.create(title="Sketch", author=self.artist, seeking_critique=True)
+        study = ArtWork.objects.create(title="Study", author=self.artist)
+        for number in (1, 2):
+            ArtWorkVersion.objects.create(artwork=sketch, version_number=number, title="Sketch", description="")
+        for artwork in (sketch, study):
+            artwork.likes.add(self.fan)
+        critique = Critique.objects.create(
+            artwork=ArtWork.objects.create(title="Dunes", author=self.fan), author=self.artist, text="Nice light"
+        )
+        Reaction.objects.create(critique=critique, user=self.fan, reaction_type="HELPFUL")
+        Reaction.objects.create(critique=critique, user=self.fan, reaction_type="DETAILED")
+        Folder.objects.create(name="Studies", owner=self.artist)
+
+    def badge(self, criteria_type, criteria_value):
+        return AchievementBadge.objects.create(
+            name=f"{criteria_type} {criteria_value}", description="", category=AchievementBadge.CATEGORY_SPECIAL,
+            tier=AchievementBadge.TIER_BRONZE, icon="bi-star", color="text-info",
+            criteria_type=criteria_type, criteria_value=criteria_value,
+        )
+
+    def test_snapshot_gathers_every_metric_in_one_query(self):
+        with self.assertNumQueries(1):
+            stats = UserStats.for_user(self.artist)
+        self.assertEqual(
+            {name: stats.value(name) for name in UserStats.METRICS if name != "days_active"},
+            {
+                "artwork_count": 2, "published_artwork_count": 2, "seeking_critique_count": 1,
+                "critique_count": 1, "helpful_reactions": 1, "critique_reactions": 2,
+                "artwork_likes": 2, "version_count": 2, "folder_count": 1,
+                "karma_points": Profile.objects.get(user=self.artist).karma,
+            },
+        )
+
+    def test_badges_are_judged_against_the_snapshot(self):
+        met = [self.badge("folder_count", 1), self.badge("version_count", 2), self.badge("helpful_reactions", 1)]
+        unmet = [self.badge("artwork_likes", 3), self.badge("critique_count", 5), self.badge("unknown", 0)]
+
+        with self.assertNumQueries(2):
+            progress = AchievementService.get_user_badge_progress(self.artist)["badge_progress"]
+        self.assertEqual(len(progress), 6)
+
+        awarded = AchievementService.check_and_award_badges(self.artist)
+        self.assertEqual({achievement.badge for achievement in awarded}, set(met))
+        self.assertFalse(self.artist.achievements.filter(badge__in=unmet).exists())
@@ -0,0 +1,151 @@
+"""
+Maintained unread-notification counter on Profile.
+
+Profile.unread_notifications_count is kept current so badge counts, the
+notification socket and the profile serializers read one column instead of
+counting unread Notification rows on every request:
+
+    New unread notification      +1 (post_save handler in critique.signals,
+                                    or adjust_unread_many after a bulk_create)
+    Unread notification deleted  -1 (post_delete handler)
+    mark_read / mark_unread      -/+ the number of rows whose state changed
+
+mark_read() and mark_unread() flip is_read with a conditional UPDATE and
+shift the counter by the UPDATE's row count in the same transaction, so
+concurrent requests can't count the same notification twice. Writes that
+bypass these helpers (admin edits, raw SQL) are repaired by the
+reconcile_unread_counts management command.
+"""
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Notification, Profile
+
+
+def adjust_unread(user_id, delta):
+    """
+    Add delta to a user's unread counter, never going below zero.
+
+    Args:
+        user_id: ID of the recipient
+        delta: Change in unread notifications
+
+    Returns:
+        Number of profile rows updated
+    """
+    if not delta:
+        return 0
+    return Profile.objects.filter(user_id=user_id).update(
+        unread_notifications_count=Greatest(F('unread_notifications_count') + delta, 0)
+    )
+
+
+def adjust_unread_many(deltas):
+    """
+    Add deltas to several users' unread counters in a single UPDATE.
+
+    Args:
+        deltas: Dict mapping recipient ID to change in unread notifications
+
+    Returns:
+        Number of profile rows updated
+    """
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    return Profile.objects.filter(user_id__in=deltas).update(
+        unread_notifications_count=Greatest(
+            F('unread_notifications_count') + Case(
+                *[When(user_id=user_id, then=Value(delta)) for user_id, delta in deltas.items()],
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+    )
+
+
+def get_unread_count(user):
+    """Return a user's unread notification count with a primary-key lookup."""
+    count = (
+        Profile.objects.filter(user_id=user.pk)
+        .values_list('unread_notifications_count', flat=True)
+        .first()
+    )
+    return count or 0
+
+
+def _set_read(user, notification_ids, is_read):
+    notifications = Notification.objects.filter(recipient=user, is_read=not is_read)
+    if notification_ids is not None:
+        notifications = notifications.filter(pk__in=list(notification_ids))
+
+    with transaction.atomic():
+        changed = notifications.update(is_read=is_read, changed_at=timezone.now())
+        adjust_unread(user.pk, changed if not is_read else -changed)
+    return changed
+
+
+def mark_read(user, notification_ids=None):
+    """
+    Mark a user's notifications as read and update the counter.
+
+    Args:
+        user: The recipient
+        notification_ids: IDs to mark, or None for all of the user's notifications
+
+    Returns:
+        Number of notifications that changed from unread to read
+    """
+    return _set_read(user, notification_ids, True)
+
+
+def mark_unread(user, notification_ids):
+    """
+    Mark a user's notifications as unread and update the counter.
+
+    Returns:
+        Number of notifications that changed from read to unread
+    """
+    return _set_read(user, notification_ids, False)
+
+
+def unread_count_expression():
+    """Correlated subquery counting a profile's unread notifications."""
+    counts = (
+        Notification.objects.filter(recipient_id=OuterRef('user_id'), is_read=False)
+        .order_by()
+        .values('recipient_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def recount_unread(profiles):
+    """
+    Recompute unread counters from the Notification table.
+
+    Args:
+        profiles: Profile queryset
+
+    Returns:
+        Number of profile rows updated
+    """
+    return profiles.update(unread_notifications_count=unread_count_expression())
+
+
+def find_drift(profiles):
+    """
+    Return (user_id, stored, actual) tuples for profiles whose counter is wrong.
+
+    Args:
+        profiles: Profile queryset to check
+    """
+    rows = profiles.annotate(actual=unread_count_expression()).values_list(
+        'user_id', 'unread_notifications_count', 'actual'
+    )
+    return [(user_id, stored, actual) for user_id, stored, actual in rows if stored != actual]
@@ -6,7 +6,7 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy, reverse
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.db.models import Count, Q, Sum
+from django.db.models import Q
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_protect
 from django.contrib.auth import login
@@ -19,7 +19,10 @@ from django.conf import settings
 from allauth.socialaccount.models import SocialAccount
 from .models import ArtWork, Profile, Comment, KarmaEvent, Critique, Reaction, Folder, ArtWorkVersion
 from .forms import CommentForm, ReplyForm, SetPasswordForOAuthUserForm, ProfileUpdateForm, RemovePasswordForm
-from .karma import award_like_karma, award_critique_karma
+from .karma import (
+    award_like_karma, award_critique_karma, get_karma_breakdown, get_karma_daily_totals,
+    get_karma_leaderboard, get_karma_neighbours, get_karma_rank
+)
 import json
 
 # Create your views here.
@@ -100,18 +103,11 @@ class ArtWorkListView(ListView):
 
     def get_queryset(self):
         """Return filtered and sorted queryset based on GET parameters."""
-        from django.db.models import Count, Q, Case, When, IntegerField
-        from critique.models import Critique, Reaction
-        
-        # Start with base queryset and add popularity annotations
-        queryset = ArtWork.objects.annotate(
-            critiques_count=Count('critiques', distinct=True),
-            likes_count=Count('likes', distinct=True),
-            # Calculate popularity score: critiques * 2 + likes + reactions
-            popularity_score=Count('critiques', distinct=True) * 2 + 
-                           Count('likes', distinct=True) + 
-                           Count('critiques__reactions', distinct=True)
-        )
+        from .search import search_artworks
+
+        # Popularity counters (likes_count, critiques_count, popularity_score)
+        # are stored on the artwork row
+        queryset = ArtWork.objects.all()
         
         # Get search parameters
         search_query = self.request.GET.get('search', '').strip()
@@ -121,14 +117,9 @@ class ArtWorkListView(ListView):
         created_before = self.request.GET.get('created_before', '')
         ordering = self.request.GET.get('ordering', '-created_at')
 
-        # Apply search filter
+        # Apply full-text search
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(author__username__icontains=search_query) |
-                Q(tags__icontains=search_query)
-            )
+            queryset = search_artworks(queryset, search_query)
 
         # Apply artist filter
         if artist_filter:
@@ -152,12 +143,14 @@ class ArtWorkListView(ListView):
             '-popularity_score', 'popularity_score',
             'title', '-title'
         ]
-        if ordering in valid_orderings:
+        if search_query and 'ordering' not in self.request.GET:
+            queryset = queryset.order_by('-search_rank', '-created_at')
+        elif ordering in valid_orderings:
             queryset = queryset.order_by(ordering)
         else:
             queryset = queryset.order_by('-created_at')
 
-        return queryset.distinct()
+        return queryset
 
     def get_context_data(self, **kwargs):
         """Add search parameters to context for template rendering."""
@@ -203,7 +196,7 @@ def profile_view(request):
     View for displaying the logged-in user's profile.
     """
     profile = request.user.profile
-    artworks = ArtWork.objects.filter(author=request.user).order_by('-created_at')
+    artworks = ArtWork.objects.filter(author=request.user).prefetch_related('normalized_tags').order_by('-created_at')
     
     # Get activity statistics
     critiques_count = Critique.objects.filter(author=request.user).count()
@@ -229,7 +222,7 @@ def user_profile_view(request, username):
     # Get the user by username or return 404 if not found
     profile_user = get_object_or_404(User, username=username)
     profile = profile_user.profile
-    artworks = ArtWork.objects.filter(author=profile_user).order_by('-created_at')
+    artworks = ArtWork.objects.filter(author=profile_user).prefetch_related('normalized_tags').order_by('-created_at')
     
     # Get activity statistics
     critiques_count = Critique.objects.filter(author=profile_user).count()
@@ -319,7 +312,7 @@ class MyArtworksListView(LoginRequiredMixin, ListView):
         sort_mapping = {
             'newest': '-created_at',
             'oldest': 'created_at',
-            'most_likes': '-likes',  # This might need to be aggregated if using annotate
+            'most_likes': '-likes_count',
             'title_asc': 'title',
             'title_desc': '-title',
         }
@@ -330,8 +323,8 @@ class MyArtworksListView(LoginRequiredMixin, ListView):
         # Get the search query parameter
         search_query = self.request.GET.get('search', '')
         
-        # Start with all artworks for the current user
-        queryset = ArtWork.objects.filter(author=self.request.user)
+        # Start with all artworks for the current user (tags shown on each card)
+        queryset = ArtWork.objects.filter(author=self.request.user).prefetch_related('normalized_tags')
         
         # Apply search filter if provided
         if search_query:
@@ -342,11 +335,7 @@ class MyArtworksListView(LoginRequiredMixin, ListView):
             )
         
         # Apply sorting
-        if sort_field == '-likes':
-            # For likes, we need to use annotation since it's a ManyToMany field
-            queryset = queryset.annotate(like_count=Count('likes')).order_by('-like_count')
-        else:
-            queryset = queryset.order_by(sort_field)
+        queryset = queryset.order_by(sort_field)
         
         return queryset
     
@@ -561,11 +550,9 @@ def karma_view(request):
     # Get karma events for the current user
     karma_events = KarmaEvent.objects.filter(user=request.user).order_by('-created_at')[:50]
     
-    # Calculate karma statistics
-    karma_by_category = KarmaEvent.objects.filter(user=request.user).values('action').annotate(
-        total=Sum('points'),
-        count=Count('id')
-    ).order_by('-total')
+    # Karma statistics come from the lifetime totals and per-day rollups, not the whole ledger
+    karma_by_category = get_karma_breakdown(request.user)
+    karma_history = get_karma_daily_totals(request.user, days=30)
     
     # Get total karma
     total_karma = request.user.profile.karma
@@ -573,28 +560,35 @@ def karma_view(request):
     context = {
         'karma_events': karma_events,
         'karma_by_category': karma_by_category,
+        'karma_history': karma_history,
         'total_karma': total_karma,
     }
     
     return render(request, 'critique/karma_detail.html', context)
 
 
+LEADERBOARD_SIZE = 20
+
+
 def karma_leaderboard(request):
     """
     View to display top users by karma points.
     """
-    # Get top users by karma points
-    top_profiles = Profile.objects.select_related('user').order_by('-karma')[:20]
+    # Get top users by karma points from the materialized leaderboard
+    top_profiles = get_karma_leaderboard(LEADERBOARD_SIZE)
     
-    # Get user's rank if logged in
+    # Get user's rank, and the users around them if they're off the top list
     user_rank = None
+    neighbours = []
     if request.user.is_authenticated:
-        higher_karma_count = Profile.objects.filter(karma__gt=request.user.profile.karma).count()
-        user_rank = higher_karma_count + 1  # Add 1 because ranks start at 1, not 0
+        user_rank = get_karma_rank(request.user)
+        if user_rank is not None and user_rank > LEADERBOARD_SIZE:
+            neighbours = get_karma_neighbours(request.user)
     
     context = {
         'top_profiles': top_profiles,
         'user_rank': user_rank,
+        'neighbours': neighbours,
     }
     
     return render(request, 'critique/karma_leaderboard.html', context)
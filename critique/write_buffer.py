@@ -0,0 +1,128 @@
+"""
+Buffered inserts for high-volume, fire-and-forget rows.
+
+A WriteBuffer collects unsaved model instances in memory and writes them with
+a single bulk_create once FEED_WRITE_BATCH_SIZE rows are waiting or the oldest
+row has waited FEED_WRITE_FLUSH_SECONDS, whichever comes first. A buffer can
+read its limits from other settings (settings_prefix) and write its rows with
+its own function, e.g. to apply side effects in the same transaction.
+
+bulk_create does not send post_save signals, so only buffer rows whose side
+effects are applied by the caller. If a batch fails, its rows are retried one
+at a time and only the rows that fail again are dropped. Rows still buffered
+when a process is killed are lost; pending rows are flushed on a normal
+interpreter exit.
+"""
+
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBuffer:
+    """
+    In-memory buffer of model instances inserted in batches.
+
+    Args:
+        model: Model class the buffered instances belong to
+        run: Optional callable used to run size-triggered flushes, e.g. to move
+            them onto a worker thread; defaults to flushing inline
+        write: Optional callable that writes a list of rows; defaults to
+            model.objects.bulk_create
+        settings_prefix: Limits are read from <prefix>_BATCH_SIZE and
+            <prefix>_FLUSH_SECONDS
+    """
+
+    def __init__(self, model, run=None, write=None, settings_prefix='FEED_WRITE'):
+        self.model = model
+        self._run = run or (lambda func: func())
+        self._write = write or self._bulk_create
+        self._settings_prefix = settings_prefix
+        self._lock = threading.Lock()
+        self._rows = []
+        self._timer = None
+        atexit.register(self._flush_quietly)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _batch_size(self):
+        return getattr(settings, f'{self._settings_prefix}_BATCH_SIZE', 50)
+
+    def _flush_seconds(self):
+        return getattr(settings, f'{self._settings_prefix}_FLUSH_SECONDS', 2)
+
+    def _bulk_create(self, rows):
+        self.model.objects.bulk_create(rows, batch_size=self._batch_size())
+
+    def add(self, instance):
+        """Queue an unsaved instance for insertion."""
+        with self._lock:
+            self._rows.append(instance)
+            full = len(self._rows) >= self._batch_size()
+            flush_seconds = self._flush_seconds()
+            if not full and self._timer is None and flush_seconds:
+                self._timer = threading.Timer(flush_seconds, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if full:
+            self._run(self.flush)
+
+    def flush(self):
+        """
+        Insert every buffered row.
+
+        Returns:
+            Number of rows written
+        """
+        with self._lock:
+            rows, self._rows = self._rows, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        if not rows:
+            return 0
+        try:
+            with transaction.atomic():
+                self._write(rows)
+        except Exception:
+            # One bad row (say, one pointing at a just-deleted object) must
+            # not cost the others; find it by writing them one at a time
+            logger.warning(
+                "Batch of %d buffered %s rows failed; retrying row by row",
+                len(rows), self.model.__name__, exc_info=True,
+            )
+            return self._write_each(rows)
+        return len(rows)
+
+    def _write_each(self, rows):
+        written = 0
+        for row in rows:
+            try:
+                with transaction.atomic():
+                    self._write([row])
+            except Exception:
+                logger.exception("Dropped a buffered %s row", self.model.__name__)
+            else:
+                written += 1
+        return written
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            # The timer thread opened its own connection; don't leak it
+            connection.close()
+
+    def _flush_quietly(self):
+        try:
+            self.flush()
+        except Exception:
+            pass